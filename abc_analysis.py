@@ -1,56 +1,196 @@
 import pandas as pd
+import numpy as np
 import os
+import argparse
+from data_store import read_frame, write_frame
+from dimensions import decode
+from instrumentation import run_report, step
 
-# Load the cleaned sales master data
-try:
-    df_sales_master = pd.read_csv("/home/ubuntu/df_sales_master.csv")
-except FileNotFoundError:
-    print("Error: df_sales_master.csv not found. Please ensure data preparation is complete.")
-    exit()
+PRODUCT_COLS = ['Brand', 'Description', 'Size']
 
-print("--- Starting ABC Analysis ---")
+# Upper bounds of the cumulative share for A and B; everything above the last one is C
+# A: High Value - Top 80% of profit, B: Moderate Value - Next 15%, C: Low Value - Remaining 5%
+ABC_THRESHOLDS = (0.80, 0.95)
+ABC_LABELS = np.array(['A', 'B', 'C'])
 
-# 1. Aggregate Gross Profit by product (Brand and Description)
-# Using Brand and Description as the unique product identifier for simplicity
-df_product_profit = df_sales_master.groupby(['Brand', 'Description', 'Size'])['GrossProfit'].sum().reset_index()
-df_product_profit = df_product_profit.rename(columns={'GrossProfit': 'TotalGrossProfit'})
+# Upper bounds of the coefficient of variation of weekly demand for X (steady) and Y (variable);
+# anything above is Z (erratic / intermittent)
+XYZ_THRESHOLDS = (0.50, 1.00)
+XYZ_LABELS = np.array(['X', 'Y', 'Z'])
 
-# 2. Sort in descending order of Total Gross Profit
-df_product_profit = df_product_profit.sort_values(by='TotalGrossProfit', ascending=False).reset_index(drop=True)
+# Ranking criteria for the segmented classification: name -> sales master column
+ABC_CRITERIA = {'Profit': 'GrossProfit', 'Revenue': 'SalesDollars', 'Units': 'SalesQuantity'}
 
-# 3. Calculate cumulative percentage of Gross Profit
-df_product_profit['CumulativeProfit'] = df_product_profit['TotalGrossProfit'].cumsum()
-df_product_profit['ProfitPercentage'] = df_product_profit['TotalGrossProfit'] / df_product_profit['TotalGrossProfit'].sum()
-df_product_profit['CumulativeProfitPercentage'] = df_product_profit['ProfitPercentage'].cumsum()
 
 # 4. Assign ABC Categories
-def assign_abc(cumulative_percentage):
-    if cumulative_percentage <= 0.80:
-        return 'A' # High Value - Top 80% of profit
-    elif cumulative_percentage <= 0.95:
-        return 'B' # Moderate Value - Next 15% of profit
-    else:
-        return 'C' # Low Value - Remaining 5% of profit
+def classify(values, thresholds=ABC_THRESHOLDS, labels=ABC_LABELS):
+    # Vectorized bucket lookup: the first threshold >= value gives the class (value <= threshold)
+    return labels[np.searchsorted(np.asarray(thresholds), np.asarray(values), side='left')]
 
-df_product_profit['ABC_Category'] = df_product_profit['CumulativeProfitPercentage'].apply(assign_abc)
 
-# Display summary statistics for the categories
-abc_summary = df_product_profit.groupby('ABC_Category').agg(
-    Total_Products=('Brand', 'count'),
-    Total_Profit=('TotalGrossProfit', 'sum'),
-    Min_Profit=('TotalGrossProfit', 'min'),
-    Max_Profit=('TotalGrossProfit', 'max')
-).reset_index()
+def run_abc_analysis(df_sales_master, df_products):
+    print("--- Starting ABC Analysis ---")
 
-total_profit = abc_summary['Total_Profit'].sum()
-abc_summary['Profit_Share'] = (abc_summary['Total_Profit'] / total_profit) * 100
-abc_summary['Product_Share'] = (abc_summary['Total_Products'] / df_product_profit.shape[0]) * 100
+    # 1. Aggregate Gross Profit by product (ProductKey: Brand, Description and Size in dim_product)
+    with step("groupby_product_profit", rows_in=len(df_sales_master)) as s:
+        df_product_profit = df_sales_master.groupby('ProductKey')['GrossProfit'].sum().reset_index()
+        df_product_profit = df_product_profit.rename(columns={'GrossProfit': 'TotalGrossProfit'})
+        df_product_profit = decode(df_product_profit, {'dim_product': df_products}, keep_keys=True)
+        s.rows_out = len(df_product_profit)
 
-print("\nABC Analysis Summary:")
-print(abc_summary.sort_values(by='Profit_Share', ascending=False).to_markdown(index=False, floatfmt=".2f"))
+    with step("classify_abc", rows_in=len(df_product_profit)) as s:
+        # 2. Sort in descending order of Total Gross Profit
+        df_product_profit = df_product_profit.sort_values(by='TotalGrossProfit', ascending=False).reset_index(drop=True)
 
-# Save the detailed ABC analysis results
-df_product_profit.to_csv("/home/ubuntu/abc_analysis_results.csv", index=False)
+        # 3. Calculate cumulative percentage of Gross Profit
+        df_product_profit['CumulativeProfit'] = df_product_profit['TotalGrossProfit'].cumsum()
+        df_product_profit['ProfitPercentage'] = df_product_profit['TotalGrossProfit'] / df_product_profit['TotalGrossProfit'].sum()
+        df_product_profit['CumulativeProfitPercentage'] = df_product_profit['ProfitPercentage'].cumsum()
 
-print("\n--- ABC Analysis Complete. Results saved to abc_analysis_results.csv ---")
+        df_product_profit['ABC_Category'] = classify(df_product_profit['CumulativeProfitPercentage'])
+        s.rows_out = len(df_product_profit)
 
+    # Display summary statistics for the categories
+    abc_summary = df_product_profit.groupby('ABC_Category').agg(
+        Total_Products=('Brand', 'count'),
+        Total_Profit=('TotalGrossProfit', 'sum'),
+        Min_Profit=('TotalGrossProfit', 'min'),
+        Max_Profit=('TotalGrossProfit', 'max')
+    ).reset_index()
+
+    total_profit = abc_summary['Total_Profit'].sum()
+    abc_summary['Profit_Share'] = (abc_summary['Total_Profit'] / total_profit) * 100
+    abc_summary['Product_Share'] = (abc_summary['Total_Products'] / df_product_profit.shape[0]) * 100
+
+    print("\nABC Analysis Summary:")
+    print(abc_summary.sort_values(by='Profit_Share', ascending=False).to_markdown(index=False, floatfmt=".2f"))
+
+    return df_product_profit
+
+
+def _segment_frames(df_store, store_city, keys=()):
+    # Store-level rows re-keyed as Store, City and Company segments (summed per segment and keys)
+    group_cols = ['ProductKey'] + list(keys)
+    value_cols = [col for col in df_store.columns if col not in ['Store'] + group_cols]
+    df_city = df_store.assign(Segment=df_store['Store'].map(store_city)).groupby(['Segment'] + group_cols, observed=True)[value_cols].sum()
+    df_company = df_store.groupby(group_cols, observed=True)[value_cols].sum()
+    return pd.concat([
+        df_store.assign(Segment_Type='Store', Segment=df_store['Store'].astype(str)).drop(columns='Store'),
+        df_city.reset_index().assign(Segment_Type='City'),
+        df_company.reset_index().assign(Segment_Type='Company', Segment='All'),
+    ], ignore_index=True)
+
+
+def run_segmented_abc(df_sales_cube, df_products, df_stores, criteria=ABC_CRITERIA,
+                      abc_thresholds=ABC_THRESHOLDS, xyz_thresholds=XYZ_THRESHOLDS):
+    """
+    ABC by several criteria plus XYZ by demand variability, for the whole company, every Store and
+    every City at once, from the weekly sales cube. Returns one long table keyed by Segment_Type,
+    Segment, product and Criterion.
+    """
+    print("--- Starting Segmented ABC/XYZ Analysis ---")
+    df_stores = df_stores.set_index('StoreKey')
+    store_city = df_stores.drop_duplicates('Store').set_index('Store')['City'].astype(str)
+
+    # Weekly totals per (Store, product); the cube rows are per vendor too
+    measures = list(dict.fromkeys(['SalesQuantity'] + list(criteria.values())))
+    df_weekly = df_sales_cube.groupby(['StoreKey', 'ProductKey', 'Date'])[measures].sum().reset_index()
+    df_weekly.insert(0, 'Store', df_stores['Store'].reindex(df_weekly['StoreKey']).to_numpy())
+    df_weekly = df_weekly.drop(columns='StoreKey')
+
+    # 1. One aggregation per (Store, product) for every criterion; City and Company are sums of it
+    df_store = df_weekly.groupby(['Store', 'ProductKey'])[list(criteria.values())].sum().reset_index()
+    df_values = _segment_frames(df_store, store_city)
+
+    # 2. Long format: one ranking group per (Segment_Type, Segment, Criterion)
+    df_long = df_values.melt(
+        id_vars=['Segment_Type', 'Segment', 'ProductKey'], value_vars=list(criteria.values()),
+        var_name='Criterion', value_name='Value'
+    )
+    df_long['Criterion'] = df_long['Criterion'].map({col: name for name, col in criteria.items()})
+
+    # 3. Single grouped sort + cumsum pass over every group, then the vectorized class lookup
+    group_cols = ['Segment_Type', 'Segment', 'Criterion']
+    df_long = df_long.sort_values(group_cols + ['Value'], ascending=[True, True, True, False], kind='stable')
+    grouped = df_long.groupby(group_cols, sort=False)['Value']
+    df_long['Share'] = df_long['Value'] / grouped.transform('sum')
+    df_long['Cumulative_Share'] = df_long.groupby(group_cols, sort=False)['Share'].cumsum()
+    df_long['Class'] = classify(df_long['Cumulative_Share'], abc_thresholds, ABC_LABELS)
+
+    # 4. XYZ: coefficient of variation of weekly units over every week of the period (zero weeks included)
+    n_weeks = df_weekly['Date'].nunique()
+    df_weekly = _segment_frames(df_weekly[['Store', 'ProductKey', 'Date', 'SalesQuantity']], store_city, keys=['Date'])
+    df_weekly['SalesQuantity_Sq'] = df_weekly['SalesQuantity'].astype('float64') ** 2
+    df_moments = df_weekly.groupby(['Segment_Type', 'Segment', 'ProductKey'])[['SalesQuantity', 'SalesQuantity_Sq']].sum().reset_index()
+
+    mean = df_moments['SalesQuantity'] / n_weeks
+    variance = (df_moments['SalesQuantity_Sq'] - df_moments['SalesQuantity'] ** 2 / n_weeks) / max(n_weeks - 1, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cv = np.sqrt(variance.clip(lower=0)) / mean
+    df_xyz = df_moments[['Segment_Type', 'Segment', 'ProductKey']].assign(
+        Criterion='Variability', Value=cv, Share=np.nan, Cumulative_Share=np.nan,
+        Class=classify(cv, xyz_thresholds, XYZ_LABELS)
+    )
+
+    df_segmented = decode(pd.concat([df_long, df_xyz], ignore_index=True), {'dim_product': df_products}, keep_keys=True)
+    for col in ['Segment_Type', 'Criterion', 'Class']:
+        df_segmented[col] = df_segmented[col].astype('category')
+
+    # Summary: number of products per class, criterion and segment type
+    summary = df_segmented.groupby(['Segment_Type', 'Criterion', 'Class'], observed=True).agg(
+        Segments=('Segment', 'nunique'), Products=('ProductKey', 'size')
+    ).reset_index()
+    print(f"Segments: {df_segmented.groupby('Segment_Type', observed=True)['Segment'].nunique().to_dict()}")
+    print("\nSegmented Classification Summary:")
+    print(summary.to_markdown(index=False))
+    return df_segmented
+
+
+def save_abc_results(df_product_profit):
+    # Save the detailed ABC analysis results (store copy with ProductKey for later phases, CSV for the report)
+    with step("write:abc_analysis_results", rows_in=len(df_product_profit)):
+        write_frame(df_product_profit, "abc_analysis_results")
+    with step("write_csv:abc_analysis_results", rows_in=len(df_product_profit)):
+        df_product_profit.drop(columns='ProductKey').to_csv("/home/ubuntu/abc_analysis_results.csv", index=False)
+
+
+def save_segmented_results(df_segmented):
+    # Long table; join to inventory_optimization results on ProductKey with Segment_Type == 'Company',
+    # or to inventory_policy on Store/ProductKey with Segment_Type == 'Store'
+    write_frame(df_segmented, "abc_segmented_results")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ABC inventory classification.")
+    parser.add_argument('--segmented', action='store_true',
+                        help="Also classify by profit, revenue, units and demand variability per Store and City")
+    args = parser.parse_args()
+
+    # Load the cleaned sales master data (only the columns needed for the classification)
+    try:
+        with step("load:df_sales_master") as s:
+            df_sales_master = read_frame("df_sales_master", columns=['ProductKey', 'GrossProfit'])
+            df_products = read_frame("dim_product")
+            s.rows_out = len(df_sales_master)
+    except FileNotFoundError:
+        print("Error: df_sales_master not found. Please ensure data preparation is complete.")
+        exit()
+
+    save_abc_results(run_abc_analysis(df_sales_master, df_products))
+    print("\n--- ABC Analysis Complete. Results saved to abc_analysis_results.csv ---")
+
+    if args.segmented:
+        with step("load:sales_cube_weekly") as s:
+            df_sales_cube = read_frame("sales_cube_weekly")
+            s.rows_out = len(df_sales_cube)
+        with step("segmented_abc", rows_in=len(df_sales_cube)) as s:
+            df_segmented = run_segmented_abc(df_sales_cube, df_products, read_frame("dim_store"))
+            s.rows_out = len(df_segmented)
+        with step("write:abc_segmented_results", rows_in=len(df_segmented)):
+            save_segmented_results(df_segmented)
+        print("\n--- Segmented ABC/XYZ Analysis Complete. Results saved to the abc_segmented_results dataset ---")
+
+
+if __name__ == "__main__":
+    with run_report("abc_analysis"):
+        main()
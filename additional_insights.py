@@ -1,80 +1,110 @@
 import pandas as pd
 import os
-
-# Load the cleaned dataframes
-try:
-    df_sales_master = pd.read_csv("/home/ubuntu/df_sales_master.csv")
-    df_inventory_master = pd.read_csv("/home/ubuntu/df_inventory_master.csv")
-except FileNotFoundError:
-    print("Error: One or more cleaned data files not found. Please ensure previous steps are complete.")
-    exit()
-
-print("--- Starting Additional Insights Analysis ---")
-
-# --- 1. Sales Trends by Store/City ---
-df_store_sales = df_sales_master.groupby(['Store', 'VendorName']).agg(
-    Total_Sales_Dollars=('SalesDollars', 'sum'),
-    Total_Sales_Quantity=('SalesQuantity', 'sum')
-).reset_index()
-
-# Get City from inventory master
-df_city_map = df_inventory_master[['Store', 'City']].drop_duplicates()
-df_store_sales = pd.merge(df_store_sales, df_city_map, on='Store', how='left')
-
-df_city_sales = df_store_sales.groupby('City').agg(
-    Total_Sales_Dollars=('Total_Sales_Dollars', 'sum'),
-    Total_Sales_Quantity=('Total_Sales_Quantity', 'sum')
-).reset_index().sort_values(by='Total_Sales_Dollars', ascending=False)
-
-print("\nTop 5 Cities by Total Sales Dollars:")
-print(df_city_sales.head(5).to_markdown(index=False, floatfmt=".2f"))
-
-# --- 2. Inventory Turnover Ratio (ITR) ---
-# ITR = COGS / Average Inventory Value
-# Average Inventory Value = (BegInvValue + EndInvValue) / 2
-
-# Calculate Inventory Value (using Beg/End Price and onHand)
-df_inventory_master['BegInvValue'] = df_inventory_master['Beg_onHand'] * df_inventory_master['Beg_Price']
-df_inventory_master['EndInvValue'] = df_inventory_master['End_onHand'] * df_inventory_master['End_Price']
-
-# Aggregate Inventory Value
-total_beg_inv_value = df_inventory_master['BegInvValue'].sum()
-total_end_inv_value = df_inventory_master['EndInvValue'].sum()
-avg_inv_value = (total_beg_inv_value + total_end_inv_value) / 2
-
-# Calculate Total COGS from sales master
-total_cogs = df_sales_master['COGS'].sum()
-
-# Calculate ITR
-inventory_turnover_ratio = total_cogs / avg_inv_value
-
-print(f"\nTotal COGS for 2016: ${total_cogs:,.2f}")
-print(f"Average Inventory Value: ${avg_inv_value:,.2f}")
-print(f"Overall Inventory Turnover Ratio (ITR): {inventory_turnover_ratio:.2f} times")
-
-# --- 3. Top/Bottom Performing Products by Gross Profit Margin ---
-# Calculate Gross Profit Margin (GPM) for each sale
-df_sales_master['GPM'] = (df_sales_master['GrossProfit'] / df_sales_master['SalesDollars']) * 100
-
-# Aggregate GPM by product
-df_product_gpm = df_sales_master.groupby(['Brand', 'Description', 'Size']).agg(
-    Avg_GPM=('GPM', 'mean'),
-    Total_Sales_Dollars=('SalesDollars', 'sum'),
-    Total_Sales_Quantity=('SalesQuantity', 'sum')
-).reset_index()
-
-# Filter out products with very low sales volume to avoid skewed GPM
-min_sales_quantity = df_product_gpm['Total_Sales_Quantity'].quantile(0.5)
-df_product_gpm_filtered = df_product_gpm[df_product_gpm['Total_Sales_Quantity'] >= min_sales_quantity]
-
-df_top_gpm = df_product_gpm_filtered.sort_values(by='Avg_GPM', ascending=False).head(5)
-df_bottom_gpm = df_product_gpm_filtered.sort_values(by='Avg_GPM', ascending=True).head(5)
-
-print("\nTop 5 Products by Average Gross Profit Margin (GPM):")
-print(df_top_gpm[['Description', 'Size', 'Avg_GPM', 'Total_Sales_Dollars']].to_markdown(index=False, floatfmt=".2f"))
-
-print("\nBottom 5 Products by Average Gross Profit Margin (GPM):")
-print(df_bottom_gpm[['Description', 'Size', 'Avg_GPM', 'Total_Sales_Dollars']].to_markdown(index=False, floatfmt=".2f"))
-
-print("\n--- Additional Insights Analysis Complete ---")
-
+from data_store import frame_exists, read_frame
+from dimensions import decode
+from execution_backend import group_aggregate, read_source, source_rows
+from instrumentation import run_report, step
+
+
+def run_additional_insights(weekly_sales, sales_master, df_inventory_master, df_stores, df_products, backend=None):
+    # weekly_sales / sales_master: the weekly sales cube and the sales master as DataFrames, or their store
+    # dataset names (read by the aggregation backend). Only the GPM step needs the line-level sales.
+    print("--- Starting Additional Insights Analysis ---")
+
+    # --- 1. Sales Trends by Store/City ---
+    # Rolled up from the weekly sales cube (one row per product, store, vendor and week)
+    with step("groupby_store_sales", rows_in=source_rows(weekly_sales)) as s:
+        df_store_sales = group_aggregate(weekly_sales, ['StoreKey', 'VendorKey'], {
+            'Total_Sales_Dollars': ('SalesDollars', 'sum'),
+            'Total_Sales_Quantity': ('SalesQuantity', 'sum'),
+        }, backend)
+        s.rows_out = len(df_store_sales)
+
+    # Get City from the store dimension
+    df_store_sales = decode(df_store_sales, {'dim_store': df_stores}, columns=['City'])
+
+    df_city_sales = df_store_sales.groupby('City', observed=True).agg(
+        Total_Sales_Dollars=('Total_Sales_Dollars', 'sum'),
+        Total_Sales_Quantity=('Total_Sales_Quantity', 'sum')
+    ).reset_index().sort_values(by='Total_Sales_Dollars', ascending=False)
+
+    print("\nTop 5 Cities by Total Sales Dollars:")
+    print(df_city_sales.head(5).to_markdown(index=False, floatfmt=".2f"))
+
+    # --- 2. Inventory Turnover Ratio (ITR) ---
+    # ITR = COGS / Average Inventory Value
+    # Average Inventory Value = (BegInvValue + EndInvValue) / 2
+
+    # Calculate Inventory Value (using Beg/End Price and onHand)
+    beg_inv_value = df_inventory_master['Beg_onHand'] * df_inventory_master['Beg_Price']
+    end_inv_value = df_inventory_master['End_onHand'] * df_inventory_master['End_Price']
+
+    # Aggregate Inventory Value
+    total_beg_inv_value = beg_inv_value.sum()
+    total_end_inv_value = end_inv_value.sum()
+    avg_inv_value = (total_beg_inv_value + total_end_inv_value) / 2
+
+    # Calculate Total COGS from the weekly sales cube
+    total_cogs = read_source(weekly_sales, ['COGS'])['COGS'].sum()
+
+    # Calculate ITR
+    inventory_turnover_ratio = total_cogs / avg_inv_value
+
+    print(f"\nTotal COGS for 2016: ${total_cogs:,.2f}")
+    print(f"Average Inventory Value: ${avg_inv_value:,.2f}")
+    print(f"Overall Inventory Turnover Ratio (ITR): {inventory_turnover_ratio:.2f} times")
+
+    # --- 3. Top/Bottom Performing Products by Gross Profit Margin ---
+    # Gross Profit Margin (GPM) of each sale, derived per line by the backend and averaged by product
+    with step("groupby_product_gpm", rows_in=source_rows(sales_master)) as s:
+        df_product_gpm = decode(group_aggregate(sales_master, ['ProductKey'], {
+            'Avg_GPM': ('GPM', 'mean'),
+            'Total_Sales_Dollars': ('SalesDollars', 'sum'),
+            'Total_Sales_Quantity': ('SalesQuantity', 'sum'),
+        }, backend, derive={'GPM': ('percent_of', 'GrossProfit', 'SalesDollars')}), {'dim_product': df_products}, keep_keys=True)
+        s.rows_out = len(df_product_gpm)
+
+    # Filter out products with very low sales volume to avoid skewed GPM
+    min_sales_quantity = df_product_gpm['Total_Sales_Quantity'].quantile(0.5)
+    df_product_gpm_filtered = df_product_gpm[df_product_gpm['Total_Sales_Quantity'] >= min_sales_quantity]
+
+    df_top_gpm = df_product_gpm_filtered.sort_values(by='Avg_GPM', ascending=False).head(5)
+    df_bottom_gpm = df_product_gpm_filtered.sort_values(by='Avg_GPM', ascending=True).head(5)
+
+    print("\nTop 5 Products by Average Gross Profit Margin (GPM):")
+    print(df_top_gpm[['Description', 'Size', 'Avg_GPM', 'Total_Sales_Dollars']].to_markdown(index=False, floatfmt=".2f"))
+
+    print("\nBottom 5 Products by Average Gross Profit Margin (GPM):")
+    print(df_bottom_gpm[['Description', 'Size', 'Avg_GPM', 'Total_Sales_Dollars']].to_markdown(index=False, floatfmt=".2f"))
+
+    return {
+        'city_sales': df_city_sales,
+        'product_gpm': df_product_gpm,
+        'inventory_turnover_ratio': inventory_turnover_ratio,
+    }
+
+
+def main():
+    # Load the cleaned dataframes (the sales cube and master are read by the aggregation backend from the store)
+    try:
+        if not (frame_exists("sales_cube_weekly") and frame_exists("df_sales_master")):
+            raise FileNotFoundError("sales_cube_weekly / df_sales_master")
+        with step("load:df_inventory_master") as s:
+            df_inventory_master = read_frame(
+                "df_inventory_master",
+                columns=['Beg_onHand', 'Beg_Price', 'End_onHand', 'End_Price']
+            )
+            s.rows_out = len(df_inventory_master)
+        df_stores = read_frame("dim_store")
+        df_products = read_frame("dim_product")
+    except FileNotFoundError:
+        print("Error: One or more cleaned data files not found. Please ensure previous steps are complete.")
+        exit()
+
+    run_additional_insights("sales_cube_weekly", "df_sales_master", df_inventory_master, df_stores, df_products)
+    print("\n--- Additional Insights Analysis Complete ---")
+
+
+if __name__ == "__main__":
+    with run_report("additional_insights"):
+        main()
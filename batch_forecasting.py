@@ -0,0 +1,202 @@
+import pandas as pd
+import numpy as np
+import argparse
+import multiprocessing
+import os
+import signal
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+from data_store import read_frame, write_frame
+from forecast_models import select_models
+from sales_cube import SalesCube
+
+# Weekly demand forecasts for every product (Brand/Description/Size), or every product
+# in the selected ABC categories.
+# method='auto': the vectorized baselines in forecast_models.py are backtested on the whole
+#   matrix at once and ARIMA is fitted (in a process pool) only for the series they forecast badly.
+# method='arima': ARIMA for every series, fitted in parallel over a process pool.
+
+PRODUCT_COLS = ['Brand', 'Description', 'Size']
+
+# Same model and horizon as demand_forecasting.py
+ARIMA_ORDER = (1, 1, 1)
+FORECAST_STEPS = 4
+
+# Seconds allowed for one series fit before it is abandoned
+SERIES_TIMEOUT_SECONDS = 30
+
+
+def build_weekly_series(sales_cube, df_abc=None, categories=('A', 'B')):
+    """
+    Weekly SalesQuantity per product from the weekly sales cube, as a (product x week) frame.
+    Every product shares the same weekly grid, weeks without sales are 0.
+    If df_abc is given, only the products in `categories` are kept.
+    """
+    product_keys = None
+    if df_abc is not None and categories:
+        product_keys = df_abc.loc[df_abc['ABC_Category'].isin(categories), 'ProductKey'].to_numpy()
+    return sales_cube.matrix(product_keys)
+
+
+class _SeriesTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise _SeriesTimeout()
+
+
+def fit_arima_forecast(values, steps=FORECAST_STEPS, order=ARIMA_ORDER):
+    from statsmodels.tsa.arima.model import ARIMA
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model_fit = ARIMA(values, order=order).fit()
+    return np.asarray(model_fit.forecast(steps=steps))
+
+
+def _fit_series_task(task):
+    # Runs in a worker process: one series, isolated errors, optional timeout (Unix only)
+    position, values, steps, timeout = task
+    use_alarm = timeout and hasattr(signal, 'setitimer')
+    start = time.perf_counter()
+    try:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        forecast, status, error = fit_arima_forecast(values, steps), 'ok', ''
+    except _SeriesTimeout:
+        forecast, status, error = np.full(steps, np.nan), 'timeout', f"exceeded {timeout}s"
+    except Exception as e:
+        forecast, status, error = np.full(steps, np.nan), 'failed', str(e)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return position, forecast, status, error, time.perf_counter() - start
+
+
+def fit_arima_matrix(Y, steps=FORECAST_STEPS, max_workers=None, timeout=SERIES_TIMEOUT_SECONDS):
+    """Fit ARIMA to every row of Y in a process pool. Returns (forecasts, status, errors) arrays."""
+    tasks = [(i, values, steps, timeout) for i, values in enumerate(Y)]
+    forecasts = np.full((len(tasks), steps), np.nan)
+    status = np.full(len(tasks), 'ok', dtype=object)
+    errors = np.full(len(tasks), '', dtype=object)
+    if not tasks:
+        return forecasts, status, errors
+
+    max_workers = max_workers or os.cpu_count()
+    chunksize = max(1, len(tasks) // (max_workers * 8))
+
+    # forkserver/spawn rather than fork: the pool may be started from a pipeline worker thread
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method)) as pool:
+        for position, forecast, fit_status, error, _ in pool.map(_fit_series_task, tasks, chunksize=chunksize):
+            forecasts[position] = forecast
+            status[position] = fit_status
+            errors[position] = error
+    return forecasts, status, errors
+
+
+def forecast_all_series(df_series, steps=FORECAST_STEPS, method='auto', max_workers=None, timeout=SERIES_TIMEOUT_SECONDS):
+    """
+    Forecast every row of df_series `steps` weeks ahead. Returns the long forecast table, the number
+    of ARIMA fits submitted to the process pool and the seconds spent on them.
+    """
+    Y = df_series.to_numpy()
+    arima_name = 'ARIMA' + str(ARIMA_ORDER)
+    arima_fits, arima_seconds = 0, 0.0
+
+    if method == 'arima':
+        start = time.perf_counter()
+        forecasts, status, errors = fit_arima_matrix(Y, steps, max_workers, timeout)
+        arima_fits, arima_seconds = len(Y), time.perf_counter() - start
+        models = np.full(len(Y), arima_name, dtype=object)
+    else:
+        forecasts, models, best_mae, escalate = select_models(Y, steps)
+        models = models.astype(object)
+        status = np.full(len(Y), 'ok', dtype=object)
+        errors = np.full(len(Y), '', dtype=object)
+
+        # Escalate to ARIMA, and keep it only where it also wins the backtest
+        escalated = np.flatnonzero(escalate)
+        if len(escalated):
+            start = time.perf_counter()
+            Y_escalated = Y[escalated]
+            backtest, backtest_status, _ = fit_arima_matrix(Y_escalated[:, :-steps], steps, max_workers, timeout)
+            arima_mae = np.abs(backtest - Y_escalated[:, -steps:]).mean(axis=1)
+            wins = (backtest_status == 'ok') & (arima_mae < best_mae[escalated])
+
+            winners = escalated[wins]
+            arima_forecasts, arima_status, _ = fit_arima_matrix(Y[winners], steps, max_workers, timeout)
+            fitted = arima_status == 'ok'
+            forecasts[winners[fitted]] = arima_forecasts[fitted]
+            models[winners[fitted]] = arima_name
+            # One backtest fit per escalated series, one final fit per winner
+            arima_fits, arima_seconds = len(escalated) + len(winners), time.perf_counter() - start
+        print(f"Escalated {len(escalated)} of {len(Y)} series to ARIMA, "
+              f"{(models == arima_name).sum()} kept it")
+
+    forecast_weeks = pd.date_range(df_series.columns[-1] + pd.Timedelta(days=1), periods=steps, freq='W')
+    df_products = df_series.index.to_frame(index=False)
+    df_forecasts = pd.DataFrame({
+        **{col: np.repeat(df_products[col].to_numpy(), steps) for col in PRODUCT_COLS},
+        'Week': np.tile(forecast_weeks, len(Y)),
+        'Forecasted_SalesQuantity': forecasts.ravel().round(0),
+        'Model': np.repeat(models, steps),
+        'Status': np.repeat(status, steps),
+        'Error': np.repeat(errors, steps),
+    })
+    return df_forecasts, arima_fits, arima_seconds
+
+
+def run_batch_forecast(sales_cube, df_abc, categories=('A', 'B'), method='auto', max_workers=None, timeout=SERIES_TIMEOUT_SECONDS):
+    print("--- Starting Batch Demand Forecasting ---")
+
+    start = time.perf_counter()
+    df_series = build_weekly_series(sales_cube, df_abc, categories)
+    print(f"Built {len(df_series)} weekly series x {df_series.shape[1]} weeks in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    df_forecasts, arima_fits, arima_seconds = forecast_all_series(df_series, method=method, max_workers=max_workers, timeout=timeout)
+    seconds = time.perf_counter() - start
+
+    df_forecasts = df_forecasts.merge(df_abc[PRODUCT_COLS + ['ABC_Category']], on=PRODUCT_COLS, how='left')
+    df_models = df_forecasts.drop_duplicates(PRODUCT_COLS).groupby(['Model', 'Status']).size().reset_index(name='Series')
+
+    print(f"\nForecast {len(df_series)} series in {seconds:.2f}s ({len(df_series) / seconds:.1f} series/second)")
+    if arima_fits:
+        print(f"ARIMA: {arima_fits} fits in {arima_seconds:.2f}s ({arima_fits / arima_seconds:.1f} fits/second)")
+    print(df_models.to_markdown(index=False))
+    return df_forecasts
+
+
+def save_batch_forecasts(df_forecasts):
+    write_frame(df_forecasts, "demand_forecasts")
+    df_forecasts.to_csv("/home/ubuntu/demand_forecasts.csv", index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weekly demand forecasts for every product.")
+    parser.add_argument('--categories', default='A,B', help="ABC categories to forecast, or 'all' (default: A,B)")
+    parser.add_argument('--method', choices=['auto', 'arima'], default='auto',
+                        help="auto: vectorized baselines with ARIMA only where they lose badly; arima: ARIMA everywhere")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--timeout', type=float, default=SERIES_TIMEOUT_SECONDS, help="Seconds allowed per series fit")
+    args = parser.parse_args()
+
+    try:
+        sales_cube = SalesCube.load('W', columns=['SalesQuantity'])
+        df_abc = read_frame("abc_analysis_results", columns=['ProductKey'] + PRODUCT_COLS + ['ABC_Category'])
+    except FileNotFoundError:
+        print("Error: One or more cleaned data files not found. Please ensure previous steps are complete.")
+        exit()
+
+    categories = None if args.categories == 'all' else tuple(args.categories.split(','))
+    save_batch_forecasts(run_batch_forecast(sales_cube, df_abc, categories, args.method, args.workers, args.timeout))
+    print("\n--- Batch Demand Forecasting Complete. Results saved to demand_forecasts.csv ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import pandas as pd
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from instrumentation import process_peak_rss_mb
+from run_pipeline import STAGES, parse_param_overrides, resolve_stages, stage_params
+from synthetic_data import make_synthetic_raw, scale_config, write_synthetic_raw
+
+# Throughput and peak memory of every pipeline stage on synthetic data at several scales.
+# For each scale, synthetic_data.py writes the six raw files to a scratch upload directory and the
+# stages of run_pipeline.py run one after the other in this process on the shared frames (nothing
+# is written to the store or the report files). Per stage the benchmark records:
+#   Rows_In         - rows of its input frames (the raw CSV rows for prepare)
+#   Rows_Per_Second - Rows_In / Seconds
+#   Peak_MB         - tracemalloc peak during the stage (Python/NumPy allocations of this process,
+#                     including the frames already held; the ARIMA worker processes of batch_forecast
+#                     are not included)
+#   Stage_MB        - Peak_MB minus the traced memory when the stage started (its working memory)
+#   Process_Peak_RSS_MB - high-water mark of the process RSS (whole run so far) when the stage ends
+# Stage parameters can be overridden as in run_pipeline.py (--param batch_forecast.method=arima).
+# Every run is appended to a JSON-lines history with its parameter overrides, so the throughput of a
+# stage at a scale can be followed over commits; --tolerance fails the run when a stage is slower
+# than in the previous run with the same overrides.
+
+HISTORY_FILE = "/home/ubuntu/benchmark_history.jsonl"
+
+DEFAULT_SCALES = [1, 10]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stage_rows_in(name, frames, raw):
+    if name == 'prepare':
+        return sum(len(df) for df in raw.values())
+    return sum(len(frames[frame_name]) for frame_name in STAGES[name]['inputs']
+               if isinstance(frames.get(frame_name), pd.DataFrame))
+
+
+def benchmark_scale(scale, stage_names=None, years=1, seed=0, trace_memory=True, overrides=None):
+    """Run the stages (and their upstream stages) on synthetic data at `scale`; one row per stage."""
+    overrides = overrides or {}
+    raw = make_synthetic_raw(**scale_config(scale, years), seed=seed)
+    selected = resolve_stages(stage_names, with_deps=True)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="synthetic_upload_") as upload_dir:
+        write_synthetic_raw(raw, upload_dir)
+        # prepare always reads the synthetic files
+        params = stage_params({**overrides, 'prepare': {**overrides.get('prepare', {}), 'upload_dir': upload_dir}})
+        frames, failed = {}, set()
+        for name in selected:
+            stage = STAGES[name]
+            if any(frame_name not in frames for frame_name in stage['inputs']):
+                failed.add(name)
+                results.append({'Stage': name, 'Status': 'skipped'})
+                continue
+
+            rows_in = _stage_rows_in(name, frames, raw)
+            if trace_memory:
+                tracemalloc.reset_peak()
+                start_mb = tracemalloc.get_traced_memory()[0] / 1024 ** 2
+            start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    outputs = stage['func'](frames, params[name])
+                status = 'ok'
+            except Exception as e:
+                outputs, status = {}, f"failed: {e}"
+                failed.add(name)
+            seconds = time.perf_counter() - start
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2 if trace_memory else float('nan')
+            frames.update(outputs)
+            results.append({
+                'Stage': name, 'Status': status, 'Rows_In': rows_in, 'Seconds': seconds,
+                'Rows_Per_Second': rows_in / seconds if seconds > 0 else float('nan'),
+                'Peak_MB': peak_mb, 'Stage_MB': peak_mb - start_mb if trace_memory else float('nan'),
+                'Process_Peak_RSS_MB': process_peak_rss_mb(),
+            })
+
+    df_results = pd.DataFrame(results)
+    df_results.insert(0, 'Scale', f"{scale}x")
+    df_results.insert(1, 'Sales_Rows', len(raw['sales']))
+    return df_results
+
+
+def benchmark_pipeline(scales=DEFAULT_SCALES, stage_names=None, years=1, seed=0, trace_memory=True, overrides=None):
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        # Largest scale last, so the process RSS high-water mark of the smaller scales stays meaningful
+        return pd.concat([benchmark_scale(scale, stage_names, years, seed, trace_memory, overrides)
+                          for scale in sorted(scales)], ignore_index=True)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+
+def load_history(path=HISTORY_FILE):
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def _params_key(params):
+    # Runs recorded before the overrides were kept ran with the default parameters
+    return json.dumps(params if isinstance(params, dict) else {}, sort_keys=True, default=str)
+
+
+def append_history(df_results, path=HISTORY_FILE, overrides=None):
+    """Append the results as one JSON line per (scale, stage), tagged with the run time, commit and overrides."""
+    run = {
+        'Run': datetime.datetime.now().isoformat(timespec='seconds'),
+        'Commit': _git_commit(),
+        'Pandas': pd.__version__,
+        'Params': overrides or {},
+    }
+    with open(path, 'a') as f:
+        for record in df_results.to_dict(orient='records'):
+            f.write(json.dumps({**run, **record}, default=str) + "\n")
+    return run['Run']
+
+
+def compare_with_previous(df_history, run):
+    """Seconds of every (scale, stage) of `run` against the latest earlier run with the same overrides that has it."""
+    df_ok = df_history[df_history['Status'] == 'ok']
+    df_current = df_ok[df_ok['Run'] == run]
+    params = df_ok['Params'] if 'Params' in df_ok else pd.Series(None, index=df_ok.index, dtype=object)
+    params_key = params.map(_params_key)
+    df_ok = df_ok[params_key == params_key[df_current.index].iloc[0]] if not df_current.empty else df_ok
+    df_previous = df_ok[df_ok['Run'] < run].sort_values('Run').groupby(['Scale', 'Stage']).tail(1)
+    df_compare = pd.merge(df_current[['Scale', 'Stage', 'Seconds']],
+                          df_previous[['Scale', 'Stage', 'Seconds', 'Commit']],
+                          on=['Scale', 'Stage'], suffixes=('', '_Previous'))
+    df_compare['Slowdown'] = df_compare['Seconds'] / df_compare['Seconds_Previous'] - 1
+    return df_compare
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and peak memory of the pipeline stages on synthetic data.")
+    parser.add_argument('stages', nargs='*', help=f"Stages to benchmark, with their upstream stages (default: all). Available: {', '.join(STAGES)}")
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help="Comma-separated scale factors of synthetic_data.py (default: 1,10)")
+    parser.add_argument('--years', type=int, default=1, help="Years of synthetic sales and purchases (default: 1)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory-trace', action='store_true', help="Skip the tracemalloc peak (it slows the stages down)")
+    parser.add_argument('--param', action='append', default=[], metavar='STAGE.NAME=VALUE',
+                        help="Override a stage parameter, e.g. batch_forecast.method=arima (repeatable)")
+    parser.add_argument('--history', default=HISTORY_FILE, help=f"JSON-lines history file (default: {HISTORY_FILE})")
+    parser.add_argument('--tolerance', type=float, help="Fail if a stage is slower than in the previous run by more than this (e.g. 0.25)")
+    args = parser.parse_args()
+
+    scales = [float(s) if '.' in s else int(s) for s in args.scales.split(',')]
+    try:
+        overrides = parse_param_overrides(args.param)
+        df_results = benchmark_pipeline(scales, args.stages, args.years, args.seed, not args.no_memory_trace, overrides)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit()
+
+    print("\nPipeline Benchmark:")
+    print(df_results.to_markdown(index=False, floatfmt=".2f"))
+
+    run = append_history(df_results, args.history, overrides)
+    df_compare = compare_with_previous(load_history(args.history), run)
+    if not df_compare.empty:
+        print("\nComparison with the previous run:")
+        print(df_compare.to_markdown(index=False, floatfmt=".2f"))
+    print(f"\n--- Results appended to {args.history} ---")
+
+    if args.tolerance is not None and (df_compare['Slowdown'] > args.tolerance).any():
+        print(f"Regression: a stage is more than {args.tolerance:.0%} slower than in the previous run.")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import pandas as pd
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from data_preparation import prepare_data
+from synthetic_data import make_synthetic_raw, scale_config
+
+
+def benchmark_preparation(scales=(1, 10, 100), repeats=3):
+    results = []
+    for scale in scales:
+        raw = make_synthetic_raw(**scale_config(scale))
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                prepared = prepare_data(raw)
+            timings.append(time.perf_counter() - start)
+        results.append({
+            'Scale': f"{scale}x",
+            'Sales_Rows': len(raw['sales']),
+            'Purchase_Rows': len(raw['purchases']),
+            'Seconds': min(timings),
+            'Sales_Rows_Per_Second': len(raw['sales']) / min(timings),
+        })
+        del prepared
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time data_preparation.prepare_data on synthetic data.")
+    parser.add_argument('--scales', default='1,10,100', help="Comma-separated scale factors (default: 1,10,100)")
+    parser.add_argument('--repeats', type=int, default=3, help="Runs per scale; the fastest is reported (default: 3)")
+    parser.add_argument('--save', help="Write the timings to this JSON file (e.g. to use as a baseline)")
+    parser.add_argument('--baseline', help="JSON file from a previous --save run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown vs the baseline (default: 25%%)")
+    args = parser.parse_args()
+
+    scales = [float(s) if '.' in s else int(s) for s in args.scales.split(',')]
+    df_results = benchmark_preparation(scales, args.repeats)
+
+    print("\nData Preparation Benchmark:")
+    print(df_results.to_markdown(index=False, floatfmt=".2f"))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(df_results.to_dict(orient='records'), f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            df_baseline = pd.DataFrame(json.load(f))
+        df_compare = pd.merge(df_results, df_baseline[['Scale', 'Seconds']], on='Scale', suffixes=('', '_Baseline'))
+        df_compare['Slowdown'] = df_compare['Seconds'] / df_compare['Seconds_Baseline'] - 1
+        print("\nComparison with baseline:")
+        print(df_compare[['Scale', 'Seconds_Baseline', 'Seconds', 'Slowdown']].to_markdown(index=False, floatfmt=".2f"))
+        if (df_compare['Slowdown'] > args.tolerance).any():
+            print(f"Regression: data preparation is more than {args.tolerance:.0%} slower than the baseline.")
+            exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,103 +1,253 @@
 import pandas as pd
+import json
 import os
+from data_store import STORE_DIR, write_frame
+from dimensions import assign_keys, build_dimensions
+from instrumentation import run_report, step
+from sales_cube import CUBE_DATASETS, build_sales_cubes, save_sales_cubes
 
 # Directory where the uploaded files are located
 upload_dir = "/home/ubuntu/upload"
 
-# Load DataFrames
-try:
-    df_beg_inv = pd.read_csv(os.path.join(upload_dir, "BegInvFINAL12312016.csv"))
-    df_end_inv = pd.read_csv(os.path.join(upload_dir, "EndInvFINAL12312016.csv"))
-    df_purchases = pd.read_csv(os.path.join(upload_dir, "PurchasesFINAL12312016.csv"))
-    df_sales = pd.read_csv(os.path.join(upload_dir, "SalesFINAL12312016.csv"))
-    df_prices = pd.read_csv(os.path.join(upload_dir, "2017PurchasePricesDec.csv"))
-    df_invoice = pd.read_csv(os.path.join(upload_dir, "InvoicePurchases12312016.csv"))
-except Exception as e:
-    print(f"Error loading files: {e}")
-    exit()
-
-print("--- Starting Data Cleaning and Preparation ---")
-
-# --- 1. Inventory Data Cleaning and Merging ---
-# Rename columns for clarity and merging
-df_beg_inv = df_beg_inv.rename(columns={'onHand': 'Beg_onHand', 'Price': 'Beg_Price'})
-df_end_inv = df_end_inv.rename(columns={'onHand': 'End_onHand', 'Price': 'End_Price'})
-
-# Handle missing 'City' in EndInvFINAL12312016.csv by filling from BegInvFINAL12312016.csv
-city_map = df_beg_inv[['Store', 'City']].drop_duplicates().set_index('Store')['City'].to_dict()
-df_end_inv['City'] = df_end_inv.apply(lambda row: row['City'] if pd.notna(row['City']) else city_map.get(row['Store']), axis=1)
-
-# Merge beginning and ending inventory to calculate consumption/turnover
-inventory_cols = ['InventoryId', 'Store', 'City', 'Brand', 'Description', 'Size']
-df_inventory = pd.merge(
-    df_beg_inv[inventory_cols + ['Beg_onHand', 'Beg_Price']],
-    df_end_inv[inventory_cols + ['End_onHand', 'End_Price']],
-    on=inventory_cols,
-    how='outer'
-).fillna(0)
-
-# Calculate Average Inventory Price (simple average of beg and end price)
-df_inventory['Avg_Price'] = (df_inventory['Beg_Price'] + df_inventory['End_Price']) / 2
-
-# --- 2. Sales Data Cleaning ---
-# Convert SalesDate to datetime
-df_sales['SalesDate'] = pd.to_datetime(df_sales['SalesDate'])
-# Calculate Gross Margin (assuming SalesDollars is Revenue and we need a cost)
-# We will use the PurchasePrice from the PurchasesFINAL data later for a more accurate COGS.
-# For now, we'll focus on clean sales data.
-
-# --- 3. Purchases Data Cleaning ---
-# Convert date columns to datetime
-date_cols = ['PODate', 'ReceivingDate', 'InvoiceDate', 'PayDate']
-for col in date_cols:
-    df_purchases[col] = pd.to_datetime(df_purchases[col], errors='coerce')
-
-# Handle missing 'Size' in PurchasesFINAL12312016.csv by filling from SalesFINAL12312016.csv
-size_map = df_sales[['Brand', 'Size']].drop_duplicates().set_index('Brand')['Size'].to_dict()
-df_purchases['Size'] = df_purchases.apply(lambda row: row['Size'] if pd.notna(row['Size']) else size_map.get(row['Brand']), axis=1)
-df_purchases = df_purchases.dropna(subset=['Size']) # Drop remaining few NaNs if any
-
-# --- 4. Lead Time Calculation (Preliminary) ---
-# Calculate Lead Time in days: ReceivingDate - PODate
-df_purchases['LeadTime_Days'] = (df_purchases['ReceivingDate'] - df_purchases['PODate']).dt.days
-
-# --- 5. Final Merged Data for Analysis ---
-# Merge Sales and Inventory to get a comprehensive view of product performance
-# We will use the InventoryId to link sales to the product master data (inventory)
-df_sales_master = pd.merge(
-    df_sales,
-    df_inventory[['InventoryId', 'Beg_onHand', 'End_onHand', 'Avg_Price']],
-    on='InventoryId',
-    how='left'
-)
-
-# Calculate Cost of Goods Sold (COGS) for sales.
-# This is a simplification: using the average purchase price from the Purchases data.
-# First, calculate the average purchase price per Brand/Size from the Purchases data.
-df_avg_purchase_price = df_purchases.groupby(['Brand', 'Size'])['PurchasePrice'].mean().reset_index(name='Avg_PurchasePrice')
-
-# Merge the average purchase price into the sales master data
-df_sales_master = pd.merge(
-    df_sales_master,
-    df_avg_purchase_price,
-    on=['Brand', 'Size'],
-    how='left'
-)
-
-# Fill any remaining missing Avg_PurchasePrice with the SalesPrice as a last resort, or 0
-df_sales_master['Avg_PurchasePrice'] = df_sales_master['Avg_PurchasePrice'].fillna(0)
-
-# Calculate COGS and Gross Profit
-df_sales_master['COGS'] = df_sales_master['SalesQuantity'] * df_sales_master['Avg_PurchasePrice']
-df_sales_master['GrossProfit'] = df_sales_master['SalesDollars'] - df_sales_master['COGS']
-
-# Save the cleaned and merged dataframes for subsequent phases
-df_sales_master.to_csv("/home/ubuntu/df_sales_master.csv", index=False)
-df_purchases.to_csv("/home/ubuntu/df_purchases_cleaned.csv", index=False)
-df_inventory.to_csv("/home/ubuntu/df_inventory_master.csv", index=False)
-
-print(f"Cleaned Sales Master Data Shape: {df_sales_master.shape}")
-print(f"Cleaned Purchases Data Shape: {df_purchases.shape}")
-print(f"Cleaned Inventory Master Data Shape: {df_inventory.shape}")
-print("--- Data Cleaning and Preparation Complete ---")
-
+# Last SalesDate / ReceivingDate processed, used by incremental_preparation.py
+WATERMARK_FILE = os.path.join(STORE_DIR, "prep_watermark.json")
+
+
+# Raw file of each frame of load_raw_data()
+RAW_FILES = {
+    'beg_inv': "BegInvFINAL12312016.csv",
+    'end_inv': "EndInvFINAL12312016.csv",
+    'purchases': "PurchasesFINAL12312016.csv",
+    'sales': "SalesFINAL12312016.csv",
+    'prices': "2017PurchasePricesDec.csv",
+    'invoice': "InvoicePurchases12312016.csv",
+}
+
+
+def load_raw_data(upload_dir=upload_dir):
+    # Load DataFrames
+    raw = {}
+    for name, file_name in RAW_FILES.items():
+        with step(f"load_csv:{file_name}") as s:
+            raw[name] = pd.read_csv(os.path.join(upload_dir, file_name))
+            s.rows_out = len(raw[name])
+    return raw
+
+
+def build_inventory(df_beg_inv, df_end_inv):
+    # Rename columns for clarity and merging
+    df_beg_inv = df_beg_inv.rename(columns={'onHand': 'Beg_onHand', 'Price': 'Beg_Price'})
+    df_end_inv = df_end_inv.rename(columns={'onHand': 'End_onHand', 'Price': 'End_Price'})
+
+    # Handle missing 'City' in EndInvFINAL12312016.csv by filling from BegInvFINAL12312016.csv
+    city_map = df_beg_inv[['Store', 'City']].drop_duplicates().set_index('Store')['City'].to_dict()
+    df_end_inv['City'] = df_end_inv['City'].fillna(df_end_inv['Store'].map(city_map))
+
+    # Merge beginning and ending inventory to calculate consumption/turnover
+    inventory_cols = ['InventoryId', 'Store', 'City', 'Brand', 'Description', 'Size']
+    df_inventory = pd.merge(
+        df_beg_inv[inventory_cols + ['Beg_onHand', 'Beg_Price']],
+        df_end_inv[inventory_cols + ['End_onHand', 'End_Price']],
+        on=inventory_cols,
+        how='outer'
+    ).fillna(0)
+
+    # Calculate Average Inventory Price (simple average of beg and end price)
+    df_inventory['Avg_Price'] = (df_inventory['Beg_Price'] + df_inventory['End_Price']) / 2
+    return df_inventory
+
+
+def clean_purchases(df_purchases, size_map):
+    # Convert date columns to datetime
+    date_cols = ['PODate', 'ReceivingDate', 'InvoiceDate', 'PayDate']
+    for col in date_cols:
+        df_purchases[col] = pd.to_datetime(df_purchases[col], errors='coerce')
+
+    # Handle missing 'Size' in PurchasesFINAL12312016.csv by filling from SalesFINAL12312016.csv
+    df_purchases['Size'] = df_purchases['Size'].fillna(df_purchases['Brand'].map(size_map))
+    df_purchases = df_purchases.dropna(subset=['Size']) # Drop remaining few NaNs if any
+
+    # Calculate Lead Time in days: ReceivingDate - PODate
+    # (float, so batches with and without missing dates share one schema when appended to the store)
+    df_purchases['LeadTime_Days'] = (df_purchases['ReceivingDate'] - df_purchases['PODate']).dt.days.astype('float64')
+    return df_purchases
+
+
+def purchase_price_aggregates(df_purchases):
+    # Running sum and count of PurchasePrice per Brand/Size, so the average can be updated incrementally
+    return df_purchases.groupby(['Brand', 'Size'], observed=True).agg(
+        PurchasePrice_Sum=('PurchasePrice', 'sum'),
+        PurchasePrice_Count=('PurchasePrice', 'count')
+    ).reset_index()
+
+
+def combine_price_aggregates(df_price_aggregates, df_new_purchases):
+    # Add the sums and counts of new purchase lines to the running aggregates
+    df_combined = pd.concat([df_price_aggregates, purchase_price_aggregates(df_new_purchases)], ignore_index=True)
+    return df_combined.groupby(['Brand', 'Size'], observed=True).agg(
+        PurchasePrice_Sum=('PurchasePrice_Sum', 'sum'),
+        PurchasePrice_Count=('PurchasePrice_Count', 'sum')
+    ).reset_index()
+
+
+def subtract_price_aggregates(df_price_aggregates, df_removed_purchases):
+    # Take the sums and counts of purchase lines removed from the store out of the running aggregates
+    df_removed = purchase_price_aggregates(df_removed_purchases)
+    df_removed[['PurchasePrice_Sum', 'PurchasePrice_Count']] *= -1
+    df_combined = pd.concat([df_price_aggregates, df_removed], ignore_index=True).groupby(['Brand', 'Size'], observed=True).agg(
+        PurchasePrice_Sum=('PurchasePrice_Sum', 'sum'),
+        PurchasePrice_Count=('PurchasePrice_Count', 'sum')
+    ).reset_index()
+    return df_combined[df_combined['PurchasePrice_Count'] > 0].reset_index(drop=True)
+
+
+def enrich_sales(df_sales, df_inventory, df_price_aggregates):
+    # Merge Sales and Inventory to get a comprehensive view of product performance
+    # We will use the InventoryId to link sales to the product master data (inventory)
+    df_sales_master = pd.merge(
+        df_sales,
+        df_inventory[['InventoryId', 'Beg_onHand', 'End_onHand', 'Avg_Price']],
+        on='InventoryId',
+        how='left'
+    )
+    # Sales of unknown InventoryIds get NaN here; keep these columns float in every batch
+    df_sales_master = df_sales_master.astype({'Beg_onHand': 'float64', 'End_onHand': 'float64'})
+
+    # Calculate Cost of Goods Sold (COGS) for sales.
+    # This is a simplification: using the average purchase price per Brand/Size from the Purchases data.
+    df_avg_purchase_price = df_price_aggregates[['Brand', 'Size']].assign(
+        Avg_PurchasePrice=df_price_aggregates['PurchasePrice_Sum'] / df_price_aggregates['PurchasePrice_Count']
+    )
+
+    # Merge the average purchase price into the sales master data
+    df_sales_master = pd.merge(
+        df_sales_master,
+        df_avg_purchase_price,
+        on=['Brand', 'Size'],
+        how='left'
+    )
+
+    # Fill any remaining missing Avg_PurchasePrice with the SalesPrice as a last resort, or 0
+    df_sales_master['Avg_PurchasePrice'] = df_sales_master['Avg_PurchasePrice'].fillna(0)
+
+    # Calculate COGS and Gross Profit
+    df_sales_master['COGS'] = df_sales_master['SalesQuantity'] * df_sales_master['Avg_PurchasePrice']
+    df_sales_master['GrossProfit'] = df_sales_master['SalesDollars'] - df_sales_master['COGS']
+    return df_sales_master
+
+
+def prepare_data(raw):
+    print("--- Starting Data Cleaning and Preparation ---")
+
+    df_purchases = raw['purchases'].copy()
+    df_sales = raw['sales'].copy()
+
+    # --- 1. Inventory Data Cleaning and Merging ---
+    with step("merge_inventory", rows_in=len(raw['beg_inv']) + len(raw['end_inv'])) as s:
+        df_inventory = build_inventory(raw['beg_inv'], raw['end_inv'])
+        s.rows_out = len(df_inventory)
+
+    # --- 2. Sales Data Cleaning ---
+    # Convert SalesDate to datetime
+    with step("parse_sales_dates", rows_in=len(df_sales)) as s:
+        df_sales['SalesDate'] = pd.to_datetime(df_sales['SalesDate'])
+        s.rows_out = len(df_sales)
+    # Calculate Gross Margin (assuming SalesDollars is Revenue and we need a cost)
+    # We will use the PurchasePrice from the PurchasesFINAL data later for a more accurate COGS.
+    # For now, we'll focus on clean sales data.
+
+    # --- 3. Purchases Data Cleaning ---
+    # Missing Sizes are filled from the Brand -> Size pairs seen in the sales data
+    df_brand_sizes = df_sales[['Brand', 'Size']].drop_duplicates()
+    size_map = df_brand_sizes.set_index('Brand')['Size'].to_dict()
+
+    # --- 4. Lead Time Calculation (Preliminary) ---
+    with step("clean_purchases", rows_in=len(df_purchases)) as s:
+        df_purchases = clean_purchases(df_purchases, size_map)
+        s.rows_out = len(df_purchases)
+
+    # --- 5. Final Merged Data for Analysis ---
+    with step("groupby_purchase_prices", rows_in=len(df_purchases)) as s:
+        df_price_aggregates = purchase_price_aggregates(df_purchases)
+        s.rows_out = len(df_price_aggregates)
+    with step("merge_sales_master", rows_in=len(df_sales)) as s:
+        df_sales_master = enrich_sales(df_sales, df_inventory, df_price_aggregates)
+        s.rows_out = len(df_sales_master)
+
+    # --- 6. Surrogate keys ---
+    # Products, stores and vendors become int32 keys; their labels move to the dimension tables.
+    # InventoryId is only needed to link sales to inventory above, the inventory master keeps it.
+    with step("assign_keys", rows_in=len(df_sales_master) + len(df_purchases) + len(df_inventory)) as s:
+        dims = build_dimensions([df_inventory, df_sales_master, df_purchases])
+        df_sales_master = assign_keys(df_sales_master.drop(columns='InventoryId'), dims)
+        df_purchases = assign_keys(df_purchases.drop(columns='InventoryId'), dims)
+        df_inventory = assign_keys(df_inventory, dims)
+        s.rows_out = sum(len(df) for df in dims.values())
+
+    print(f"Cleaned Sales Master Data Shape: {df_sales_master.shape}")
+    print(f"Cleaned Purchases Data Shape: {df_purchases.shape}")
+    print(f"Cleaned Inventory Master Data Shape: {df_inventory.shape}")
+
+    # --- 7. Daily / weekly sales cube for rollups and per-SKU series ---
+    with step("groupby_sales_cubes", rows_in=len(df_sales_master)) as s:
+        cubes = build_sales_cubes(df_sales_master)
+        s.rows_out = sum(len(df) for df in cubes.values())
+
+    return {
+        'df_sales_master': df_sales_master,
+        'df_purchases_cleaned': df_purchases,
+        'df_inventory_master': df_inventory,
+        **dims,
+        # Running state for incremental_preparation.py
+        'purchase_price_aggregates': df_price_aggregates,
+        'brand_size_lookup': df_brand_sizes,
+        **cubes,
+    }
+
+
+def load_watermark(path=WATERMARK_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    return {key: pd.Timestamp(value) for key, value in state.items()}
+
+
+def save_watermark(last_sales_date, last_receiving_date, path=WATERMARK_FILE):
+    with open(path, 'w') as f:
+        json.dump({
+            'last_sales_date': pd.Timestamp(last_sales_date).isoformat(),
+            'last_receiving_date': pd.Timestamp(last_receiving_date).isoformat(),
+        }, f, indent=2)
+
+
+def save_prepared_data(prepared):
+    # Save the cleaned and merged dataframes to the columnar store for subsequent phases
+    # (the cube datasets are written with small row groups for product-filtered reads)
+    cubes = {name: df for name, df in prepared.items() if name in CUBE_DATASETS}
+    for name, df in prepared.items():
+        if name not in cubes:
+            with step(f"write:{name}", rows_in=len(df)):
+                write_frame(df, name)
+    with step("write:sales_cubes", rows_in=sum(len(df) for df in cubes.values())):
+        save_sales_cubes(cubes)
+
+    # Record how far the sales and purchases have been processed
+    save_watermark(prepared['df_sales_master']['SalesDate'].max(),
+                   prepared['df_purchases_cleaned']['ReceivingDate'].max())
+
+
+def main():
+    try:
+        raw = load_raw_data()
+    except Exception as e:
+        print(f"Error loading files: {e}")
+        exit()
+
+    save_prepared_data(prepare_data(raw))
+    print("--- Data Cleaning and Preparation Complete ---")
+
+
+if __name__ == "__main__":
+    with run_report("data_preparation"):
+        main()
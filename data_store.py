@@ -0,0 +1,120 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import glob
+import os
+import shutil
+import sys
+
+# Directory where the typed, columnar intermediate datasets are stored.
+# Each dataset lives in its own sub-directory as one or more Parquet part files.
+# Override with the PIPELINE_STORE_DIR environment variable (e.g. a scratch store for the tests).
+STORE_DIR = os.environ.get('PIPELINE_STORE_DIR', "/home/ubuntu/store")
+
+# Directory for the optional CSV copies (the legacy hand-off location)
+CSV_EXPORT_DIR = "/home/ubuntu"
+
+# Set to True to also write a CSV copy of every dataset saved to the store
+EXPORT_CSV = False
+
+# Repeated string columns that are dictionary-encoded (pandas 'category').
+# Brand is already a compact integer code, so it is kept as an integer column.
+CATEGORICAL_COLUMNS = ['Description', 'Size', 'VendorName', 'City']
+
+# Parquet compression codec for the part files
+COMPRESSION = 'zstd'
+
+
+def dataset_path(name, store_dir=STORE_DIR):
+    return os.path.join(store_dir, name)
+
+
+def frame_exists(name, store_dir=STORE_DIR):
+    return os.path.isdir(dataset_path(name, store_dir))
+
+
+def encode_categoricals(df):
+    """Convert the repeated string columns of df to pandas categoricals."""
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def _to_table(df, schema=None):
+    table = pa.Table.from_pandas(encode_categoricals(df.copy()), schema=schema, preserve_index=False)
+    if schema is None:
+        # Use int32 dictionary indices so later parts with more categories share the schema
+        schema = pa.schema([
+            field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+            if pa.types.is_dictionary(field.type) else field
+            for field in table.schema
+        ], metadata=table.schema.metadata)
+        table = table.cast(schema)
+    return table
+
+
+def _part_files(path):
+    return sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+
+
+def write_frame(df, name, store_dir=STORE_DIR, export_csv=EXPORT_CSV, row_group_size=None):
+    """
+    Save df as the dataset `name`, replacing any previous version.
+    Smaller row groups let filtered reads skip more data when df is sorted by the filter columns.
+    """
+    path = dataset_path(name, store_dir)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    pq.write_table(_to_table(df), os.path.join(path, "part-00000.parquet"), compression=COMPRESSION,
+                   row_group_size=row_group_size)
+
+    if export_csv:
+        export_frame_csv(name, store_dir=store_dir)
+    return path
+
+
+def append_frame(df, name, store_dir=STORE_DIR):
+    """Add the rows of df to the dataset `name` as a new part file (created if missing)."""
+    path = dataset_path(name, store_dir)
+    parts = _part_files(path)
+    if not parts:
+        return write_frame(df, name, store_dir, export_csv=False)
+
+    # Cast to the schema of the existing parts so the dataset stays readable as one table
+    table = _to_table(df, schema=pq.read_schema(parts[0]))
+    pq.write_table(table, os.path.join(path, f"part-{len(parts):05d}.parquet"), compression=COMPRESSION)
+    return path
+
+
+def delete_frame(name, store_dir=STORE_DIR):
+    """Remove the dataset `name` (no-op if missing)."""
+    shutil.rmtree(dataset_path(name, store_dir), ignore_errors=True)
+
+
+def read_frame(name, columns=None, filters=None, store_dir=STORE_DIR):
+    """
+    Load the dataset `name`, reading only `columns` and only the rows matching
+    `filters` (pyarrow filter syntax, e.g. [('SalesDate', '>=', pd.Timestamp('2016-06-01'))]).
+    """
+    path = dataset_path(name, store_dir)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"Dataset '{name}' not found in {store_dir}")
+
+    table = pq.read_table(path, columns=columns, filters=filters)
+    return table.to_pandas()
+
+
+def export_frame_csv(name, store_dir=STORE_DIR, export_dir=CSV_EXPORT_DIR):
+    """Write a CSV copy of the dataset `name` to export_dir/<name>.csv."""
+    csv_path = os.path.join(export_dir, f"{name}.csv")
+    read_frame(name, store_dir=store_dir).to_csv(csv_path, index=False)
+    return csv_path
+
+
+if __name__ == "__main__":
+    # Usage: python3 data_store.py df_sales_master [df_purchases_cleaned ...]
+    for dataset_name in sys.argv[1:]:
+        print(f"Exported {dataset_name} to {export_frame_csv(dataset_name)}")
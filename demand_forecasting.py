@@ -1,81 +1,113 @@
 import pandas as pd
 from statsmodels.tsa.arima.model import ARIMA
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import os
+from data_store import read_frame
+from forecast_models import select_models
+from instrumentation import run_report, step
+from sales_cube import SalesCube
 
-# Load the cleaned sales master data
-try:
-    df_sales_master = pd.read_csv("/home/ubuntu/df_sales_master.csv")
-except FileNotFoundError:
-    print("Error: df_sales_master.csv not found. Please ensure data preparation is complete.")
-    exit()
-
-print("--- Starting Demand Forecasting ---")
-
-# 1. Aggregate daily sales quantity for the entire company (for a general trend)
-df_sales_master['SalesDate'] = pd.to_datetime(df_sales_master['SalesDate'])
-df_daily_sales = df_sales_master.groupby('SalesDate')['SalesQuantity'].sum().reset_index()
-df_daily_sales = df_daily_sales.set_index('SalesDate')
-
-# Resample to weekly sales for smoother time series and better model performance
-df_weekly_sales = df_daily_sales['SalesQuantity'].resample('W').sum()
-
-# 2. Select a high-value product (Category A) for a more specific forecast
-# We will use the product with the highest Gross Profit from the ABC analysis
-try:
-    df_abc = pd.read_csv("/home/ubuntu/abc_analysis_results.csv")
-    top_product = df_abc.loc[df_abc['ABC_Category'] == 'A'].sort_values(by='TotalGrossProfit', ascending=False).iloc[0]
-    top_brand = top_product['Brand']
-    top_description = top_product['Description']
-    top_size = top_product['Size']
-    print(f"Forecasting for Top Product (A-Category): Brand {top_brand}, {top_description} ({top_size})")
-
-    df_product_sales = df_sales_master[
-        (df_sales_master['Brand'] == top_brand) &
-        (df_sales_master['Description'] == top_description) &
-        (df_sales_master['Size'] == top_size)
-    ]
-    df_product_daily_sales = df_product_sales.groupby('SalesDate')['SalesQuantity'].sum().reset_index()
-    df_product_daily_sales = df_product_daily_sales.set_index('SalesDate')
-    df_product_weekly_sales = df_product_daily_sales['SalesQuantity'].resample('W').sum()
-
-except Exception as e:
-    print(f"Could not load ABC results or select top product. Falling back to overall sales. Error: {e}")
-    df_product_weekly_sales = df_weekly_sales
-
-# 3. Time Series Modeling (ARIMA)
-# We will use a simple ARIMA(1, 1, 1) model as a starting point for demonstration
-# The data is from 2016, so we will forecast for the first 4 weeks of 2017 (4 steps)
-try:
-    # Fit the ARIMA model
-    model = ARIMA(df_product_weekly_sales, order=(1, 1, 1))
-    model_fit = model.fit()
-
-    # Forecast the next 4 weeks
+
+def run_demand_forecast(sales_cube, df_abc):
+    print("--- Starting Demand Forecasting ---")
+
+    # 1. Weekly sales quantity for the entire company (for a general trend)
+    # Weekly series are read from the pre-aggregated weekly sales cube (SalesCube, grain 'W')
+    with step("series:company_weekly", rows_in=len(sales_cube.frame)) as s:
+        df_weekly_sales = sales_cube.series()
+        s.rows_out = len(df_weekly_sales)
+
+    # 2. Select a high-value product (Category A) for a more specific forecast
+    # We will use the product with the highest Gross Profit from the ABC analysis
+    try:
+        top_product = df_abc.loc[df_abc['ABC_Category'] == 'A'].sort_values(by='TotalGrossProfit', ascending=False).iloc[0]
+        top_brand = top_product['Brand']
+        top_description = top_product['Description']
+        top_size = top_product['Size']
+        print(f"Forecasting for Top Product (A-Category): Brand {top_brand}, {top_description} ({top_size})")
+
+        with step("series:top_product_weekly") as s:
+            df_product_weekly_sales = sales_cube.series(int(top_product['ProductKey']))
+            s.rows_out = len(df_product_weekly_sales)
+        if df_product_weekly_sales.empty:
+            raise ValueError(f"no sales found for Brand {top_brand}")
+
+    except Exception as e:
+        print(f"Could not load ABC results or select top product. Falling back to overall sales. Error: {e}")
+        top_description = 'All Products'
+        df_product_weekly_sales = df_weekly_sales
+
+    # 3. Time Series Modeling (ARIMA)
+    # We will use a simple ARIMA(1, 1, 1) model as a starting point for demonstration
+    # The data is from 2016, so we will forecast for the first 4 weeks of 2017 (4 steps)
     forecast_steps = 4
-    forecast = model_fit.forecast(steps=forecast_steps)
+    try:
+        with step("fit:arima", rows_in=len(df_product_weekly_sales)) as s:
+            # Fit the ARIMA model
+            model = ARIMA(df_product_weekly_sales, order=(1, 1, 1))
+            model_fit = model.fit()
+
+            # Forecast the next 4 weeks
+            forecast_values = model_fit.forecast(steps=forecast_steps).values
+            s.rows_out = len(forecast_values)
+
+    except Exception as e:
+        print(f"An error occurred during ARIMA modeling: {e}")
+        # Fall back to the best of the vectorized baseline models on this series
+        with step("fit:baselines", rows_in=len(df_product_weekly_sales)) as s:
+            forecasts, model_names, _, _ = select_models(df_product_weekly_sales.to_numpy()[None, :], forecast_steps)
+            forecast_values = forecasts[0]
+            s.rows_out = len(forecast_values)
+        print(f"Using the {model_names[0]} baseline forecast instead")
 
     # Create a DataFrame for the forecast results
     forecast_index = pd.date_range(start=df_product_weekly_sales.index[-1] + pd.Timedelta(days=1), periods=forecast_steps, freq='W')
-    df_forecast = pd.DataFrame({'Forecasted_SalesQuantity': forecast.values.round(0)}, index=forecast_index)
+    df_forecast = pd.DataFrame({'Forecasted_SalesQuantity': forecast_values.round(0)}, index=forecast_index)
 
     print("\nForecasted Weekly Sales Quantity (Next 4 Weeks):")
     print(df_forecast.to_markdown(numalign="left", stralign="left"))
 
+    # The history is named after the forecasted product, for the plot title
+    return df_forecast, df_product_weekly_sales.rename(top_description)
+
+
+def save_forecast_plot(df_forecast, history):
     # 4. Plotting the results
-    plt.figure(figsize=(12, 6))
-    plt.plot(df_product_weekly_sales, label='Historical Weekly Sales')
-    plt.plot(df_forecast, label='Forecasted Weekly Sales', color='red')
-    plt.title(f'Demand Forecast for {top_description} (Weekly)')
-    plt.xlabel('Date')
-    plt.ylabel('Sales Quantity')
-    plt.legend()
-    plt.grid(True)
-    plt.savefig('/home/ubuntu/demand_forecast_plot.png')
-    plt.close()
+    # (Figure API instead of pyplot so the plot can be drawn from a pipeline worker thread)
+    with step("write_plot:demand_forecast_plot", rows_in=len(history) + len(df_forecast)):
+        fig = Figure(figsize=(12, 6))
+        ax = fig.subplots()
+        ax.plot(history, label='Historical Weekly Sales')
+        ax.plot(df_forecast, label='Forecasted Weekly Sales', color='red')
+        ax.set_title(f'Demand Forecast for {history.name} (Weekly)')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Sales Quantity')
+        ax.legend()
+        ax.grid(True)
+        fig.savefig('/home/ubuntu/demand_forecast_plot.png')
+
+
+def main():
+    # Load the weekly sales cube built during data preparation
+    try:
+        with step("load:sales_cube_weekly") as s:
+            sales_cube = SalesCube.load('W', columns=['SalesQuantity'])
+            s.rows_out = len(sales_cube.frame)
+    except FileNotFoundError:
+        print("Error: sales_cube_weekly not found. Please ensure data preparation is complete.")
+        exit()
+
+    try:
+        with step("load:abc_analysis_results"):
+            df_abc = read_frame("abc_analysis_results", columns=['ProductKey', 'Brand', 'Description', 'Size', 'TotalGrossProfit', 'ABC_Category'])
+    except FileNotFoundError:
+        # run_demand_forecast falls back to the overall sales series
+        df_abc = pd.DataFrame(columns=['ProductKey', 'Brand', 'Description', 'Size', 'TotalGrossProfit', 'ABC_Category'])
 
+    save_forecast_plot(*run_demand_forecast(sales_cube, df_abc))
     print("\n--- Demand Forecasting Complete. Results saved to demand_forecast_plot.png ---")
 
-except Exception as e:
-    print(f"An error occurred during ARIMA modeling: {e}")
 
+if __name__ == "__main__":
+    with run_report("demand_forecasting"):
+        main()
@@ -0,0 +1,115 @@
+import pandas as pd
+import numpy as np
+
+from data_store import read_frame, write_frame
+
+# Dimension tables with dense int32 surrogate keys for products, stores and vendors.
+# Keys are assigned once during data preparation; the fact tables (df_sales_master,
+# df_purchases_cleaned, df_inventory_master) carry the keys instead of the label columns, so every
+# later merge / groupby runs on integers. Labels are decoded back only for the reports.
+# Keys are stable: new members (incremental or streaming preparation) get the next free keys.
+
+DIMENSIONS = {
+    'dim_product': {'key': 'ProductKey', 'columns': ['Brand', 'Description', 'Size'], 'attributes': []},
+    'dim_store': {'key': 'StoreKey', 'columns': ['Store'], 'attributes': ['City']},
+    'dim_vendor': {'key': 'VendorKey', 'columns': ['VendorNo', 'VendorName'], 'attributes': []},
+}
+
+# Source columns named differently in some raw files
+COLUMN_ALIASES = {'VendorNumber': 'VendorNo'}
+
+KEY_COLUMNS = {spec['key']: name for name, spec in DIMENSIONS.items()}
+
+
+def _natural_frame(df, name):
+    # The dimension's columns of df (aliases resolved), or None if df does not carry them
+    spec = DIMENSIONS[name]
+    df = df.rename(columns={alias: col for alias, col in COLUMN_ALIASES.items() if alias in df.columns and col not in df.columns})
+    if not all(col in df.columns for col in spec['columns']):
+        return None
+    return df[spec['columns'] + [col for col in spec['attributes'] if col in df.columns]]
+
+
+def update_dimension(df_dim, df_source, name):
+    """Add the members of df_source missing from df_dim, with the next free keys (sorted by label)."""
+    spec = DIMENSIONS[name]
+    df_members = _natural_frame(df_source, name)
+    if df_members is None:
+        return df_dim
+    df_members = df_members.drop_duplicates(subset=spec['columns'])
+
+    if df_dim is not None and len(df_dim):
+        known = pd.MultiIndex.from_frame(df_dim[spec['columns']].astype(object))
+        df_members = df_members[~pd.MultiIndex.from_frame(df_members[spec['columns']].astype(object)).isin(known)]
+        next_key = int(df_dim[spec['key']].max()) + 1
+    else:
+        next_key = 0
+    if df_members.empty:
+        return df_dim
+
+    df_new = df_members.sort_values(spec['columns']).reset_index(drop=True)
+    df_new.insert(0, spec['key'], np.arange(next_key, next_key + len(df_new), dtype='int32'))
+    if df_dim is None or not len(df_dim):
+        return df_new
+    return pd.concat([df_dim, df_new], ignore_index=True)
+
+
+def build_dimensions(sources, dims=None):
+    """
+    Dimension tables covering every member of the source frames (extends `dims` if given).
+    Pass the inventory first: it is the only source carrying the store attributes (City).
+    """
+    dims = dict(dims or {})
+    for name in DIMENSIONS:
+        for df_source in sources:
+            dims[name] = update_dimension(dims.get(name), df_source, name)
+    return dims
+
+
+def assign_keys(df, dims, drop_labels=True):
+    """Add the surrogate key of every dimension df carries; drop the label columns if drop_labels."""
+    keys = {}
+    drop = []
+    for name, spec in DIMENSIONS.items():
+        df_members = _natural_frame(df, name)
+        if df_members is None or dims.get(name) is None:
+            continue
+        index = pd.MultiIndex.from_frame(dims[name][spec['columns']].astype(object))
+        positions = index.get_indexer(pd.MultiIndex.from_frame(df_members[spec['columns']].astype(object)))
+        if (positions < 0).any():
+            raise KeyError(f"{(positions < 0).sum()} rows have members missing from {name}")
+        keys[spec['key']] = dims[name][spec['key']].to_numpy()[positions]
+        drop += [col for col in df.columns if col in spec['columns'] + spec['attributes'] or COLUMN_ALIASES.get(col) in spec['columns']]
+
+    df = df.drop(columns=drop) if drop_labels else df
+    # Keys first, in DIMENSIONS order
+    return pd.concat([pd.DataFrame(keys, index=df.index), df], axis=1)
+
+
+def decode(df, dims, columns=None, keep_keys=False):
+    """
+    Replace each key column of df with its dimension's label columns (same position), or insert
+    the labels right after the key if keep_keys. `dims` maps dimension name -> table.
+    `columns` limits the labels added (default: the natural columns of each dimension).
+    """
+    for key, name in KEY_COLUMNS.items():
+        if key not in df.columns or name not in dims:
+            continue
+        spec = DIMENSIONS[name]
+        labels = spec['columns'] if columns is None else [col for col in spec['columns'] + spec['attributes'] if col in columns]
+        # Keys are dense, so the dimension indexed by key is a direct position lookup
+        df_dim = dims[name].set_index(spec['key']).reindex(np.arange(int(dims[name][spec['key']].max()) + 1))
+        positions = df[key].to_numpy()
+        df_labels = pd.DataFrame({col: df_dim[col].take(positions).array for col in labels}, index=df.index)
+        at = df.columns.get_loc(key) + (1 if keep_keys else 0)
+        df = pd.concat([df.iloc[:, :at], df_labels, df.iloc[:, at + (0 if keep_keys else 1):]], axis=1)
+    return df
+
+
+def load_dimensions(names=None):
+    return {name: read_frame(name) for name in (names or DIMENSIONS)}
+
+
+def save_dimensions(dims):
+    for name, df_dim in dims.items():
+        write_frame(df_dim, name)
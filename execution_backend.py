@@ -0,0 +1,312 @@
+import pandas as pd
+import numpy as np
+import multiprocessing
+import operator
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow.parquet as pq
+
+from data_store import CATEGORICAL_COLUMNS, STORE_DIR, _part_files, dataset_path, read_frame
+
+# Pluggable engine behind the grouped aggregations of the analytics scripts.
+# group_aggregate(source, keys, aggs) takes pandas-style named aggregations
+#   {output_column: (input_column, func)}, func in AGG_FUNCS
+# and returns one row per group with the keys as columns, sorted by the keys.
+# `source` is either an in-memory DataFrame or the name of a store dataset; with a dataset name
+# the backend reads only the columns it needs from the Parquet parts itself (duckdb and chunked
+# never load the table into pandas), so the scripts pass dataset names rather than loaded frames.
+# Optional arguments:
+#   derive  - input columns computed row by row before aggregating, {column: (op, column_a, column_b)}
+#             with op in DERIVE_OPS
+#   filters - rows to keep, [(column, op, value), ...] ANDed, op in FILTER_OPS (pyarrow filter
+#             syntax; rows where the column is null never match)
+#
+# Backends:
+#   pandas  - single-threaded groupby (default, reference results)
+#   duckdb  - embedded DuckDB on all cores, spilling to DUCKDB_TEMP_DIR above DUCKDB_MEMORY_LIMIT
+#   chunked - pandas partial aggregates per row group in a process pool, combined afterwards
+
+AGG_FUNCS = ['sum', 'mean', 'std', 'count', 'nunique', 'min', 'max']
+BACKENDS = ['pandas', 'duckdb', 'chunked']
+
+# op: (pandas function of the two columns, DuckDB SQL template)
+DERIVE_OPS = {
+    # Whole days from column_a to column_b (floored, like Timedelta.days)
+    'days_between': (lambda a, b: (b - a).dt.days, "CAST(floor(epoch({b} - {a}) / 86400) AS BIGINT)"),
+    # column_a as a percentage of column_b (null where column_b is 0)
+    'percent_of': (lambda a, b: a / b.where(b != 0) * 100, "CAST({a} AS DOUBLE) / NULLIF({b}, 0) * 100"),
+}
+
+_FILTER_FUNCS = {
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    'in': lambda series, values: series.isin(values), 'not in': lambda series, values: ~series.isin(values),
+}
+FILTER_OPS = list(_FILTER_FUNCS)
+
+# Backend used when none is given; override with the PIPELINE_BACKEND environment variable
+DEFAULT_BACKEND = os.environ.get('PIPELINE_BACKEND', 'pandas')
+
+# DuckDB memory ceiling and spill directory
+DUCKDB_MEMORY_LIMIT = '4GB'
+DUCKDB_TEMP_DIR = os.path.join(STORE_DIR, "duckdb_spill")
+
+# Rows per chunk for the chunked backend (DataFrame sources; datasets are chunked by row group)
+CHUNK_ROWS = 1_000_000
+
+
+def _check_query(aggs, derive, filters):
+    for output, (col, func) in aggs.items():
+        if func not in AGG_FUNCS:
+            raise ValueError(f"Unsupported aggregation '{func}' for {output}; expected one of {AGG_FUNCS}")
+    for col, (op, _, _) in derive.items():
+        if op not in DERIVE_OPS:
+            raise ValueError(f"Unsupported derived column operation '{op}' for {col}; expected one of {list(DERIVE_OPS)}")
+    for col, op, _ in filters:
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unsupported filter operator '{op}' on {col}; expected one of {FILTER_OPS}")
+
+
+def _input_columns(keys, aggs, derive=None, filters=None):
+    derive = derive or {}
+    stored = [col for col, _ in aggs.values() if col not in derive]
+    derived_from = [col for _, col_a, col_b in derive.values() for col in (col_a, col_b)]
+    return list(dict.fromkeys(list(keys) + stored + derived_from + [col for col, _, _ in filters or []]))
+
+
+def _apply_query(df, derive, filters):
+    # Filter then derive, on an in-memory frame or chunk
+    if filters:
+        mask = np.ones(len(df), dtype=bool)
+        for col, op, value in filters:
+            mask &= (_FILTER_FUNCS[op](df[col], value) & df[col].notna()).to_numpy()
+        df = df[mask]
+    if derive:
+        df = df.assign(**{col: DERIVE_OPS[op][0](df[col_a], df[col_b]) for col, (op, col_a, col_b) in derive.items()})
+    return df
+
+
+def read_source(source, columns, filters=None, store_dir=STORE_DIR):
+    """The columns of a DataFrame or store dataset `source` as a DataFrame (for the small reads next to an aggregation)."""
+    if isinstance(source, str):
+        return read_frame(source, columns=columns, filters=filters, store_dir=store_dir)
+    return _apply_query(source, None, filters)[columns]
+
+
+def source_rows(source, store_dir=STORE_DIR):
+    """Number of rows of a DataFrame or store dataset, without reading a dataset."""
+    if isinstance(source, str):
+        return sum(pq.ParquetFile(path).metadata.num_rows for path in _part_files(dataset_path(source, store_dir)))
+    return len(source)
+
+
+def _restore_key_dtypes(df_result, source, keys):
+    # Engines return plain strings for dictionary-encoded keys; give them back the store's categorical dtype
+    for key in keys:
+        categorical = (isinstance(source, pd.DataFrame) and isinstance(source[key].dtype, pd.CategoricalDtype)) or \
+                      (isinstance(source, str) and key in CATEGORICAL_COLUMNS)
+        if categorical and not isinstance(df_result[key].dtype, pd.CategoricalDtype):
+            df_result[key] = df_result[key].astype('category')
+    return df_result
+
+
+def _integer_columns(source, cols, store_dir, derive):
+    integer = {col for col in cols if col in derive and derive[col][0] == 'days_between'}
+    cols = [col for col in cols if col not in derive]
+    if isinstance(source, pd.DataFrame):
+        return integer | {col for col in cols if pd.api.types.is_integer_dtype(source[col].dtype)}
+    schema = pq.read_schema(_part_files(dataset_path(source, store_dir))[0])
+    return integer | {col for col in cols if str(schema.field(col).type).startswith(('int', 'uint'))}
+
+
+# --- pandas ---
+def _pandas_aggregate(source, keys, aggs, store_dir, derive, filters):
+    if isinstance(source, str):
+        source = read_frame(source, columns=_input_columns(keys, aggs, derive), filters=filters or None, store_dir=store_dir)
+        source = _apply_query(source, derive, None)
+    else:
+        source = _apply_query(source, derive, filters)
+    return source.groupby(keys, observed=True).agg(**aggs).reset_index()
+
+
+# --- DuckDB ---
+_SQL_FUNCS = {'sum': 'SUM({})', 'mean': 'AVG({})', 'std': 'STDDEV_SAMP({})', 'count': 'COUNT({})',
+              'nunique': 'COUNT(DISTINCT {})', 'min': 'MIN({})', 'max': 'MAX({})'}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_where(filters):
+    # WHERE clause with ? placeholders, and its parameters
+    conditions, params = [], []
+    for col, op, value in filters:
+        if op in ('in', 'not in'):
+            values = list(value)
+            if values:
+                conditions.append(f"{_quote(col)} {op.upper()} ({', '.join('?' * len(values))})")
+                params += values
+            else:
+                conditions.append("FALSE" if op == 'in' else f"{_quote(col)} IS NOT NULL")
+        else:
+            conditions.append(f"{_quote(col)} {'=' if op == '==' else op} ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+def _duckdb_aggregate(source, keys, aggs, store_dir, derive, filters):
+    import duckdb
+
+    os.makedirs(DUCKDB_TEMP_DIR, exist_ok=True)
+    con = duckdb.connect(config={
+        'threads': os.cpu_count(), 'memory_limit': DUCKDB_MEMORY_LIMIT, 'temp_directory': DUCKDB_TEMP_DIR,
+        # Sorting by the keys below already fixes the row order
+        'preserve_insertion_order': False,
+    })
+    try:
+        if isinstance(source, str):
+            relation = "read_parquet('{}')".format(os.path.join(dataset_path(source, store_dir), "*.parquet").replace("'", "''"))
+        else:
+            # Registered zero-copy; NaN in float columns is read as NULL, so it is skipped like in pandas
+            con.register('source_frame', source[_input_columns(keys, aggs, derive, filters)])
+            relation = 'source_frame'
+
+        where, params = _sql_where(filters)
+        derived = ''.join(
+            f", {DERIVE_OPS[op][1].format(a=_quote(col_a), b=_quote(col_b))} AS {_quote(col)}"
+            for col, (op, col_a, col_b) in derive.items()
+        )
+        rows = f"(SELECT *{derived} FROM {relation}{where})"
+
+        # Integer sums come back as HUGEINT (float in pandas); keep them int64 like pandas
+        integer_cols = _integer_columns(source, [col for col, func in aggs.values() if func == 'sum'], store_dir, derive)
+        key_list = ', '.join(_quote(key) for key in keys)
+        selects = []
+        for output, (col, func) in aggs.items():
+            expression = _SQL_FUNCS[func].format(_quote(col))
+            if func == 'sum' and col in integer_cols:
+                expression = f"CAST({expression} AS BIGINT)"
+            selects.append(f"{expression} AS {_quote(output)}")
+
+        sql = f"SELECT {key_list}, {', '.join(selects)} FROM {rows} GROUP BY {key_list} ORDER BY {key_list}"
+        return con.execute(sql, params).df()
+    finally:
+        con.close()
+
+
+# --- Chunked multiprocess pandas reducer ---
+def _chunk_partials(task):
+    # Runs in a worker process: partial statistics of one chunk, combined by _combine_partials
+    df, keys, aggs, derive, filters = task
+    if isinstance(df, tuple):
+        path, row_group, columns = df
+        df = pq.ParquetFile(path).read_row_group(row_group, columns=columns).to_pandas()
+    df = _apply_query(df, derive, filters)
+
+    grouped = df.groupby(keys, observed=True)
+    stats = {}
+    for col, func in aggs.values():
+        if func == 'nunique':
+            continue
+        series = grouped[col]
+        stats[f'{col}|count'] = series.count()
+        if func in ('sum', 'mean', 'std'):
+            stats[f'{col}|sum'] = series.sum()
+        if func == 'std':
+            stats[f'{col}|m2'] = (series.var(ddof=0) * stats[f'{col}|count']).fillna(0)
+        if func in ('min', 'max'):
+            stats[f'{col}|{func}'] = getattr(series, func)()
+    df_stats = pd.DataFrame(stats).reset_index() if stats else grouped.size().reset_index()[keys]
+
+    distinct = {col: df[keys + [col]].dropna(subset=[col]).drop_duplicates()
+                for col, func in aggs.values() if func == 'nunique'}
+    return df_stats, distinct
+
+
+def _combine_partials(partials, keys, aggs):
+    df_stats = pd.concat([stats for stats, _ in partials], ignore_index=True)
+    grouped = df_stats.groupby(keys, observed=True)
+    # Counts, sums and M2 add up across chunks; min/max are combined below (they may be dates)
+    additive = [col for col in df_stats.columns if col.endswith(('|count', '|sum', '|m2'))]
+    combined = grouped[additive].sum(min_count=1) if additive else pd.DataFrame(index=grouped.size().index)
+
+    columns = {}
+    for output, (col, func) in aggs.items():
+        if func == 'nunique':
+            df_distinct = pd.concat([distinct[col] for _, distinct in partials], ignore_index=True).drop_duplicates()
+            columns[output] = df_distinct.groupby(keys, observed=True).size()
+            continue
+
+        count = combined[f'{col}|count'].fillna(0).astype('int64')
+        if func == 'count':
+            columns[output] = count
+        elif func == 'sum':
+            columns[output] = combined[f'{col}|sum'].fillna(0)
+        elif func == 'mean':
+            columns[output] = combined[f'{col}|sum'] / count.replace(0, np.nan)
+        elif func == 'std':
+            # Chan et al. combination of the per-chunk (count, mean, M2)
+            chunk_count = df_stats[f'{col}|count']
+            chunk_mean = df_stats[f'{col}|sum'] / chunk_count.replace(0, np.nan)
+            overall_mean = grouped[f'{col}|sum'].transform('sum') / grouped[f'{col}|count'].transform('sum').replace(0, np.nan)
+            deviation = (chunk_count * (chunk_mean - overall_mean) ** 2).fillna(0)
+            m2 = combined[f'{col}|m2'].fillna(0) + deviation.groupby([df_stats[key] for key in keys], observed=True).sum()
+            columns[output] = np.sqrt(m2 / (count - 1).where(count > 1))
+        else:
+            columns[output] = getattr(grouped[f'{col}|{func}'], func)()
+
+    # Every series is indexed by the group keys; groups without non-null values get 0 distinct values
+    df_result = pd.DataFrame(columns, index=combined.index)
+    for output, (col, func) in aggs.items():
+        if func == 'nunique':
+            df_result[output] = df_result[output].fillna(0).astype('int64')
+    return df_result.reset_index()
+
+
+def _chunked_aggregate(source, keys, aggs, store_dir, derive, filters, max_workers=None):
+    if isinstance(source, str):
+        # Each worker reads one row group itself, so only the partial aggregates cross processes
+        columns = _input_columns(keys, aggs, derive, filters)
+        tasks = [((path, row_group, columns), keys, aggs, derive, filters)
+                 for path in _part_files(dataset_path(source, store_dir))
+                 for row_group in range(pq.ParquetFile(path).num_row_groups)]
+        if len(tasks) == 1:
+            partials = [_chunk_partials(tasks[0])]
+        else:
+            # forkserver/spawn rather than fork: aggregations may run from a pipeline worker thread
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), mp_context=multiprocessing.get_context(method)) as pool:
+                partials = list(pool.map(_chunk_partials, tasks))
+    else:
+        # Already in memory: reduced chunk by chunk in this process (copying the chunks to workers
+        # would add their size to the memory in use instead of bounding it)
+        frame = source[_input_columns(keys, aggs, derive, filters)]
+        partials = [_chunk_partials((frame.iloc[start:start + CHUNK_ROWS], keys, aggs, derive, filters))
+                    for start in range(0, max(len(frame), 1), CHUNK_ROWS)]
+
+    return _combine_partials(partials, keys, aggs).sort_values(keys).reset_index(drop=True)
+
+
+_BACKEND_FUNCS = {
+    'pandas': _pandas_aggregate,
+    'duckdb': _duckdb_aggregate,
+    'chunked': _chunked_aggregate,
+}
+
+
+def group_aggregate(source, keys, aggs, backend=None, store_dir=STORE_DIR, derive=None, filters=None):
+    """
+    Grouped named aggregations on the selected backend.
+    source: DataFrame or store dataset name; aggs: {output: (column, func)} as in DataFrame.agg;
+    derive: {column: (op, column_a, column_b)}; filters: [(column, op, value), ...].
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in _BACKEND_FUNCS:
+        raise ValueError(f"Unknown backend '{backend}'; expected one of {BACKENDS}")
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    derive, filters = derive or {}, list(filters or [])
+    _check_query(aggs, derive, filters)
+
+    df_result = _BACKEND_FUNCS[backend](source, keys, aggs, store_dir, derive, filters)
+    return _restore_key_dtypes(df_result, source, keys)
@@ -0,0 +1,127 @@
+import numpy as np
+
+# Fast baseline forecasters evaluated on a whole (series x week) matrix at once.
+# Every model takes Y with shape (n_series, n_weeks) and a horizon h, and returns an
+# (n_series, h) array of forecasts. Loops only run over time, never over series.
+
+# Length of the seasonal cycle in weeks
+SEASON_LENGTH = 52
+
+# Smoothing parameters
+MOVING_AVERAGE_WINDOW = 4
+SES_ALPHA = 0.2
+HOLT_ALPHA = 0.3
+HOLT_BETA = 0.1
+CROSTON_ALPHA = 0.1
+
+# A series is escalated to ARIMA when the best baseline's backtest MASE exceeds this
+# and the series is not intermittent (ARIMA does not help on mostly-zero series).
+ESCALATION_MASE = 1.5
+INTERMITTENT_ZERO_SHARE = 0.5
+
+
+def seasonal_naive(Y, h, season=SEASON_LENGTH):
+    # Same week last season; the last observed value when there is less than one season of history
+    n_weeks = Y.shape[1]
+    if n_weeks < season:
+        return np.repeat(Y[:, -1:], h, axis=1)
+    return Y[:, n_weeks - season + np.arange(h) % season]
+
+
+def moving_average(Y, h, window=MOVING_AVERAGE_WINDOW):
+    return np.repeat(Y[:, -window:].mean(axis=1, keepdims=True), h, axis=1)
+
+
+def simple_exponential_smoothing(Y, h, alpha=SES_ALPHA):
+    level = Y[:, 0].copy()
+    for t in range(1, Y.shape[1]):
+        level = alpha * Y[:, t] + (1 - alpha) * level
+    return np.repeat(level[:, None], h, axis=1)
+
+
+def holt(Y, h, alpha=HOLT_ALPHA, beta=HOLT_BETA):
+    level = Y[:, 0].copy()
+    trend = Y[:, 1] - Y[:, 0] if Y.shape[1] > 1 else np.zeros(len(Y))
+    for t in range(1, Y.shape[1]):
+        previous_level = level
+        level = alpha * Y[:, t] + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+    # Demand cannot be negative
+    return np.maximum(level[:, None] + trend[:, None] * np.arange(1, h + 1), 0)
+
+
+def croston(Y, h, alpha=CROSTON_ALPHA):
+    # Separate smoothing of the non-zero demand sizes (z) and the intervals between them (p)
+    has_demand = Y > 0
+    first = has_demand.argmax(axis=1)
+    rows = np.arange(len(Y))
+    z = Y[rows, first].astype('float64')
+    p = (first + 1).astype('float64')
+    q = np.zeros(len(Y))
+    for t in range(Y.shape[1]):
+        started = t > first
+        q = np.where(started, q + 1, q)
+        demand = started & has_demand[:, t]
+        z = np.where(demand, z + alpha * (Y[:, t] - z), z)
+        p = np.where(demand, p + alpha * (q - p), p)
+        q = np.where(demand, 0, q)
+    forecast = np.where(has_demand.any(axis=1), z / p, 0.0)
+    return np.repeat(forecast[:, None], h, axis=1)
+
+
+MODELS = {
+    'SeasonalNaive': seasonal_naive,
+    'MovingAverage': moving_average,
+    'SES': simple_exponential_smoothing,
+    'Holt': holt,
+    'Croston': croston,
+}
+
+# Weeks of history a model needs to run as itself; with less, seasonal_naive falls back to the last value
+MIN_HISTORY = {'SeasonalNaive': SEASON_LENGTH}
+
+
+def backtest_mae(Y, h, models=MODELS):
+    """
+    Mean absolute error of each model on the last h weeks, fitted on the weeks before. Shape (n_series, n_models).
+    Models without enough training history for MIN_HISTORY get an infinite error, so they are never selected.
+    """
+    train, actual = Y[:, :-h], Y[:, -h:]
+    errors = []
+    for name, model in models.items():
+        if train.shape[1] < MIN_HISTORY.get(name, 0):
+            # The backtest would score the fallback, not the model that forecasts on the full history
+            errors.append(np.full(len(Y), np.inf))
+        else:
+            errors.append(np.abs(model(train, h) - actual).mean(axis=1))
+    return np.stack(errors, axis=1)
+
+
+def naive_scale(Y):
+    # In-sample one-step naive MAE, the denominator of MASE (NaN for constant series)
+    scale = np.abs(np.diff(Y, axis=1)).mean(axis=1)
+    return np.where(scale > 0, scale, np.nan)
+
+
+def select_models(Y, h, models=MODELS):
+    """
+    Backtest every model, pick the best per series and forecast h weeks with it on the full history.
+    Returns (forecasts, model_names, best_backtest_mae, escalate_to_arima).
+    """
+    names = np.array(list(models))
+    if Y.shape[1] <= h + 1:
+        # Too short to hold out h weeks: exponential smoothing, no escalation
+        return simple_exponential_smoothing(Y, h), np.full(len(Y), 'SES'), np.full(len(Y), np.nan), np.zeros(len(Y), dtype=bool)
+
+    errors = backtest_mae(Y, h, models)
+    best = errors.argmin(axis=1)
+    best_mae = errors[np.arange(len(Y)), best]
+
+    all_forecasts = np.stack([model(Y, h) for model in models.values()], axis=1)
+    forecasts = all_forecasts[np.arange(len(Y)), best]
+
+    with np.errstate(invalid='ignore'):
+        mase = best_mae / naive_scale(Y[:, :-h])
+    zero_share = (Y == 0).mean(axis=1)
+    escalate = (mase > ESCALATION_MASE) & (zero_share < INTERMITTENT_ZERO_SHARE)
+    return forecasts, names[best], best_mae, escalate
@@ -0,0 +1,154 @@
+import pandas as pd
+import argparse
+import os
+import time
+
+import data_preparation
+from data_preparation import (
+    clean_purchases, combine_price_aggregates, enrich_sales, load_watermark, save_watermark, subtract_price_aggregates
+)
+from data_store import append_frame, read_frame, write_frame, frame_exists
+from dimensions import DIMENSIONS, assign_keys, build_dimensions, decode, load_dimensions, save_dimensions
+from sales_cube import CUBE_DATASETS, build_cubes, cube_partials, save_sales_cubes, stored_cube_partials
+
+# Incremental (append-only) data preparation.
+# Only the sales and purchase rows newer than the stored watermark are processed:
+#   - new purchase lines are cleaned and appended to df_purchases_cleaned,
+#   - the running Brand/Size PurchasePrice sum and count are updated,
+#   - new sales lines get COGS/GrossProfit from the updated averages and are appended to df_sales_master,
+#   - new products / stores / vendors get the next free surrogate keys (existing keys never change),
+#   - the sales cubes are re-aggregated from the stored cube plus the new lines (never the full history).
+# Rows already in df_sales_master keep the COGS computed when they were ingested; run
+# data_preparation.py for a full rebuild that restates them with the latest averages.
+# Each drop is expected to contain complete days (rows dated on or before the watermark are skipped).
+# Purchase lines without a ReceivingDate (kept by the full build) have no date to compare with the
+# watermark: they are new unless the same line (PURCHASE_LINE_KEYS) is already stored unreceived.
+# When a stored unreceived line arrives received, the stored row is replaced by the received one
+# (df_purchases_cleaned is rewritten and the line leaves the running price aggregates), so the
+# store holds each line once, as a full rebuild does.
+
+STATE_DATASETS = ['df_sales_master', 'df_purchases_cleaned', 'df_inventory_master',
+                  'purchase_price_aggregates', 'brand_size_lookup'] + CUBE_DATASETS + list(DIMENSIONS)
+
+# Columns identifying a purchase line, for the lines without a ReceivingDate
+PURCHASE_LINE_KEYS = ['PONumber', 'PODate', 'PurchasePrice', 'Quantity', 'Dollars']
+
+
+def _line_keys(df):
+    return df[PURCHASE_LINE_KEYS].assign(PODate=pd.to_datetime(df['PODate'], errors='coerce'))
+
+
+def same_lines(df, df_lines):
+    """Boolean array: the rows of df whose line (PURCHASE_LINE_KEYS) is one of the lines of df_lines."""
+    df_keys = _line_keys(df)
+    if not len(df_lines):
+        return pd.Series(False, index=df.index).to_numpy()
+    lines = pd.MultiIndex.from_frame(_line_keys(df_lines).astype(df_keys.dtypes.to_dict()))
+    return pd.MultiIndex.from_frame(df_keys).isin(lines)
+
+
+def select_new_purchases(df_purchases, last_receiving_date, df_stored_unreceived):
+    """Lines received after the watermark, plus the unreceived lines not in df_stored_unreceived."""
+    received = df_purchases['ReceivingDate'] > last_receiving_date
+    unreceived = df_purchases['ReceivingDate'].isna() & ~same_lines(df_purchases, df_stored_unreceived)
+    return df_purchases[received | unreceived].copy()
+
+
+def replace_received_lines(df_price_aggregates, df_new_purchases, df_stored_unreceived, dims):
+    """
+    Remove from df_purchases_cleaned the stored unreceived lines that df_new_purchases brings received,
+    and take them out of the running price aggregates. Returns the updated aggregates.
+    """
+    df_received = df_new_purchases[df_new_purchases['ReceivingDate'].notna()]
+    if not same_lines(df_stored_unreceived, df_received).any():
+        return df_price_aggregates
+
+    # Only now is the whole purchases dataset read and rewritten
+    df_stored = read_frame("df_purchases_cleaned")
+    replaced = df_stored['ReceivingDate'].isna().to_numpy() & same_lines(df_stored, df_received)
+
+    print(f"Replaced Unreceived Purchase Rows: {replaced.sum()}")
+    df_replaced = decode(df_stored[replaced], {'dim_product': dims['dim_product']}, columns=['Brand', 'Size'])
+    write_frame(df_stored[~replaced], "df_purchases_cleaned")
+    return subtract_price_aggregates(df_price_aggregates, df_replaced)
+
+
+def prepare_incremental(sales_file, purchases_file):
+    watermark = load_watermark()
+    if watermark is None or not all(frame_exists(name) for name in STATE_DATASETS):
+        raise FileNotFoundError("No incremental state found. Run data_preparation.py once for a full build.")
+
+    print("--- Starting Incremental Data Preparation ---")
+    print(f"Watermark: SalesDate {watermark['last_sales_date']:%Y-%m-%d}, ReceivingDate {watermark['last_receiving_date']:%Y-%m-%d}")
+
+    # --- 1. Load only the delta ---
+    df_sales = pd.read_csv(sales_file)
+    df_sales['SalesDate'] = pd.to_datetime(df_sales['SalesDate'])
+    df_sales = df_sales[df_sales['SalesDate'] > watermark['last_sales_date']]
+
+    df_purchases = pd.read_csv(purchases_file)
+    df_purchases['ReceivingDate'] = pd.to_datetime(df_purchases['ReceivingDate'], errors='coerce')
+    df_stored_purchases = read_frame("df_purchases_cleaned", columns=PURCHASE_LINE_KEYS + ['ReceivingDate'])
+    df_stored_unreceived = df_stored_purchases[df_stored_purchases['ReceivingDate'].isna()]
+    df_purchases = select_new_purchases(df_purchases, watermark['last_receiving_date'], df_stored_unreceived)
+
+    print(f"New Sales Rows: {len(df_sales)}")
+    print(f"New Purchase Rows: {len(df_purchases)}")
+
+    # --- 2. Clean the new purchases ---
+    df_brand_sizes = read_frame("brand_size_lookup")
+    df_brand_sizes = pd.concat([df_brand_sizes, df_sales[['Brand', 'Size']]], ignore_index=True).drop_duplicates()
+    size_map = df_brand_sizes.set_index('Brand')['Size'].to_dict()
+    df_purchases = clean_purchases(df_purchases, size_map)
+
+    # --- 3. Update the running Brand/Size purchase price aggregates ---
+    # (stored unreceived lines arriving received are replaced rather than counted twice)
+    df_price_aggregates = combine_price_aggregates(read_frame("purchase_price_aggregates"), df_purchases)
+    df_price_aggregates = replace_received_lines(df_price_aggregates, df_purchases, df_stored_unreceived, load_dimensions())
+
+    # --- 4. COGS / Gross Profit for the new sales only ---
+    df_inventory = read_frame("df_inventory_master", columns=['InventoryId', 'Beg_onHand', 'End_onHand', 'Avg_Price'])
+    df_new_sales_master = enrich_sales(df_sales, df_inventory, df_price_aggregates)
+
+    # --- 5. Surrogate keys (extend the stored dimensions with new members) ---
+    dims = build_dimensions([df_new_sales_master, df_purchases], load_dimensions())
+    df_new_sales_master = assign_keys(df_new_sales_master.drop(columns='InventoryId'), dims)
+    df_purchases = assign_keys(df_purchases.drop(columns='InventoryId'), dims)
+    save_dimensions(dims)
+
+    # --- 6. Append and move the watermark ---
+    if len(df_new_sales_master):
+        append_frame(df_new_sales_master, "df_sales_master")
+        save_sales_cubes(build_cubes([stored_cube_partials(), cube_partials(df_new_sales_master)]))
+    if len(df_purchases):
+        append_frame(df_purchases, "df_purchases_cleaned")
+    write_frame(df_price_aggregates, "purchase_price_aggregates")
+    write_frame(df_brand_sizes, "brand_size_lookup")
+
+    save_watermark(
+        max(watermark['last_sales_date'], df_sales['SalesDate'].max()) if len(df_sales) else watermark['last_sales_date'],
+        max(watermark['last_receiving_date'], df_purchases['ReceivingDate'].max()) if len(df_purchases) else watermark['last_receiving_date'],
+    )
+    return df_new_sales_master, df_purchases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append only the new sales/purchase days to the prepared datasets.")
+    parser.add_argument('--sales', default=os.path.join(data_preparation.upload_dir, "SalesFINAL12312016.csv"),
+                        help="Sales file containing the new days (default: the SalesFINAL upload)")
+    parser.add_argument('--purchases', default=os.path.join(data_preparation.upload_dir, "PurchasesFINAL12312016.csv"),
+                        help="Purchases file containing the new days (default: the PurchasesFINAL upload)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        prepare_incremental(args.sales, args.purchases)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        exit()
+
+    print(f"--- Incremental Data Preparation Complete in {time.perf_counter() - start:.2f}s ---")
+
+
+if __name__ == "__main__":
+    main()
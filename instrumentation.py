@@ -0,0 +1,204 @@
+import pandas as pd
+import cProfile
+import contextlib
+import datetime
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then reported as None
+    resource = None
+
+# Per-step instrumentation of the scripts.
+# Wrap each logical step (load, merge, groupby, model fit, write) in
+#     with step("merge sales+inventory", rows_in=len(df_sales)) as s:
+#         df = pd.merge(...)
+#         s.rows_out = len(df)
+# to record its wall time, CPU time, process peak RSS and rows in/out. Steps nest (the record keeps the
+# path of enclosing steps) and may run in several threads (each thread has its own nesting).
+# Records are collected while a run_report() is active, which writes them as a JSON report:
+#     if __name__ == "__main__":
+#         with run_report("data_preparation"):
+#             main()
+# Set PIPELINE_PROFILE=1 to also dump a cProfile of the run next to the report
+# (view it with `python -m pstats`, snakeviz or flameprof). cProfile only sees the thread that
+# enabled it, so code run in worker threads wraps itself in profile_thread() to get its own profiler;
+# the report merges them with the profile of the main thread.
+# ru_maxrss is the high-water mark of the whole process lifetime: a step's process_peak_rss_mb is that
+# mark when the step ends (it never goes down) and peak_rss_growth_mb is how much the step raised it.
+
+# Directory of the JSON run reports; override with the RUN_REPORT_DIR environment variable
+REPORT_DIR = os.environ.get('RUN_REPORT_DIR', "/home/ubuntu/run_reports")
+
+# Profile every run with cProfile when set
+PROFILE = os.environ.get('PIPELINE_PROFILE', '') not in ('', '0')
+
+_lock = threading.Lock()
+_local = threading.local()
+_records = None  # list of step records of the active run, None outside run_report()
+_profilers = None  # cProfile.Profile of each profiled thread of the active run, None when not profiling
+_profiled_threads = set()  # idents of the threads with an enabled profiler
+
+
+def process_peak_rss_mb():
+    """High-water mark of the resident set size over the lifetime of this process, in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in KB elsewhere
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _child_cpu_seconds():
+    # CPU time of the finished worker processes (process pools of the backends / batch forecasting)
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class StepRecord:
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+
+@contextlib.contextmanager
+def step(name, rows_in=None):
+    """Time one step; set .rows_out on the yielded record. Records only while a run_report() is active."""
+    record = StepRecord(name, rows_in)
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(name)
+    path = '/'.join(stack)
+
+    started_at = datetime.datetime.now().isoformat(timespec='milliseconds')
+    rss_before = process_peak_rss_mb()
+    start_wall, start_cpu, start_child = time.perf_counter(), time.thread_time(), _child_cpu_seconds()
+    status = 'ok'
+    try:
+        yield record
+    except BaseException:
+        status = 'failed'
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - start_wall, time.thread_time() - start_cpu
+        child_cpu = _child_cpu_seconds() - start_child
+        stack.pop()
+        rss_after = process_peak_rss_mb()
+        with _lock:
+            if _records is not None:
+                _records.append({
+                    'step': path, 'depth': len(stack), 'thread': threading.current_thread().name,
+                    'started_at': started_at, 'status': status,
+                    'wall_seconds': round(wall, 6), 'cpu_seconds': round(cpu, 6), 'child_cpu_seconds': round(child_cpu, 6),
+                    'process_peak_rss_mb': None if rss_after is None else round(rss_after, 2),
+                    'peak_rss_growth_mb': None if rss_after is None else round(rss_after - rss_before, 2),
+                    'rows_in': record.rows_in, 'rows_out': record.rows_out,
+                })
+
+
+@contextlib.contextmanager
+def profile_thread():
+    """Profile the calling worker thread while the active run_report() profiles; no-op otherwise."""
+    ident = threading.get_ident()
+    with _lock:
+        # A thread already profiled (the main thread, or a nested call) keeps its profiler
+        profiler = None if _profilers is None or ident in _profiled_threads else cProfile.Profile()
+        if profiler is not None:
+            _profilers.append(profiler)
+            _profiled_threads.add(ident)
+    if profiler is None:
+        yield
+        return
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _lock:
+            _profiled_threads.discard(ident)
+
+
+@contextlib.contextmanager
+def run_report(script, report_dir=None, profile=None):
+    """Collect the steps of one script run and write <script>_<timestamp>.json (and .prof if profiling)."""
+    global _records, _profilers
+    report_dir = report_dir or REPORT_DIR
+    profile = PROFILE if profile is None else profile
+    profiler = cProfile.Profile() if profile else None
+    with _lock:
+        _records = []
+        if profiler is not None:
+            _profilers = [profiler]
+            _profiled_threads.add(threading.get_ident())
+
+    started_at = datetime.datetime.now()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    status = 'ok'
+    try:
+        if profiler is not None:
+            profiler.enable()
+        yield
+    except SystemExit as e:
+        # exit() after a reported error, or exit(1) after failed pipeline stages
+        status = 'ok' if e.code in (None, 0) else 'failed'
+        raise
+    except BaseException:
+        status = 'failed'
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        with _lock:
+            records, _records = _records, None
+            profilers, _profilers = _profilers, None
+            _profiled_threads.discard(threading.get_ident())
+
+        os.makedirs(report_dir, exist_ok=True)
+        base = os.path.join(report_dir, f"{script}_{started_at:%Y%m%dT%H%M%S}_{os.getpid()}")
+        report = {
+            'script': script,
+            'argv': sys.argv[1:],
+            'status': status,
+            'started_at': started_at.isoformat(timespec='milliseconds'),
+            'wall_seconds': round(time.perf_counter() - start_wall, 6),
+            'cpu_seconds': round(time.process_time() - start_cpu, 6),
+            'process_peak_rss_mb': process_peak_rss_mb(),
+            'python': sys.version.split()[0],
+            'pandas': pd.__version__,
+            'steps': records,
+        }
+        if profiler is not None:
+            # The main thread's profile plus those of the worker threads (stages of run_pipeline.py)
+            stats = pstats.Stats(profiler)
+            for worker_profiler in profilers[1:]:
+                stats.add(worker_profiler)
+            stats.dump_stats(base + ".prof")
+            report['profile'] = base + ".prof"
+        with open(base + ".json", "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Run report saved to {base}.json", file=sys.stderr)
+
+
+def load_report(path):
+    """The steps of a JSON run report as a DataFrame."""
+    with open(path) as f:
+        df_steps = pd.DataFrame(json.load(f)['steps'])
+    return df_steps.astype({'rows_in': 'Int64', 'rows_out': 'Int64'})
+
+
+if __name__ == "__main__":
+    # Usage: python3 instrumentation.py /home/ubuntu/run_reports/data_preparation_<timestamp>.json
+    for report_path in sys.argv[1:]:
+        df_steps = load_report(report_path)
+        print(f"\n{report_path}")
+        print(df_steps[['step', 'wall_seconds', 'cpu_seconds', 'process_peak_rss_mb', 'peak_rss_growth_mb', 'rows_in', 'rows_out']]
+              .to_markdown(index=False, floatfmt=".3f"))
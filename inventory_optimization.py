@@ -1,30 +1,12 @@
 import pandas as pd
 import numpy as np
 import os
+from data_store import frame_exists, read_frame, write_frame
+from dimensions import decode
+from execution_backend import group_aggregate, read_source, source_rows
+from instrumentation import run_report, step
 
-# Load the cleaned dataframes
-try:
-    df_sales_master = pd.read_csv("/home/ubuntu/df_sales_master.csv")
-    df_purchases_cleaned = pd.read_csv("/home/ubuntu/df_purchases_cleaned.csv")
-    df_inventory_master = pd.read_csv("/home/ubuntu/df_inventory_master.csv")
-    df_abc = pd.read_csv("/home/ubuntu/abc_analysis_results.csv")
-except FileNotFoundError:
-    print("Error: One or more cleaned data files not found. Please ensure previous steps are complete.")
-    exit()
-
-print("--- Starting EOQ and Reorder Point Analysis ---")
-
-# --- 1. Calculate Annual Demand (D) and Average Daily Demand (D_avg) ---
-# Assuming the data covers a full year (2016)
-df_demand = df_sales_master.groupby(['Brand', 'Description', 'Size']).agg(
-    Annual_Demand=('SalesQuantity', 'sum'),
-    Total_Sales_Days=('SalesDate', lambda x: x.nunique())
-).reset_index()
-
-# Calculate Average Daily Demand (D_avg)
-df_demand['Avg_Daily_Demand'] = df_demand['Annual_Demand'] / 365 # Using 365 days for the year
-
-# --- 2. Determine Cost Parameters (Assumptions) ---
+# --- Cost Parameters (Assumptions) ---
 # Ordering Cost (S): Assumed cost per order (e.g., administrative, shipping fixed cost)
 ORDERING_COST_S = 50.00 # $50 per order (Assumption)
 
@@ -32,61 +14,116 @@ ORDERING_COST_S = 50.00 # $50 per order (Assumption)
 # Assuming 20% of the unit cost for holding (storage, insurance, obsolescence)
 HOLDING_COST_PERCENTAGE = 0.20
 
-# Merge with Purchase Price to get Unit Cost (C)
-df_unit_cost = df_purchases_cleaned.groupby(['Brand', 'Description', 'Size'])['PurchasePrice'].mean().reset_index()
-df_unit_cost = df_unit_cost.rename(columns={'PurchasePrice': 'Avg_Unit_Cost'})
-
-df_eoq_rop = pd.merge(df_demand, df_unit_cost, on=['Brand', 'Description', 'Size'], how='left')
-
-# Fill NaN Avg_Unit_Cost with 0 before calculating Holding Cost
-df_eoq_rop['Avg_Unit_Cost'] = df_eoq_rop['Avg_Unit_Cost'].fillna(0)
-
-# Calculate Holding Cost (H)
-df_eoq_rop['Holding_Cost_H'] = df_eoq_rop['Avg_Unit_Cost'] * HOLDING_COST_PERCENTAGE
-
-# --- 3. Calculate Economic Order Quantity (EOQ) ---
-# EOQ = sqrt((2 * D * S) / H)
-# Use a small epsilon to avoid division by zero if Holding_Cost_H is 0
-epsilon = 1e-6
-eoq_calc = np.sqrt(
-    (2 * df_eoq_rop['Annual_Demand'] * ORDERING_COST_S) / (df_eoq_rop['Holding_Cost_H'] + epsilon)
-).round(0)
-
-# Replace NaN/Inf values with 0 (or a very large number if appropriate, but 0 is safer for inventory)
-df_eoq_rop['EOQ'] = eoq_calc.fillna(0).replace([np.inf, -np.inf], 0).astype(int)
-
-# --- 4. Calculate Lead Time (L) ---
-# Calculate average lead time per product (InventoryId)
-df_lead_time = df_purchases_cleaned.groupby(['Brand', 'Description', 'Size'])['LeadTime_Days'].mean().reset_index()
-df_lead_time = df_lead_time.rename(columns={'LeadTime_Days': 'Avg_LeadTime_Days'})
-
-df_eoq_rop = pd.merge(df_eoq_rop, df_lead_time, on=['Brand', 'Description', 'Size'], how='left')
-
-# Fill missing lead times with the overall average lead time
-overall_avg_lead_time = df_purchases_cleaned['LeadTime_Days'].mean()
-df_eoq_rop['Avg_LeadTime_Days'] = df_eoq_rop['Avg_LeadTime_Days'].fillna(overall_avg_lead_time)
-
-# --- 5. Calculate Reorder Point (ROP) ---
-# ROP = Avg_Daily_Demand * Avg_LeadTime_Days (Safety Stock SS = 0 for simplicity)
-rop_calc = (df_eoq_rop['Avg_Daily_Demand'] * df_eoq_rop['Avg_LeadTime_Days']).round(0)
-
-# Replace NaN/Inf values with 0 before converting to integer
-df_eoq_rop['Reorder_Point_ROP'] = rop_calc.fillna(0).replace([np.inf, -np.inf], 0).astype(int)
-
-# --- 6. Merge with ABC Category for Context ---
-df_eoq_rop = pd.merge(df_eoq_rop, df_abc[['Brand', 'Description', 'Size', 'ABC_Category']], on=['Brand', 'Description', 'Size'], how='left')
-
-# Select and display key columns for the top 10 products
-df_eoq_rop_top = df_eoq_rop.sort_values(by='Annual_Demand', ascending=False).head(10)
-
-print("\nInventory Optimization Metrics (Top 10 Products):")
-print(df_eoq_rop_top[[
-    'Brand', 'Description', 'Size', 'ABC_Category', 'Annual_Demand',
-    'Avg_Unit_Cost', 'Avg_LeadTime_Days', 'EOQ', 'Reorder_Point_ROP'
-]].to_markdown(index=False, floatfmt=(".2f", ".2f", ".2f", ".0f")))
-
-# Save the results
-df_eoq_rop.to_csv("/home/ubuntu/inventory_optimization_metrics.csv", index=False)
-
-print("\n--- EOQ and Reorder Point Analysis Complete. Results saved to inventory_optimization_metrics.csv ---")
 
+def run_inventory_optimization(daily_sales, df_products, purchases, df_abc, backend=None,
+                               ordering_cost=ORDERING_COST_S, holding_cost_percentage=HOLDING_COST_PERCENTAGE):
+    # daily_sales / purchases: the daily sales cube and the cleaned purchases as DataFrames, or their
+    # store dataset names (read by the aggregation backend)
+    print("--- Starting EOQ and Reorder Point Analysis ---")
+
+    # --- 1. Calculate Annual Demand (D) and Average Daily Demand (D_avg) ---
+    # Assuming the data covers a full year (2016)
+    # Rolled up from the daily sales cube (one row per product, store, vendor and day) by ProductKey;
+    # the product labels are looked up in dim_product once, every merge below runs on the key
+    with step("groupby_product_demand", rows_in=source_rows(daily_sales)) as s:
+        df_demand = decode(group_aggregate(daily_sales, ['ProductKey'], {
+            'Annual_Demand': ('SalesQuantity', 'sum'),
+            'Total_Sales_Days': ('Date', 'nunique'),
+        }, backend), {'dim_product': df_products}, keep_keys=True)
+        s.rows_out = len(df_demand)
+
+    # Calculate Average Daily Demand (D_avg)
+    df_demand['Avg_Daily_Demand'] = df_demand['Annual_Demand'] / 365 # Using 365 days for the year
+
+    # --- 2. Determine Unit Cost (C) ---
+    # Merge with Purchase Price to get Unit Cost (C)
+    # (one pass over the purchases also gives the average lead time used in section 4)
+    with step("groupby_purchase_stats", rows_in=source_rows(purchases)) as s:
+        df_purchase_stats = group_aggregate(purchases, ['ProductKey'], {
+            'Avg_Unit_Cost': ('PurchasePrice', 'mean'),
+            'Avg_LeadTime_Days': ('LeadTime_Days', 'mean'),
+        }, backend)
+        s.rows_out = len(df_purchase_stats)
+
+    with step("merge_unit_cost", rows_in=len(df_demand)) as s:
+        df_eoq_rop = pd.merge(df_demand, df_purchase_stats.drop(columns='Avg_LeadTime_Days'), on='ProductKey', how='left')
+        s.rows_out = len(df_eoq_rop)
+
+    # Fill NaN Avg_Unit_Cost with 0 before calculating Holding Cost
+    df_eoq_rop['Avg_Unit_Cost'] = df_eoq_rop['Avg_Unit_Cost'].fillna(0)
+
+    # Calculate Holding Cost (H)
+    df_eoq_rop['Holding_Cost_H'] = df_eoq_rop['Avg_Unit_Cost'] * holding_cost_percentage
+
+    # --- 3. Calculate Economic Order Quantity (EOQ) ---
+    # EOQ = sqrt((2 * D * S) / H)
+    # Use a small epsilon to avoid division by zero if Holding_Cost_H is 0
+    epsilon = 1e-6
+    eoq_calc = np.sqrt(
+        (2 * df_eoq_rop['Annual_Demand'] * ordering_cost) / (df_eoq_rop['Holding_Cost_H'] + epsilon)
+    ).round(0)
+
+    # Replace NaN/Inf values with 0 (or a very large number if appropriate, but 0 is safer for inventory)
+    df_eoq_rop['EOQ'] = eoq_calc.fillna(0).replace([np.inf, -np.inf], 0).astype(int)
+
+    # --- 4. Calculate Lead Time (L) ---
+    # Average lead time per product (from the purchase aggregation in section 2)
+    df_lead_time = df_purchase_stats.drop(columns='Avg_Unit_Cost')
+
+    with step("merge_lead_time", rows_in=len(df_eoq_rop)) as s:
+        df_eoq_rop = pd.merge(df_eoq_rop, df_lead_time, on='ProductKey', how='left')
+        s.rows_out = len(df_eoq_rop)
+
+    # Fill missing lead times with the overall average lead time
+    overall_avg_lead_time = read_source(purchases, ['LeadTime_Days'])['LeadTime_Days'].mean()
+    df_eoq_rop['Avg_LeadTime_Days'] = df_eoq_rop['Avg_LeadTime_Days'].fillna(overall_avg_lead_time)
+
+    # --- 5. Calculate Reorder Point (ROP) ---
+    # ROP = Avg_Daily_Demand * Avg_LeadTime_Days (Safety Stock SS = 0 for simplicity)
+    rop_calc = (df_eoq_rop['Avg_Daily_Demand'] * df_eoq_rop['Avg_LeadTime_Days']).round(0)
+
+    # Replace NaN/Inf values with 0 before converting to integer
+    df_eoq_rop['Reorder_Point_ROP'] = rop_calc.fillna(0).replace([np.inf, -np.inf], 0).astype(int)
+
+    # --- 6. Merge with ABC Category for Context ---
+    with step("merge_abc_category", rows_in=len(df_eoq_rop)) as s:
+        df_eoq_rop = pd.merge(df_eoq_rop, df_abc[['ProductKey', 'ABC_Category']], on='ProductKey', how='left')
+        s.rows_out = len(df_eoq_rop)
+
+    # Select and display key columns for the top 10 products
+    df_eoq_rop_top = df_eoq_rop.sort_values(by='Annual_Demand', ascending=False).head(10)
+
+    print("\nInventory Optimization Metrics (Top 10 Products):")
+    print(df_eoq_rop_top[[
+        'Brand', 'Description', 'Size', 'ABC_Category', 'Annual_Demand',
+        'Avg_Unit_Cost', 'Avg_LeadTime_Days', 'EOQ', 'Reorder_Point_ROP'
+    ]].to_markdown(index=False, floatfmt=(".2f", ".2f", ".2f", ".0f")))
+
+    return df_eoq_rop
+
+
+def save_inventory_metrics(df_eoq_rop):
+    # Save the results (store copy with ProductKey for later phases, CSV with the product labels for the report)
+    with step("write:inventory_optimization_metrics", rows_in=len(df_eoq_rop)):
+        write_frame(df_eoq_rop, "inventory_optimization_metrics")
+    with step("write_csv:inventory_optimization_metrics", rows_in=len(df_eoq_rop)):
+        df_eoq_rop.drop(columns='ProductKey').to_csv("/home/ubuntu/inventory_optimization_metrics.csv", index=False)
+
+
+def main():
+    # The daily sales cube and the purchases are read by the aggregation backend from the store
+    if not all(frame_exists(name) for name in ["sales_cube_daily", "df_purchases_cleaned", "dim_product", "abc_analysis_results"]):
+        print("Error: One or more cleaned data files not found. Please ensure previous steps are complete.")
+        exit()
+    df_products = read_frame("dim_product")
+    with step("load:abc_analysis_results") as s:
+        df_abc = read_frame("abc_analysis_results", columns=['ProductKey', 'ABC_Category'])
+        s.rows_out = len(df_abc)
+
+    save_inventory_metrics(run_inventory_optimization("sales_cube_daily", df_products, "df_purchases_cleaned", df_abc))
+    print("\n--- EOQ and Reorder Point Analysis Complete. Results saved to inventory_optimization_metrics.csv ---")
+
+
+if __name__ == "__main__":
+    with run_report("inventory_optimization"):
+        main()
@@ -0,0 +1,184 @@
+import pandas as pd
+import numpy as np
+import argparse
+from statistics import NormalDist
+
+from data_store import read_frame, write_frame
+from dimensions import decode, load_dimensions
+from inventory_optimization import ORDERING_COST_S, HOLDING_COST_PERCENTAGE
+
+# Per-store, per-SKU replenishment policy: EOQ, safety stock and reorder point for every
+# (StoreKey, ProductKey) position, computed in one vectorized pass on the surrogate keys;
+# the Store and Brand/Description/Size labels are decoded once into the stored table.
+#   Safety Stock SS = z * sqrt(L * sigma_d^2 + d^2 * sigma_L^2)
+#   ROP = d * L + SS
+# d / sigma_d: mean / std of daily demand of the position (days without sales count as 0)
+# L / sigma_L: mean / std of the lead time, from the most specific level with enough purchases:
+#   the position itself, then the SKU across stores, then the vendor, then all purchases.
+
+POSITION_KEYS = ['StoreKey', 'ProductKey']
+POSITION_COLS = ['Store', 'Brand', 'Description', 'Size']
+
+# Target cycle service level per ABC category (products without a category use the default)
+SERVICE_LEVELS = {'A': 0.99, 'B': 0.95, 'C': 0.90}
+DEFAULT_SERVICE_LEVEL = 0.90
+
+# Minimum number of purchase lines for a lead-time estimate to be used at a given level
+MIN_LEAD_TIME_OBSERVATIONS = 3
+
+# Rows per Parquet row group; the table is sorted by Store/Brand so filtered queries skip row groups
+POLICY_ROW_GROUP_SIZE = 65_536
+
+
+def validate_service_levels(service_levels, default_service_level=DEFAULT_SERVICE_LEVEL):
+    """Raise ValueError unless every service level is a probability strictly between 0 and 1."""
+    # inv_cdf has no z score for 0 or 1 (an infinite safety stock)
+    levels = {**service_levels, 'default': default_service_level}
+    invalid = [f"{category}={level!r}" for category, level in levels.items()
+               if not isinstance(level, (int, float, np.floating)) or not 0 < level < 1]
+    if invalid:
+        raise ValueError(f"Service levels must be between 0 and 1 (exclusive): {', '.join(invalid)}")
+
+
+def daily_demand_stats(df_sales_master):
+    # Daily totals per position, then mean / std over every day of the period (zero days included)
+    df_daily = df_sales_master.groupby(POSITION_KEYS + ['SalesDate'])['SalesQuantity'].sum().reset_index()
+    n_days = (df_sales_master['SalesDate'].max() - df_sales_master['SalesDate'].min()).days + 1
+
+    df_daily['SalesQuantity_Sq'] = df_daily['SalesQuantity'].astype('float64') ** 2
+    df_demand = df_daily.groupby(POSITION_KEYS).agg(
+        Total_Demand=('SalesQuantity', 'sum'),
+        Sales_Days=('SalesDate', 'size'),
+        Sum_Sq=('SalesQuantity_Sq', 'sum')
+    ).reset_index()
+
+    df_demand['Avg_Daily_Demand'] = df_demand['Total_Demand'] / n_days
+    variance = (df_demand['Sum_Sq'] - df_demand['Total_Demand'] ** 2 / n_days) / max(n_days - 1, 1)
+    df_demand['Daily_Demand_StdDev'] = np.sqrt(variance.clip(lower=0))
+    df_demand['Annual_Demand'] = df_demand['Avg_Daily_Demand'] * 365
+    return df_demand.drop(columns='Sum_Sq')
+
+
+def lead_time_stats(df_purchases_cleaned, df_positions):
+    """Lead time mean / std per position, falling back from position to SKU to vendor to overall."""
+    df_lead = df_purchases_cleaned.dropna(subset=['LeadTime_Days'])
+
+    def level_stats(keys, suffix):
+        df_stats = df_lead.groupby(keys)['LeadTime_Days'].agg(['mean', 'std', 'count']).reset_index()
+        df_stats = df_stats[df_stats['count'] >= MIN_LEAD_TIME_OBSERVATIONS]
+        return df_stats.rename(columns={'mean': f'L_mean_{suffix}', 'std': f'L_std_{suffix}'}).drop(columns='count')
+
+    df_stats = df_positions.merge(level_stats(POSITION_KEYS, 'position'), on=POSITION_KEYS, how='left')
+    df_stats = df_stats.merge(level_stats(['ProductKey'], 'sku'), on='ProductKey', how='left')
+    df_stats = df_stats.merge(level_stats(['VendorKey'], 'vendor'), on='VendorKey', how='left')
+
+    overall_mean = df_lead['LeadTime_Days'].mean()
+    overall_std = df_lead['LeadTime_Days'].std()
+    levels = ['position', 'sku', 'vendor']
+    df_stats['Avg_LeadTime_Days'] = df_stats[[f'L_mean_{level}' for level in levels]].bfill(axis=1).iloc[:, 0].fillna(overall_mean)
+    df_stats['LeadTime_StdDev'] = df_stats[[f'L_std_{level}' for level in levels]].bfill(axis=1).iloc[:, 0].fillna(overall_std)
+
+    # Record which level the estimate came from
+    df_stats['LeadTime_Source'] = np.select(
+        [df_stats[f'L_mean_{level}'].notna() for level in levels], levels, default='overall'
+    )
+    return df_stats[POSITION_KEYS + ['Avg_LeadTime_Days', 'LeadTime_StdDev', 'LeadTime_Source']]
+
+
+def build_inventory_policy(df_sales_master, df_purchases_cleaned, df_abc, dims, service_levels=SERVICE_LEVELS,
+                           ordering_cost=ORDERING_COST_S, holding_cost_percentage=HOLDING_COST_PERCENTAGE):
+    validate_service_levels(service_levels)
+    print("--- Starting Per-Store Inventory Policy Calculation ---")
+
+    # --- 1. Demand level and variability per (Store, SKU) ---
+    df_policy = daily_demand_stats(df_sales_master)
+
+    # Vendor of each position (used by the lead-time fallback)
+    df_vendor = df_sales_master[POSITION_KEYS + ['VendorKey']].drop_duplicates(subset=POSITION_KEYS)
+    df_policy = df_policy.merge(df_vendor, on=POSITION_KEYS, how='left')
+
+    # --- 2. Lead time level and variability ---
+    df_policy = df_policy.merge(
+        lead_time_stats(df_purchases_cleaned, df_policy[POSITION_KEYS + ['VendorKey']]), on=POSITION_KEYS, how='left'
+    )
+
+    # --- 3. Unit cost and ABC category per SKU ---
+    df_unit_cost = df_purchases_cleaned.groupby('ProductKey')['PurchasePrice'].mean().reset_index(name='Avg_Unit_Cost')
+    df_policy = df_policy.merge(df_unit_cost, on='ProductKey', how='left')
+    df_policy['Avg_Unit_Cost'] = df_policy['Avg_Unit_Cost'].fillna(0)
+    df_policy = df_policy.merge(df_abc[['ProductKey', 'ABC_Category']], on='ProductKey', how='left')
+
+    # --- 4. Service level -> z score per ABC category ---
+    df_policy['Service_Level'] = df_policy['ABC_Category'].map(service_levels).fillna(DEFAULT_SERVICE_LEVEL)
+    z_scores = {level: NormalDist().inv_cdf(level) for level in df_policy['Service_Level'].unique()}
+    z = df_policy['Service_Level'].map(z_scores)
+
+    # --- 5. Safety stock, reorder point and EOQ ---
+    d, sigma_d = df_policy['Avg_Daily_Demand'], df_policy['Daily_Demand_StdDev']
+    L, sigma_L = df_policy['Avg_LeadTime_Days'], df_policy['LeadTime_StdDev']
+    df_policy['Safety_Stock'] = np.ceil(z * np.sqrt(L * sigma_d ** 2 + d ** 2 * sigma_L ** 2)).fillna(0).astype(int)
+    df_policy['Reorder_Point_ROP'] = (d * L).round(0).fillna(0).astype(int) + df_policy['Safety_Stock']
+
+    holding_cost = df_policy['Avg_Unit_Cost'] * holding_cost_percentage
+    epsilon = 1e-6
+    eoq = np.sqrt((2 * df_policy['Annual_Demand'] * ordering_cost) / (holding_cost + epsilon)).round(0)
+    df_policy['EOQ'] = eoq.fillna(0).replace([np.inf, -np.inf], 0).astype(int)
+
+    # Store and product labels for the stored table (queried by Store / Brand)
+    df_policy = decode(df_policy, dims, columns=POSITION_COLS, keep_keys=True)
+    df_policy = df_policy.sort_values(POSITION_COLS).reset_index(drop=True)
+
+    print(f"Positions (Store x SKU): {len(df_policy)}")
+    print("\nPolicy Summary by ABC Category:")
+    print(df_policy.groupby('ABC_Category', dropna=False).agg(
+        Positions=('Store', 'size'),
+        Service_Level=('Service_Level', 'first'),
+        Total_Safety_Stock=('Safety_Stock', 'sum'),
+        Avg_ROP=('Reorder_Point_ROP', 'mean'),
+        Avg_EOQ=('EOQ', 'mean')
+    ).reset_index().to_markdown(index=False, floatfmt=".2f"))
+    return df_policy
+
+
+def save_inventory_policy(df_policy):
+    write_frame(df_policy, "inventory_policy", row_group_size=POLICY_ROW_GROUP_SIZE)
+
+
+def query_policy(store=None, brand=None, abc_category=None, columns=None):
+    """Read stored policies for a store / brand / ABC category without recomputing them."""
+    filters = [(col, '==', value) for col, value in
+               [('Store', store), ('Brand', brand), ('ABC_Category', abc_category)] if value is not None]
+    return read_frame("inventory_policy", columns=columns, filters=filters or None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the per-store, per-SKU inventory policy.")
+    parser.add_argument('--store', type=int, help="Query the stored policy for this store instead of rebuilding")
+    parser.add_argument('--brand', type=int, help="Query the stored policy for this brand instead of rebuilding")
+    args = parser.parse_args()
+
+    if args.store is not None or args.brand is not None:
+        try:
+            df_result = query_policy(store=args.store, brand=args.brand)
+        except FileNotFoundError:
+            print("Error: inventory_policy not found. Run inventory_policy.py without arguments first.")
+            exit()
+        print(df_result[POSITION_COLS + ['ABC_Category', 'Avg_Daily_Demand', 'Avg_LeadTime_Days',
+                                         'Safety_Stock', 'Reorder_Point_ROP', 'EOQ']].to_markdown(index=False, floatfmt=".2f"))
+        return
+
+    try:
+        df_sales_master = read_frame("df_sales_master", columns=POSITION_KEYS + ['VendorKey', 'SalesDate', 'SalesQuantity'])
+        df_purchases_cleaned = read_frame("df_purchases_cleaned", columns=POSITION_KEYS + ['VendorKey', 'PurchasePrice', 'LeadTime_Days'])
+        df_abc = read_frame("abc_analysis_results", columns=['ProductKey', 'ABC_Category'])
+        dims = load_dimensions(['dim_product', 'dim_store'])
+    except FileNotFoundError:
+        print("Error: One or more cleaned data files not found. Please ensure previous steps are complete.")
+        exit()
+
+    save_inventory_policy(build_inventory_policy(df_sales_master, df_purchases_cleaned, df_abc, dims))
+    print("\n--- Inventory Policy Complete. Results saved to the inventory_policy dataset ---")
+
+
+if __name__ == "__main__":
+    main()
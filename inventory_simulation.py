@@ -0,0 +1,233 @@
+import pandas as pd
+import numpy as np
+import argparse
+
+from data_store import frame_exists, read_frame, write_frame
+
+# Day-by-day inventory simulation of every (Store, SKU) position over the sales history, to check
+# whether a reorder policy actually avoids stockouts.
+# Each position starts from its BegInvFINAL on-hand; every day
+#   1. orders due that day are received,
+#   2. the recorded sales of the day are served from stock (demand beyond on-hand is lost),
+#   3. positions whose inventory position (on-hand + on order) is at or below the ROP order
+#      enough multiples of EOQ to get back above it, arriving after a lead time drawn from the
+#      empirical LeadTime_Days distribution.
+# Policies compared:
+#   historical   - no reorders, the recorded purchase receipts instead (a replay of what happened)
+#   optimization - per-SKU EOQ / ROP of inventory_optimization.py, split across the stores of the
+#                  SKU by each store's share of its sales quantity (ROP and EOQ rounded up, at least
+#                  1 unit of EOQ where the store sells the SKU): the SKU policy is company-wide, so
+#                  applying it whole at every store would hold the SKU's stock once per store
+#   store_policy - per-position EOQ / ROP of inventory_policy.py (when it has been built)
+# The day loop is the only Python loop: all policies and positions are updated together as one
+# flat array (slot = policy * n_positions + position). The ending on-hand of each policy is checked
+# against EndInvFINAL. Without any recorded LeadTime_Days, every order takes the overall average lead
+# time of inventory_optimization.py instead.
+
+POSITION_KEYS = ['StoreKey', 'ProductKey']
+
+# Seed of the lead-time sampling, so runs are reproducible
+SIMULATION_SEED = 42
+
+
+def build_positions(df_inventory_master, df_sales_master):
+    """Every position with inventory or sales, sorted by key, with its starting and ending on-hand."""
+    df_positions = pd.concat([df_inventory_master[POSITION_KEYS], df_sales_master[POSITION_KEYS]]).drop_duplicates()
+    df_positions = df_positions.merge(
+        df_inventory_master[POSITION_KEYS + ['Beg_onHand', 'End_onHand', 'Avg_Price']], on=POSITION_KEYS, how='left'
+    )
+    df_positions[['Beg_onHand', 'End_onHand', 'Avg_Price']] = df_positions[['Beg_onHand', 'End_onHand', 'Avg_Price']].fillna(0)
+    return df_positions.sort_values(POSITION_KEYS).reset_index(drop=True)
+
+
+def split_sku_policy(df_positions, df_sales_master, df_eoq_rop):
+    """(ROP, EOQ) arrays aligned with df_positions: the per-SKU policy split by each store's share of the SKU's sales."""
+    df_share = df_sales_master.groupby(POSITION_KEYS, observed=True)['SalesQuantity'].sum().rename('Share').reset_index()
+    df_share['Share'] = df_share['Share'] / df_share.groupby('ProductKey', observed=True)['Share'].transform('sum')
+    df_split = df_positions[POSITION_KEYS].merge(df_share, on=POSITION_KEYS, how='left').merge(
+        df_eoq_rop[['ProductKey', 'Reorder_Point_ROP', 'EOQ']], on='ProductKey', how='left'
+    )
+    # Positions without sales, or of SKUs without a policy, never reorder
+    share = df_split['Share'].fillna(0).clip(lower=0).to_numpy()
+    sku_eoq = df_split['EOQ'].fillna(0).to_numpy()
+    rop = np.ceil(df_split['Reorder_Point_ROP'].fillna(0).to_numpy() * share)
+    eoq = np.where((share > 0) & (sku_eoq > 0), np.maximum(np.ceil(sku_eoq * share), 1), 0)
+    return rop, eoq
+
+
+def _position_index(df_positions, df):
+    # Row of df_positions of each row of df (every position of df must exist)
+    index = pd.MultiIndex.from_frame(df_positions[POSITION_KEYS])
+    return index.get_indexer(pd.MultiIndex.from_frame(df[POSITION_KEYS]))
+
+
+def _day_events(df_positions, df, date_col, qty_col, start_date, n_days):
+    # (day, position, quantity) of the rows of df inside the period, sorted by day, with day boundaries
+    days = (df[date_col].dt.normalize() - start_date).dt.days.to_numpy()
+    inside = (days >= 0) & (days < n_days)
+    df_events = pd.DataFrame({
+        'Day': days[inside], 'Position': _position_index(df_positions, df[inside]), 'Quantity': df[qty_col].to_numpy()[inside],
+    })
+    df_events = df_events[df_events['Position'] >= 0].groupby(['Day', 'Position'])['Quantity'].sum().reset_index()
+    bounds = np.searchsorted(df_events['Day'].to_numpy(), np.arange(n_days + 1))
+    return df_events['Position'].to_numpy(), df_events['Quantity'].to_numpy(dtype='float64'), bounds
+
+
+def simulate(df_positions, df_sales_master, policies, df_receipts, lead_times, seed=SIMULATION_SEED):
+    """
+    Run every policy over the sales period. policies maps name -> (ROP, EOQ) arrays aligned with
+    df_positions, or None for the historical replay of df_receipts. Returns per-(policy, position) metrics.
+    """
+    start_date = df_sales_master['SalesDate'].min().normalize()
+    n_days = (df_sales_master['SalesDate'].max().normalize() - start_date).days + 1
+    n_positions, n_policies = len(df_positions), len(policies)
+    rng = np.random.default_rng(seed)
+
+    sale_positions, sale_quantities, sale_bounds = _day_events(
+        df_positions, df_sales_master, 'SalesDate', 'SalesQuantity', start_date, n_days)
+
+    # Flat (policy, position) state; historical slots never reorder (ROP = -inf)
+    rop = np.concatenate([np.full(n_positions, -np.inf) if policy is None else np.asarray(policy[0], dtype='float64')
+                          for policy in policies.values()])
+    eoq = np.concatenate([np.zeros(n_positions) if policy is None else np.asarray(policy[1], dtype='float64')
+                          for policy in policies.values()])
+    on_hand = np.tile(df_positions['Beg_onHand'].to_numpy(dtype='float64'), n_policies)
+    on_order = np.zeros(n_policies * n_positions)
+
+    # Recorded purchase receipts (historical slots) and simulated orders due, per day
+    receipt_positions, receipt_quantities, receipt_bounds = _day_events(
+        df_positions, df_receipts, 'ReceivingDate', 'Quantity', start_date, n_days)
+    historical_offsets = np.array([p * n_positions for p, policy in enumerate(policies.values()) if policy is None], dtype='int64')
+    arrivals = [[] for _ in range(n_days)]
+
+    demand_total = np.zeros_like(on_hand)
+    sold_total = np.zeros_like(on_hand)
+    stockout_days = np.zeros(on_hand.shape, dtype='int64')
+    inventory_sum = np.zeros_like(on_hand)
+    orders = np.zeros(on_hand.shape, dtype='int64')
+    policy_offsets = np.arange(n_policies) * n_positions
+
+    for day in range(n_days):
+        # 1. Receipts
+        block = slice(receipt_bounds[day], receipt_bounds[day + 1])
+        for offset in historical_offsets:
+            np.add.at(on_hand, receipt_positions[block] + offset, receipt_quantities[block])
+        for slots, quantities in arrivals[day]:
+            np.add.at(on_hand, slots, quantities)
+            np.subtract.at(on_order, slots, quantities)
+        arrivals[day] = None
+
+        # 2. Demand of the day, the same recorded sales for every policy
+        block = slice(sale_bounds[day], sale_bounds[day + 1])
+        slots = (sale_positions[block][None, :] + policy_offsets[:, None]).ravel()
+        demand = np.tile(sale_quantities[block], n_policies)
+        sold = np.minimum(demand, np.maximum(on_hand[slots], 0))
+        on_hand[slots] -= sold
+        demand_total[slots] += demand
+        sold_total[slots] += sold
+        stockout_days[slots] += sold < demand
+        inventory_sum += on_hand
+
+        # 3. Reorders
+        position = on_hand + on_order
+        reorder = np.flatnonzero((position <= rop) & (eoq > 0))
+        if len(reorder):
+            quantities = np.ceil((rop[reorder] - position[reorder] + 1) / eoq[reorder]) * eoq[reorder]
+            lead = np.maximum(np.rint(rng.choice(lead_times, size=len(reorder))).astype(int), 1)
+            on_order[reorder] += quantities
+            orders[reorder] += 1
+            due = day + lead
+            for due_day in np.unique(due[due < n_days]):
+                mask = due == due_day
+                arrivals[due_day].append((reorder[mask], quantities[mask]))
+
+    return pd.DataFrame({
+        'Policy': np.repeat(list(policies), n_positions),
+        **{key: np.tile(df_positions[key].to_numpy(), n_policies) for key in POSITION_KEYS},
+        'Demand': demand_total,
+        'Sold': sold_total,
+        'Stockout_Days': stockout_days,
+        'Avg_onHand': inventory_sum / n_days,
+        'Avg_Inventory_Value': inventory_sum / n_days * np.tile(df_positions['Avg_Price'].to_numpy(), n_policies),
+        'Orders': orders,
+        'Sim_End_onHand': on_hand,
+        'End_onHand': np.tile(df_positions['End_onHand'].to_numpy(), n_policies),
+    })
+
+
+def summarize_simulation(df_results):
+    """Fill rate, stockout days, average inventory and the EndInvFINAL check per policy."""
+    df_results = df_results.assign(End_Error=(df_results['Sim_End_onHand'] - df_results['End_onHand']).abs())
+    df_summary = df_results.groupby('Policy', sort=False).agg(
+        Demand=('Demand', 'sum'),
+        Sold=('Sold', 'sum'),
+        Stockout_Days=('Stockout_Days', 'sum'),
+        Positions_With_Stockout=('Stockout_Days', lambda days: int((days > 0).sum())),
+        Avg_onHand=('Avg_onHand', 'sum'),
+        Avg_Inventory_Value=('Avg_Inventory_Value', 'sum'),
+        Orders=('Orders', 'sum'),
+        Sim_End_onHand=('Sim_End_onHand', 'sum'),
+        End_onHand=('End_onHand', 'sum'),
+        End_MAE=('End_Error', 'mean'),
+    ).reset_index()
+    df_summary.insert(3, 'Fill_Rate', df_summary['Sold'] / df_summary['Demand'])
+    return df_summary
+
+
+def run_inventory_simulation(df_sales_master, df_inventory_master, df_purchases_cleaned, df_eoq_rop, df_policy=None,
+                             seed=SIMULATION_SEED):
+    print("--- Starting Inventory Policy Simulation ---")
+
+    df_positions = build_positions(df_inventory_master, df_sales_master)
+    policies = {'historical': None}
+
+    policies['optimization'] = split_sku_policy(df_positions, df_sales_master, df_eoq_rop)
+    if df_policy is not None:
+        df_store_policy = df_positions[POSITION_KEYS].merge(df_policy[POSITION_KEYS + ['Reorder_Point_ROP', 'EOQ']], on=POSITION_KEYS, how='left')
+        policies['store_policy'] = (df_store_policy['Reorder_Point_ROP'].fillna(0).to_numpy(), df_store_policy['EOQ'].fillna(0).to_numpy())
+
+    lead_times = df_purchases_cleaned['LeadTime_Days'].dropna().to_numpy()
+    if len(lead_times) == 0:
+        overall_avg_lead_time = df_eoq_rop['Avg_LeadTime_Days'].mean() if 'Avg_LeadTime_Days' in df_eoq_rop else np.nan
+        lead_times = np.array([1.0 if np.isnan(overall_avg_lead_time) else overall_avg_lead_time])
+        print(f"No recorded lead times: every order takes {lead_times[0]:.1f} days.")
+    df_results = simulate(df_positions, df_sales_master, policies, df_purchases_cleaned, lead_times, seed)
+    df_summary = summarize_simulation(df_results)
+
+    print(f"Positions (Store x SKU): {len(df_positions)}, Policies: {', '.join(policies)}")
+    print("\nSimulation Summary by Policy:")
+    print(df_summary[['Policy', 'Fill_Rate', 'Stockout_Days', 'Positions_With_Stockout', 'Avg_onHand',
+                      'Avg_Inventory_Value', 'Orders']].to_markdown(index=False, floatfmt=".3f"))
+    print("\nEnding Inventory vs EndInvFINAL:")
+    print(df_summary[['Policy', 'Sim_End_onHand', 'End_onHand', 'End_MAE']].to_markdown(index=False, floatfmt=".2f"))
+    return df_results, df_summary
+
+
+def save_simulation_results(df_results, df_summary):
+    write_frame(df_results, "inventory_simulation")
+    df_summary.to_csv("/home/ubuntu/inventory_simulation_summary.csv", index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the reorder policies day by day over the sales history.")
+    parser.add_argument('--seed', type=int, default=SIMULATION_SEED, help="Seed of the lead-time sampling")
+    args = parser.parse_args()
+
+    try:
+        df_sales_master = read_frame("df_sales_master", columns=POSITION_KEYS + ['SalesDate', 'SalesQuantity'])
+        df_inventory_master = read_frame("df_inventory_master", columns=POSITION_KEYS + ['Beg_onHand', 'End_onHand', 'Avg_Price'])
+        df_purchases_cleaned = read_frame("df_purchases_cleaned", columns=POSITION_KEYS + ['ReceivingDate', 'Quantity', 'LeadTime_Days'])
+        df_eoq_rop = read_frame("inventory_optimization_metrics", columns=['ProductKey', 'Reorder_Point_ROP', 'EOQ', 'Avg_LeadTime_Days'])
+    except FileNotFoundError:
+        print("Error: One or more input files not found. Please run data_preparation.py and inventory_optimization.py first.")
+        exit()
+    df_policy = read_frame("inventory_policy", columns=POSITION_KEYS + ['Reorder_Point_ROP', 'EOQ']) if frame_exists("inventory_policy") else None
+
+    save_simulation_results(*run_inventory_simulation(
+        df_sales_master, df_inventory_master, df_purchases_cleaned, df_eoq_rop, df_policy, args.seed
+    ))
+    print("\n--- Inventory Simulation Complete. Results saved to inventory_simulation_summary.csv ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,82 @@
 import pandas as pd
 import os
-
-# Load the cleaned purchases data
-try:
-    df_purchases = pd.read_csv("/home/ubuntu/df_purchases_cleaned.csv")
-except FileNotFoundError:
-    print("Error: df_purchases_cleaned.csv not found. Please ensure data preparation is complete.")
-    exit()
-
-print("--- Starting Lead Time and Supplier Analysis ---")
-
-# --- 1. Overall Lead Time Distribution ---
-overall_avg_lead_time = df_purchases['LeadTime_Days'].mean()
-overall_median_lead_time = df_purchases['LeadTime_Days'].median()
-overall_std_lead_time = df_purchases['LeadTime_Days'].std()
-
-print(f"Overall Average Lead Time (Receiving - PO Date): {overall_avg_lead_time:.2f} days")
-print(f"Overall Median Lead Time: {overall_median_lead_time:.0f} days")
-print(f"Overall Standard Deviation of Lead Time: {overall_std_lead_time:.2f} days")
-
-# --- 2. Vendor Performance Analysis ---
-# Group by Vendor and calculate average lead time and number of purchases
-df_vendor_performance = df_purchases.groupby(['VendorNumber', 'VendorName']).agg(
-    Avg_LeadTime_Days=('LeadTime_Days', 'mean'),
-    Total_Purchases=('PONumber', 'nunique'),
-    Total_Purchase_Dollars=('Dollars', 'sum')
-).reset_index()
-
-# Sort by Total Purchase Dollars to focus on major vendors
-df_vendor_performance = df_vendor_performance.sort_values(by='Total_Purchase_Dollars', ascending=False)
-
-print("\nTop 10 Vendors by Purchase Volume and their Lead Time Performance:")
-print(df_vendor_performance.head(10).to_markdown(index=False, floatfmt=(".2f", ".0f", ".2f")))
-
-# --- 3. Lead Time Consistency (Standard Deviation) ---
-# Calculate the standard deviation of lead time for each vendor
-df_vendor_std = df_purchases.groupby(['VendorNumber', 'VendorName'])['LeadTime_Days'].std().reset_index(name='LeadTime_StdDev')
-
-# Merge with the performance data
-df_vendor_performance = pd.merge(df_vendor_performance, df_vendor_std, on=['VendorNumber', 'VendorName'], how='left')
-
-# Focus on the top 10 vendors by purchase volume and their consistency
-df_vendor_consistency = df_vendor_performance.sort_values(by='Total_Purchase_Dollars', ascending=False).head(10)
-
-print("\nLead Time Consistency for Top 10 Vendors (Lower StdDev is better):")
-print(df_vendor_consistency[['VendorName', 'Avg_LeadTime_Days', 'LeadTime_StdDev']].to_markdown(index=False, floatfmt=".2f"))
-
-# --- 4. Payment Lag Analysis (PayDate - InvoiceDate) ---
-df_purchases['InvoiceDate'] = pd.to_datetime(df_purchases['InvoiceDate'])
-df_purchases['PayDate'] = pd.to_datetime(df_purchases['PayDate'])
-df_purchases['Payment_Lag_Days'] = (df_purchases['PayDate'] - df_purchases['InvoiceDate']).dt.days
-
-df_payment_lag = df_purchases.groupby(['VendorNumber', 'VendorName'])['Payment_Lag_Days'].mean().reset_index(name='Avg_Payment_Lag_Days')
-df_payment_lag = df_payment_lag.sort_values(by='Avg_Payment_Lag_Days', ascending=False)
-
-print("\nTop 10 Vendors by Average Payment Lag (Days):")
-print(df_payment_lag.head(10).to_markdown(index=False, floatfmt=".2f"))
-
-print("\n--- Lead Time and Supplier Analysis Complete ---")
-
+from data_store import frame_exists, read_frame
+from dimensions import decode
+from execution_backend import group_aggregate, read_source, source_rows
+from instrumentation import run_report, step
+
+
+def vendor_labels(df, df_vendors):
+    # VendorKey -> VendorNumber / VendorName, as named in the purchase files
+    return decode(df, {'dim_vendor': df_vendors}).rename(columns={'VendorNo': 'VendorNumber'})
+
+
+def run_lead_time_analysis(purchases, df_vendors, backend=None):
+    # purchases: the cleaned purchases as a DataFrame, or the store dataset name (read by the aggregation backend)
+    print("--- Starting Lead Time and Supplier Analysis ---")
+
+    # --- 1. Overall Lead Time Distribution ---
+    lead_times = read_source(purchases, ['LeadTime_Days'])['LeadTime_Days']
+    overall_avg_lead_time = lead_times.mean()
+    overall_median_lead_time = lead_times.median()
+    overall_std_lead_time = lead_times.std()
+
+    print(f"Overall Average Lead Time (Receiving - PO Date): {overall_avg_lead_time:.2f} days")
+    print(f"Overall Median Lead Time: {overall_median_lead_time:.0f} days")
+    print(f"Overall Standard Deviation of Lead Time: {overall_std_lead_time:.2f} days")
+
+    # --- 2. Vendor Performance Analysis ---
+    # Group by Vendor and calculate average lead time, its standard deviation (consistency, section 3)
+    # and number of purchases in a single aggregation pass (on VendorKey, decoded from dim_vendor)
+    with step("groupby_vendor_performance", rows_in=source_rows(purchases)) as s:
+        df_vendor_performance = vendor_labels(group_aggregate(purchases, ['VendorKey'], {
+            'Avg_LeadTime_Days': ('LeadTime_Days', 'mean'),
+            'Total_Purchases': ('PONumber', 'nunique'),
+            'Total_Purchase_Dollars': ('Dollars', 'sum'),
+            'LeadTime_StdDev': ('LeadTime_Days', 'std'),
+        }, backend), df_vendors)
+        s.rows_out = len(df_vendor_performance)
+
+    # Sort by Total Purchase Dollars to focus on major vendors
+    df_vendor_performance = df_vendor_performance.sort_values(by='Total_Purchase_Dollars', ascending=False)
+
+    print("\nTop 10 Vendors by Purchase Volume and their Lead Time Performance:")
+    print(df_vendor_performance.drop(columns='LeadTime_StdDev').head(10).to_markdown(index=False, floatfmt=(".2f", ".0f", ".2f")))
+
+    # --- 3. Lead Time Consistency (Standard Deviation) ---
+    # Focus on the top 10 vendors by purchase volume and their consistency
+    df_vendor_consistency = df_vendor_performance.sort_values(by='Total_Purchase_Dollars', ascending=False).head(10)
+
+    print("\nLead Time Consistency for Top 10 Vendors (Lower StdDev is better):")
+    print(df_vendor_consistency[['VendorName', 'Avg_LeadTime_Days', 'LeadTime_StdDev']].to_markdown(index=False, floatfmt=".2f"))
+
+    # --- 4. Payment Lag Analysis (PayDate - InvoiceDate) ---
+    # (derived per line by the backend, so the shared purchases frame stays untouched)
+    with step("groupby_payment_lag", rows_in=source_rows(purchases)) as s:
+        df_payment_lag = vendor_labels(group_aggregate(purchases, ['VendorKey'], {
+            'Avg_Payment_Lag_Days': ('Payment_Lag_Days', 'mean'),
+        }, backend, derive={'Payment_Lag_Days': ('days_between', 'InvoiceDate', 'PayDate')}), df_vendors)
+        s.rows_out = len(df_payment_lag)
+    df_payment_lag = df_payment_lag.sort_values(by='Avg_Payment_Lag_Days', ascending=False)
+
+    print("\nTop 10 Vendors by Average Payment Lag (Days):")
+    print(df_payment_lag.head(10).to_markdown(index=False, floatfmt=".2f"))
+
+    return df_vendor_performance, df_payment_lag
+
+
+def main():
+    # The purchases are read by the aggregation backend from the store (only the columns each step needs)
+    if not (frame_exists("df_purchases_cleaned") and frame_exists("dim_vendor")):
+        print("Error: df_purchases_cleaned not found. Please ensure data preparation is complete.")
+        exit()
+    with step("load:dim_vendor"):
+        df_vendors = read_frame("dim_vendor")
+
+    run_lead_time_analysis("df_purchases_cleaned", df_vendors)
+    print("\n--- Lead Time and Supplier Analysis Complete ---")
+
+
+if __name__ == "__main__":
+    with run_report("lead_time_analysis"):
+        main()
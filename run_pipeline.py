@@ -0,0 +1,474 @@
+import pandas as pd
+import argparse
+import ast
+import io
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import data_preparation
+import abc_analysis
+import demand_forecasting
+import batch_forecasting
+import inventory_optimization
+import inventory_policy
+import inventory_simulation
+import lead_time_analysis
+import additional_insights
+import execution_backend
+from data_store import read_frame
+from instrumentation import profile_thread, run_report, step
+from sales_cube import SalesCube
+from stage_cache import StageCache
+
+
+# --- Stage functions ---
+# Each stage receives the shared in-memory frames and its parameters and returns the frames it produces.
+# The optional save function writes those outputs to the store / report files; it is kept separate so a
+# stage served from the stage cache can restore its files without recomputing.
+
+def _run_prepare(frames, params):
+    return data_preparation.prepare_data(data_preparation.load_raw_data(params['upload_dir']))
+
+
+def _run_abc(frames, params):
+    return {'abc_analysis_results': abc_analysis.run_abc_analysis(frames['df_sales_master'], frames['dim_product'])}
+
+
+def _run_abc_segments(frames, params):
+    return {'abc_segmented_results': abc_analysis.run_segmented_abc(
+        frames['sales_cube_weekly'], frames['dim_product'], frames['dim_store']
+    )}
+
+
+def _run_forecast(frames, params):
+    sales_cube = SalesCube(frames['sales_cube_weekly'], frames['dim_product'], 'W')
+    df_forecast, history = demand_forecasting.run_demand_forecast(sales_cube, frames['abc_analysis_results'])
+    return {'demand_forecast': df_forecast, 'demand_forecast_history': history}
+
+
+def _run_batch_forecast(frames, params):
+    sales_cube = SalesCube(frames['sales_cube_weekly'], frames['dim_product'], 'W')
+    return {'demand_forecasts': batch_forecasting.run_batch_forecast(
+        sales_cube, frames['abc_analysis_results'], params['categories'], params['method']
+    )}
+
+
+def _run_optimize(frames, params):
+    return {'inventory_optimization_metrics': inventory_optimization.run_inventory_optimization(
+        frames['sales_cube_daily'], frames['dim_product'], frames['df_purchases_cleaned'], frames['abc_analysis_results'],
+        ordering_cost=params['ordering_cost'], holding_cost_percentage=params['holding_cost_percentage']
+    )}
+
+
+def _run_policy(frames, params):
+    return {'inventory_policy': inventory_policy.build_inventory_policy(
+        frames['df_sales_master'], frames['df_purchases_cleaned'], frames['abc_analysis_results'],
+        {'dim_product': frames['dim_product'], 'dim_store': frames['dim_store']},
+        params['service_levels'], params['ordering_cost'], params['holding_cost_percentage']
+    )}
+
+
+def _run_simulation(frames, params):
+    df_results, df_summary = inventory_simulation.run_inventory_simulation(
+        frames['df_sales_master'], frames['df_inventory_master'], frames['df_purchases_cleaned'],
+        frames['inventory_optimization_metrics'], frames['inventory_policy'], params['seed']
+    )
+    return {'inventory_simulation': df_results, 'inventory_simulation_summary': df_summary}
+
+
+def _run_lead_time(frames, params):
+    df_vendor_performance, df_payment_lag = lead_time_analysis.run_lead_time_analysis(
+        frames['df_purchases_cleaned'], frames['dim_vendor']
+    )
+    return {'vendor_performance': df_vendor_performance, 'vendor_payment_lag': df_payment_lag}
+
+
+def _run_insights(frames, params):
+    return {'additional_insights': additional_insights.run_additional_insights(
+        frames['sales_cube_weekly'], frames['df_sales_master'], frames['df_inventory_master'], frames['dim_store'], frames['dim_product']
+    )}
+
+
+def _upload_files(params):
+    return [os.path.join(params['upload_dir'], file_name) for file_name in data_preparation.RAW_FILES.values()]
+
+
+# --- Stage graph ---
+# Dependencies are derived from the inputs/outputs: a stage waits for the stages producing its inputs.
+# Inputs that no selected stage produces are loaded once from the columnar store.
+# params: stage parameters (override with --param stage.name=value); code: modules whose source, with
+# the project modules they import (project_modules), is part of the stage cache key; files: raw files
+# the stage reads, as a function of its params; validate: checks the params (raises ValueError) before any stage runs.
+STAGES = {
+    'prepare': {
+        'func': _run_prepare,
+        'save': data_preparation.save_prepared_data,
+        'inputs': [],
+        'outputs': ['df_sales_master', 'df_purchases_cleaned', 'df_inventory_master',
+                    'purchase_price_aggregates', 'brand_size_lookup',
+                    'sales_cube_daily', 'sales_cube_weekly', 'dim_product', 'dim_store', 'dim_vendor'],
+        'params': {'upload_dir': data_preparation.upload_dir},
+        'code': [data_preparation],
+        'files': _upload_files,
+    },
+    'abc': {
+        'func': _run_abc,
+        'save': lambda outputs: abc_analysis.save_abc_results(outputs['abc_analysis_results']),
+        'inputs': ['df_sales_master', 'dim_product'],
+        'outputs': ['abc_analysis_results'],
+        'code': [abc_analysis],
+    },
+    'abc_segments': {
+        'func': _run_abc_segments,
+        'save': lambda outputs: abc_analysis.save_segmented_results(outputs['abc_segmented_results']),
+        'inputs': ['sales_cube_weekly', 'dim_product', 'dim_store'],
+        'outputs': ['abc_segmented_results'],
+        'code': [abc_analysis],
+    },
+    'forecast': {
+        'func': _run_forecast,
+        'save': lambda outputs: demand_forecasting.save_forecast_plot(
+            outputs['demand_forecast'], outputs['demand_forecast_history']),
+        'inputs': ['sales_cube_weekly', 'dim_product', 'abc_analysis_results'],
+        'outputs': ['demand_forecast', 'demand_forecast_history'],
+        'code': [demand_forecasting],
+    },
+    'batch_forecast': {
+        'func': _run_batch_forecast,
+        'save': lambda outputs: batch_forecasting.save_batch_forecasts(outputs['demand_forecasts']),
+        'inputs': ['sales_cube_weekly', 'dim_product', 'abc_analysis_results'],
+        'outputs': ['demand_forecasts'],
+        'params': {'categories': ('A', 'B'), 'method': 'auto'},
+        'code': [batch_forecasting],
+    },
+    'optimize': {
+        'func': _run_optimize,
+        'save': lambda outputs: inventory_optimization.save_inventory_metrics(outputs['inventory_optimization_metrics']),
+        'inputs': ['sales_cube_daily', 'dim_product', 'df_purchases_cleaned', 'abc_analysis_results'],
+        'outputs': ['inventory_optimization_metrics'],
+        'params': {'ordering_cost': inventory_optimization.ORDERING_COST_S,
+                   'holding_cost_percentage': inventory_optimization.HOLDING_COST_PERCENTAGE},
+        'code': [inventory_optimization],
+    },
+    'policy': {
+        'func': _run_policy,
+        'save': lambda outputs: inventory_policy.save_inventory_policy(outputs['inventory_policy']),
+        'inputs': ['df_sales_master', 'df_purchases_cleaned', 'abc_analysis_results', 'dim_product', 'dim_store'],
+        'outputs': ['inventory_policy'],
+        'params': {'service_levels': inventory_policy.SERVICE_LEVELS,
+                   'ordering_cost': inventory_optimization.ORDERING_COST_S,
+                   'holding_cost_percentage': inventory_optimization.HOLDING_COST_PERCENTAGE},
+        'validate': lambda params: inventory_policy.validate_service_levels(params['service_levels']),
+        'code': [inventory_policy],
+    },
+    'simulation': {
+        'func': _run_simulation,
+        'save': lambda outputs: inventory_simulation.save_simulation_results(
+            outputs['inventory_simulation'], outputs['inventory_simulation_summary']),
+        'inputs': ['df_sales_master', 'df_inventory_master', 'df_purchases_cleaned',
+                   'inventory_optimization_metrics', 'inventory_policy'],
+        'outputs': ['inventory_simulation', 'inventory_simulation_summary'],
+        'params': {'seed': inventory_simulation.SIMULATION_SEED},
+        'code': [inventory_simulation],
+    },
+    'lead_time': {
+        'func': _run_lead_time,
+        'inputs': ['df_purchases_cleaned', 'dim_vendor'],
+        'outputs': ['vendor_performance', 'vendor_payment_lag'],
+        'code': [lead_time_analysis],
+    },
+    'insights': {
+        'func': _run_insights,
+        'inputs': ['sales_cube_weekly', 'df_sales_master', 'df_inventory_master', 'dim_store', 'dim_product'],
+        'outputs': ['additional_insights'],
+        'code': [additional_insights],
+    },
+}
+
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def project_modules(modules):
+    """The given modules plus every module of this project they import, directly or not, sorted by name."""
+    found = {}
+    to_visit = list(modules)
+    while to_visit:
+        module = to_visit.pop()
+        if module.__name__ in found:
+            continue
+        found[module.__name__] = module
+        for value in vars(module).values():
+            # Imported modules, and the modules of imported functions and classes
+            dependency = value if isinstance(value, types.ModuleType) else sys.modules.get(getattr(value, '__module__', None) or '')
+            module_file = getattr(dependency, '__file__', None)
+            if module_file and os.path.dirname(os.path.abspath(module_file)) == PROJECT_DIR:
+                to_visit.append(dependency)
+    return [found[name] for name in sorted(found)]
+
+
+def stage_producer(frame_name):
+    for name, stage in STAGES.items():
+        if frame_name in stage['outputs']:
+            return name
+    return None
+
+
+def resolve_stages(stage_names=None, with_deps=False):
+    """Return the selected stages (plus their upstream stages if with_deps) in graph order."""
+    if not stage_names:
+        return list(STAGES)
+
+    unknown = [name for name in stage_names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}. Available: {', '.join(STAGES)}")
+
+    selected = set(stage_names)
+    if with_deps:
+        to_visit = list(stage_names)
+        while to_visit:
+            for frame_name in STAGES[to_visit.pop()]['inputs']:
+                producer = stage_producer(frame_name)
+                if producer and producer not in selected:
+                    selected.add(producer)
+                    to_visit.append(producer)
+    return [name for name in STAGES if name in selected]
+
+
+class _StageOutput(io.TextIOBase):
+    """sys.stdout replacement that buffers the prints of each stage thread separately."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer if buffer is not None else self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class _MemoryTracker:
+    """
+    Tracks the tracemalloc peak per stage. The peak is reset whenever a stage starts
+    with nothing else running, so stages that overlapped report the peak of the shared window.
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.running = set()
+        self.overlapped = set()
+
+    def start(self, name):
+        with self.lock:
+            if self.enabled and not self.running:
+                tracemalloc.reset_peak()
+            self.running.add(name)
+            if len(self.running) > 1:
+                self.overlapped.update(self.running)
+
+    def stop(self, name):
+        with self.lock:
+            self.running.discard(name)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2 if self.enabled else float('nan')
+            return peak_mb, name in self.overlapped
+
+
+def stage_params(overrides=None):
+    """Parameters of every stage: the STAGES defaults updated with overrides {stage: {name: value}}."""
+    overrides = overrides or {}
+    unknown = [name for name in overrides if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s) in parameters: {', '.join(unknown)}")
+    params = {}
+    for name, stage in STAGES.items():
+        defaults = stage.get('params', {})
+        invalid = [param for param in overrides.get(name, {}) if param not in defaults]
+        if invalid:
+            raise ValueError(f"Unknown parameter(s) for stage '{name}': {', '.join(invalid)}")
+        params[name] = {**defaults, **overrides.get(name, {})}
+        if 'validate' in stage:
+            stage['validate'](params[name])
+    return params
+
+
+def stage_cache_keys(selected, params, cache):
+    """Cache key of every selected stage, upstream stages first so their keys feed the downstream ones."""
+    keys = {}
+    for name in selected:
+        stage = STAGES[name]
+        inputs = {}
+        for frame_name in stage['inputs']:
+            producer = stage_producer(frame_name)
+            inputs[frame_name] = keys[producer] if producer in selected else cache.dataset_hash(frame_name)
+        code_files = [module.__file__ for module in project_modules(stage['code'])] + [__file__]
+        files = stage['files'](params[name]) if 'files' in stage else []
+        keys[name] = cache.stage_key(name, params[name], code_files, inputs, files)
+    return keys
+
+
+def parse_param_overrides(items):
+    """{stage: {name: value}} from STAGE.NAME=VALUE strings; values are Python literals or plain strings."""
+    overrides = {}
+    for item in items:
+        target, _, value = item.partition('=')
+        stage, _, param = target.partition('.')
+        if not value or not param:
+            raise ValueError(f"Invalid --param '{item}', expected STAGE.NAME=VALUE")
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass  # plain string
+        overrides.setdefault(stage, {})[param] = value
+    return overrides
+
+
+def run_pipeline(stage_names=None, with_deps=False, max_workers=4, trace_memory=True, params=None, cache=None):
+    """
+    Run the selected stages. params overrides the stage parameters ({stage: {name: value}});
+    with a StageCache, stages whose key is cached are served from it instead of recomputed.
+    """
+    selected = resolve_stages(stage_names, with_deps)
+    params = stage_params(params)
+    frames = {}
+    report = []
+
+    if trace_memory:
+        tracemalloc.start()
+    memory = _MemoryTracker(trace_memory)
+
+    # Load the inputs that no selected stage produces from the store
+    missing = [frame_name for name in selected for frame_name in STAGES[name]['inputs']
+               if stage_producer(frame_name) not in selected]
+    for frame_name in dict.fromkeys(missing):
+        start = time.perf_counter()
+        with step(f"load:{frame_name}") as s:
+            frames[frame_name] = read_frame(frame_name)
+            s.rows_out = len(frames[frame_name])
+        report.append({'Stage': f"load:{frame_name}", 'Status': 'ok', 'Cache': '',
+                       'Seconds': time.perf_counter() - start, 'Peak_MB': float('nan'), 'Overlapped': False})
+    keys = stage_cache_keys(selected, params, cache) if cache is not None else {}
+
+    dependencies = {
+        name: {stage_producer(f) for f in STAGES[name]['inputs'] if stage_producer(f) in selected}
+        for name in selected
+    }
+
+    stdout = _StageOutput(sys.stdout)
+    sys.stdout = stdout
+
+    def run_stage(name):
+        stage = STAGES[name]
+        stdout.local.buffer = io.StringIO()
+        memory.start(name)
+        start = time.perf_counter()
+        cached = cache.get(keys[name]) if cache is not None else None
+        try:
+            # The stage's own steps nest under it in the run report (and its calls in the profile)
+            with profile_thread(), step(f"stage:{name}"):
+                if cached is not None:
+                    outputs, text = cached
+                    # Rewrite the stage's files unless the store still holds this run's outputs
+                    if 'save' in stage and not cache.store_is_current(keys[name], stage['outputs']):
+                        stage['save'](outputs)
+                else:
+                    outputs = stage['func'](frames, params[name])
+                    if 'save' in stage:
+                        stage['save'](outputs)
+            error = None
+        except Exception as e:
+            outputs, error = {}, e
+        seconds = time.perf_counter() - start
+        peak_mb, overlapped = memory.stop(name)
+        if cached is None:
+            text = stdout.local.buffer.getvalue()
+        stdout.local.buffer = None
+
+        if cache is not None and error is None:
+            if cached is None:
+                cache.put(keys[name], name, outputs, text)
+            cache.record_store(keys[name], stage['outputs'])
+        status = 'off' if cache is None else ('hit' if cached is not None else 'miss')
+        return outputs, error, text, seconds, peak_mb, overlapped, status
+
+    pending = list(selected)
+    finished, failed = set(), set()
+    running = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending or running:
+                # Skip stages whose upstream failed, submit the ones whose inputs are ready
+                for name in list(pending):
+                    if dependencies[name] & failed:
+                        pending.remove(name)
+                        failed.add(name)
+                        report.append({'Stage': name, 'Status': 'skipped', 'Cache': '', 'Seconds': 0.0,
+                                       'Peak_MB': float('nan'), 'Overlapped': False})
+                    elif dependencies[name] <= finished:
+                        pending.remove(name)
+                        running[pool.submit(run_stage, name)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    outputs, error, text, seconds, peak_mb, overlapped, cache_status = future.result()
+                    stdout.stream.write(f"\n===== Stage: {name} =====\n{text}")
+                    if error is None:
+                        frames.update(outputs)
+                        finished.add(name)
+                    else:
+                        stdout.stream.write(f"Stage '{name}' failed: {error}\n")
+                        failed.add(name)
+                    report.append({'Stage': name, 'Status': 'ok' if error is None else 'failed', 'Cache': cache_status,
+                                   'Seconds': seconds, 'Peak_MB': peak_mb, 'Overlapped': overlapped})
+    finally:
+        sys.stdout = stdout.stream
+        if trace_memory:
+            tracemalloc.stop()
+
+    df_report = pd.DataFrame(report)
+    print("\nPipeline Stage Report:")
+    print(df_report.to_markdown(index=False, floatfmt=".2f"))
+    print("(Peak_MB is the traced Python/NumPy allocation peak; overlapped stages share one measurement window.)")
+    return frames, df_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the analysis stages as a dependency graph in one process.")
+    parser.add_argument('stages', nargs='*', help=f"Stages to run (default: all). Available: {', '.join(STAGES)}")
+    parser.add_argument('--with-deps', action='store_true', help="Also run the upstream stages of the selected stages")
+    parser.add_argument('--workers', type=int, default=4, help="Maximum number of stages running concurrently")
+    parser.add_argument('--no-memory-trace', action='store_true', help="Skip tracemalloc peak memory tracking")
+    parser.add_argument('--backend', choices=execution_backend.BACKENDS, default=execution_backend.DEFAULT_BACKEND,
+                        help="Engine for the grouped aggregations of the optimize, lead_time and insights stages")
+    parser.add_argument('--param', action='append', default=[], metavar='STAGE.NAME=VALUE',
+                        help="Override a stage parameter, e.g. optimize.ordering_cost=75 (repeatable)")
+    parser.add_argument('--no-cache', action='store_true', help="Recompute every stage without reading or writing the stage cache")
+    args = parser.parse_args()
+    execution_backend.DEFAULT_BACKEND = args.backend
+
+    try:
+        overrides = parse_param_overrides(args.param)
+        cache = None if args.no_cache else StageCache()
+        _, df_report = run_pipeline(args.stages, args.with_deps, args.workers, not args.no_memory_trace, overrides, cache)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        exit()
+
+    if (df_report['Status'] != 'ok').any():
+        exit(1)
+
+
+if __name__ == "__main__":
+    with run_report("run_pipeline"):
+        main()
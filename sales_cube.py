@@ -0,0 +1,124 @@
+import pandas as pd
+import numpy as np
+
+from data_store import read_frame, write_frame
+
+# Pre-aggregated sales cube: SalesQuantity, SalesDollars, COGS and GrossProfit summed per
+# (ProductKey, StoreKey, VendorKey, Date) at a daily and a weekly grain.
+# The keys are the int32 surrogate keys of dimensions.py (labels in dim_product / dim_store /
+# dim_vendor). Rows are sorted by ProductKey, so a per-SKU lookup is a binary search for a
+# contiguous slice instead of a scan of the line-level sales master.
+
+PRODUCT_COLS = ['Brand', 'Description', 'Size']
+KEY_COLS = ['ProductKey', 'StoreKey', 'VendorKey', 'Date']
+MEASURES = ['SalesQuantity', 'SalesDollars', 'COGS', 'GrossProfit']
+
+# Grain -> (store dataset, pandas frequency of the date grid)
+# Weekly dates are the Sunday ending the week, the same labels as resample('W').
+CUBE_GRAINS = {'D': ('sales_cube_daily', 'D'), 'W': ('sales_cube_weekly', 'W')}
+CUBE_DATASETS = [name for name, _ in CUBE_GRAINS.values()]
+
+# Rows per Parquet row group; the cubes are sorted by ProductKey so product filters skip row groups
+CUBE_ROW_GROUP_SIZE = 65_536
+
+
+def cube_partials(df_sales):
+    """
+    Daily and weekly aggregates of a block of keyed sales lines.
+    Partials of different blocks (chunks, incremental deltas) are merged by combine_partials.
+    """
+    dates = df_sales['SalesDate'].dt.normalize()
+    partials = {}
+    for grain, date_labels in [('D', dates), ('W', dates + pd.to_timedelta(6 - dates.dt.weekday, unit='D'))]:
+        df_partial = df_sales[KEY_COLS[:-1] + MEASURES].assign(Date=date_labels, Lines=1)
+        partials[grain] = df_partial.groupby(KEY_COLS)[MEASURES + ['Lines']].sum().reset_index()
+    return partials
+
+
+def combine_partials(partials):
+    """Merge several cube_partials() results into one (sums are re-aggregated per key)."""
+    if len(partials) == 1:
+        return partials[0]
+    return {
+        grain: pd.concat([partial[grain] for partial in partials], ignore_index=True)
+                 .groupby(KEY_COLS)[MEASURES + ['Lines']].sum().reset_index()
+        for grain in CUBE_GRAINS
+    }
+
+
+def build_cubes(partials):
+    """Combine a list of cube_partials() results into the cube datasets."""
+    partial = combine_partials(partials)
+    frames = {}
+    for grain, (name, _) in CUBE_GRAINS.items():
+        df_cube = partial[grain].astype({
+            'ProductKey': 'int32', 'StoreKey': 'int32', 'VendorKey': 'int32', 'SalesQuantity': 'int64', 'Lines': 'int32'
+        })
+        frames[name] = df_cube.sort_values(KEY_COLS).reset_index(drop=True)
+    return frames
+
+
+def build_sales_cubes(df_sales_master):
+    return build_cubes([cube_partials(df_sales_master)])
+
+
+def stored_cube_partials():
+    """The stored cubes as partials (to be combined with new sales; the keys are stable)."""
+    return {grain: read_frame(name) for grain, (name, _) in CUBE_GRAINS.items()}
+
+
+def save_sales_cubes(frames):
+    for name, df in frames.items():
+        write_frame(df, name, row_group_size=CUBE_ROW_GROUP_SIZE)
+
+
+class SalesCube:
+    """Slice and rollup queries on one grain of the cube (df_products is the dim_product table)."""
+
+    def __init__(self, df_cube, df_products, grain='W'):
+        self.frame = df_cube
+        self.products = df_products
+        self.freq = CUBE_GRAINS[grain][1]
+        self._keys = df_cube['ProductKey'].to_numpy()
+
+    @classmethod
+    def load(cls, grain='W', columns=None):
+        name, _ = CUBE_GRAINS[grain]
+        cube_columns = None if columns is None else list(dict.fromkeys(KEY_COLS + list(columns)))
+        return cls(read_frame(name, columns=cube_columns), read_frame("dim_product"), grain)
+
+    def product_key(self, brand, description, size):
+        """ProductKey of a (Brand, Description, Size) triple, or None if unknown."""
+        lookup = pd.MultiIndex.from_frame(self.products[PRODUCT_COLS].astype(object))
+        position = lookup.get_indexer([(brand, description, size)])[0]
+        return None if position < 0 else int(self.products['ProductKey'].iat[position])
+
+    def product_rows(self, product_key):
+        # Binary search for the contiguous block of rows of one product
+        start, stop = np.searchsorted(self._keys, [product_key, product_key + 1])
+        return self.frame.iloc[start:stop]
+
+    def series(self, product_key=None, measure='SalesQuantity', store_keys=None):
+        """
+        Date-indexed totals of `measure` for one product (all products if None), every period
+        between its first and last sale included (0 where nothing sold).
+        """
+        df_rows = self.frame if product_key is None else self.product_rows(product_key)
+        if store_keys is not None:
+            df_rows = df_rows[df_rows['StoreKey'].isin(store_keys)]
+        totals = df_rows.groupby('Date')[measure].sum()
+        if totals.empty:
+            return totals
+        return totals.reindex(pd.date_range(totals.index.min(), totals.index.max(), freq=self.freq), fill_value=0)
+
+    def matrix(self, product_keys=None, measure='SalesQuantity'):
+        """(product x period) matrix of `measure` on one shared date grid, indexed by the product labels."""
+        df_rows = self.frame if product_keys is None else self.frame[np.isin(self._keys, product_keys)]
+        dates = pd.date_range(self.frame['Date'].min(), self.frame['Date'].max(), freq=self.freq)
+        keys = np.unique(df_rows['ProductKey'].to_numpy())
+
+        values = np.zeros((len(keys), len(dates)))
+        np.add.at(values, (np.searchsorted(keys, df_rows['ProductKey'].to_numpy()),
+                           dates.get_indexer(df_rows['Date'])), df_rows[measure].to_numpy())
+        index = pd.MultiIndex.from_frame(self.products.set_index('ProductKey').loc[keys, PRODUCT_COLS].reset_index(drop=True))
+        return pd.DataFrame(values, index=index, columns=dates)
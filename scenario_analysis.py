@@ -0,0 +1,192 @@
+import pandas as pd
+import numpy as np
+import argparse
+import itertools
+from statistics import NormalDist
+
+from data_store import append_frame, read_frame, write_frame
+from dimensions import decode
+from inventory_optimization import ORDERING_COST_S, HOLDING_COST_PERCENTAGE
+from sales_cube import SalesCube
+
+# What-if sweeps of the EOQ / ROP / cost formulas over a grid of cost and service assumptions.
+# Every scenario is a combination of ordering cost S, holding cost percentage h, lead-time factor f
+# (scales every lead time) and cycle service level; the formulas are broadcast over a
+# (scenario x SKU) NumPy grid, a block of scenarios at a time:
+#   EOQ = sqrt(2 * D * S / (C * h))                 (as in inventory_optimization.py)
+#   SS  = z * sqrt(f * L * sigma_d^2 + d^2 * (f * sigma_L)^2)
+#   ROP = d * f * L + SS
+#   Annual cost = D / EOQ * S (ordering) + (EOQ / 2 + SS) * C * h (holding)
+# Per-SKU results are appended to the scenario_results dataset block by block, so memory is bounded
+# by SCENARIO_BLOCK_CELLS whatever the grid size; only the per-scenario totals are kept.
+
+# Default grid (4 x 4 x 4 x 4 = 256 scenarios)
+ORDERING_COSTS = [25.0, 50.0, 75.0, 100.0]
+HOLDING_COST_PERCENTAGES = [0.15, 0.20, 0.25, 0.30]
+LEAD_TIME_FACTORS = [0.8, 1.0, 1.25, 1.5]
+SERVICE_LEVELS = [0.90, 0.95, 0.98, 0.99]
+
+SCENARIO_COLS = ['Ordering_Cost', 'Holding_Cost_Percentage', 'LeadTime_Factor', 'Service_Level']
+
+# (scenario x SKU) cells evaluated per block
+SCENARIO_BLOCK_CELLS = 2_000_000
+
+# Days in the demand period (the data covers 2016, as in inventory_optimization.py)
+DAYS_PER_YEAR = 365
+
+
+def scenario_grid(ordering_costs=ORDERING_COSTS, holding_percentages=HOLDING_COST_PERCENTAGES,
+                  lead_time_factors=LEAD_TIME_FACTORS, service_levels=SERVICE_LEVELS):
+    """Every combination of the assumptions, one row per scenario."""
+    df_scenarios = pd.DataFrame(
+        list(itertools.product(ordering_costs, holding_percentages, lead_time_factors, service_levels)),
+        columns=SCENARIO_COLS
+    )
+    df_scenarios.insert(0, 'Scenario_Id', np.arange(len(df_scenarios), dtype='int32'))
+    return df_scenarios
+
+
+def sku_inputs(sales_cube, df_purchases_cleaned):
+    """Demand and lead-time statistics per SKU (ProductKey), the scenario-independent inputs."""
+    # Daily totals per SKU over all stores; days without sales count as 0 demand
+    df_daily = sales_cube.frame.groupby(['ProductKey', 'Date'])['SalesQuantity'].sum().reset_index()
+    df_daily['SalesQuantity_Sq'] = df_daily['SalesQuantity'].astype('float64') ** 2
+    df_sku = df_daily.groupby('ProductKey').agg(
+        Annual_Demand=('SalesQuantity', 'sum'),
+        Sum_Sq=('SalesQuantity_Sq', 'sum')
+    ).reset_index()
+    df_sku['Avg_Daily_Demand'] = df_sku['Annual_Demand'] / DAYS_PER_YEAR
+    variance = (df_sku['Sum_Sq'] - df_sku['Annual_Demand'] ** 2 / DAYS_PER_YEAR) / (DAYS_PER_YEAR - 1)
+    df_sku['Daily_Demand_StdDev'] = np.sqrt(variance.clip(lower=0))
+
+    # Unit cost and lead time per SKU; SKUs never purchased get the overall lead time
+    df_purchase_stats = df_purchases_cleaned.groupby('ProductKey').agg(
+        Avg_Unit_Cost=('PurchasePrice', 'mean'),
+        Avg_LeadTime_Days=('LeadTime_Days', 'mean'),
+        LeadTime_StdDev=('LeadTime_Days', 'std')
+    ).reset_index()
+    df_sku = df_sku.drop(columns='Sum_Sq').merge(df_purchase_stats, on='ProductKey', how='left')
+    df_sku['Avg_Unit_Cost'] = df_sku['Avg_Unit_Cost'].fillna(0)
+    df_sku['Avg_LeadTime_Days'] = df_sku['Avg_LeadTime_Days'].fillna(df_purchases_cleaned['LeadTime_Days'].mean())
+    df_sku['LeadTime_StdDev'] = df_sku['LeadTime_StdDev'].fillna(df_purchases_cleaned['LeadTime_Days'].std())
+    return df_sku
+
+
+def evaluate_block(df_block, df_sku):
+    """EOQ / SS / ROP and annual costs for a block of scenarios x every SKU, as (scenario, SKU) arrays."""
+    # Scenario parameters as columns, SKU inputs as rows: every formula broadcasts to (k, n)
+    S = df_block['Ordering_Cost'].to_numpy()[:, None]
+    h = df_block['Holding_Cost_Percentage'].to_numpy()[:, None]
+    f = df_block['LeadTime_Factor'].to_numpy()[:, None]
+    z = np.array([NormalDist().inv_cdf(level) for level in df_block['Service_Level']])[:, None]
+
+    D = df_sku['Annual_Demand'].to_numpy(dtype='float64')[None, :]
+    d = df_sku['Avg_Daily_Demand'].to_numpy()[None, :]
+    sigma_d = df_sku['Daily_Demand_StdDev'].to_numpy()[None, :]
+    C = df_sku['Avg_Unit_Cost'].to_numpy()[None, :]
+    L = df_sku['Avg_LeadTime_Days'].to_numpy()[None, :] * f
+    sigma_L = df_sku['LeadTime_StdDev'].to_numpy()[None, :] * f
+
+    H = C * h
+    epsilon = 1e-6
+    eoq = np.round(np.sqrt(2 * D * S / (H + epsilon)))
+    safety_stock = np.ceil(z * np.sqrt(L * sigma_d ** 2 + d ** 2 * sigma_L ** 2))
+    rop = np.round(d * L) + safety_stock
+
+    ordering_cost = np.divide(D * S, eoq, out=np.zeros(eoq.shape), where=eoq > 0)
+    holding_cost = (eoq / 2 + safety_stock) * H
+    return {
+        'EOQ': eoq, 'Safety_Stock': safety_stock, 'Reorder_Point_ROP': rop,
+        'Ordering_Cost_Annual': ordering_cost, 'Holding_Cost_Annual': holding_cost,
+        'Total_Cost_Annual': ordering_cost + holding_cost,
+    }
+
+
+def run_scenario_analysis(sales_cube, df_purchases_cleaned, df_scenarios, save_details=True,
+                          block_cells=SCENARIO_BLOCK_CELLS):
+    print("--- Starting Scenario Analysis ---")
+
+    df_sku = sku_inputs(sales_cube, df_purchases_cleaned)
+    n_skus = len(df_sku)
+    block_size = max(1, block_cells // max(n_skus, 1))
+    print(f"{len(df_scenarios)} scenarios x {n_skus} SKUs, {block_size} scenarios per block")
+
+    summaries = []
+    for i, start in enumerate(range(0, len(df_scenarios), block_size)):
+        df_block = df_scenarios.iloc[start:start + block_size]
+        results = evaluate_block(df_block, df_sku)
+
+        # Per-scenario totals of the block
+        summaries.append(pd.DataFrame({
+            'Scenario_Id': df_block['Scenario_Id'].to_numpy(),
+            'Total_Ordering_Cost': results['Ordering_Cost_Annual'].sum(axis=1),
+            'Total_Holding_Cost': results['Holding_Cost_Annual'].sum(axis=1),
+            'Total_Cost': results['Total_Cost_Annual'].sum(axis=1),
+            'Total_Safety_Stock': results['Safety_Stock'].sum(axis=1).astype('int64'),
+            'Avg_EOQ': results['EOQ'].mean(axis=1),
+            'Avg_Inventory_Value': ((results['EOQ'] / 2 + results['Safety_Stock']) * df_sku['Avg_Unit_Cost'].to_numpy()).sum(axis=1),
+        }))
+
+        if save_details:
+            # Long (scenario, SKU) rows of this block, appended as one more part of the dataset
+            df_details = pd.DataFrame({
+                'Scenario_Id': np.repeat(df_block['Scenario_Id'].to_numpy(), n_skus),
+                'ProductKey': np.tile(df_sku['ProductKey'].to_numpy(), len(df_block)),
+                **{col: results[col].ravel().astype('int32') for col in ['EOQ', 'Safety_Stock', 'Reorder_Point_ROP']},
+                **{col: results[col].ravel() for col in ['Ordering_Cost_Annual', 'Holding_Cost_Annual', 'Total_Cost_Annual']},
+            })
+            (write_frame if i == 0 else append_frame)(df_details, "scenario_results")
+
+    df_summary = df_scenarios.merge(pd.concat(summaries, ignore_index=True), on='Scenario_Id')
+    floatfmt = (".0f", ".2f", ".2f", ".2f", ".2f", ".2f", ".2f", ".2f", ".0f", ".2f", ".2f")
+
+    print("\nLowest Total Inventory Cost Scenarios:")
+    print(df_summary.sort_values('Total_Cost').head(10).to_markdown(index=False, floatfmt=floatfmt))
+
+    # The scenario of inventory_optimization.py (its ROP has no safety stock, so service level does not matter)
+    baseline = (df_summary['Ordering_Cost'] == ORDERING_COST_S) & \
+               (df_summary['Holding_Cost_Percentage'] == HOLDING_COST_PERCENTAGE) & (df_summary['LeadTime_Factor'] == 1.0)
+    if baseline.any():
+        print(f"\nCurrent Assumptions (S = ${ORDERING_COST_S:.2f}, h = {HOLDING_COST_PERCENTAGE:.0%}, lead times as observed):")
+        print(df_summary[baseline].to_markdown(index=False, floatfmt=floatfmt))
+    return df_summary
+
+
+def save_scenario_summary(df_summary):
+    write_frame(df_summary, "scenario_summary")
+    df_summary.to_csv("/home/ubuntu/scenario_summary.csv", index=False)
+
+
+def query_scenario(scenario_id, df_products=None):
+    """Per-SKU results of one scenario from the scenario_results dataset (labels decoded if df_products)."""
+    df_result = read_frame("scenario_results", filters=[('Scenario_Id', '==', scenario_id)])
+    return df_result if df_products is None else decode(df_result, {'dim_product': df_products})
+
+
+def _float_list(text):
+    return [float(value) for value in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EOQ / ROP / cost what-if sweeps over a grid of assumptions.")
+    parser.add_argument('--ordering-costs', type=_float_list, default=ORDERING_COSTS, help="Comma-separated ordering costs S")
+    parser.add_argument('--holding', type=_float_list, default=HOLDING_COST_PERCENTAGES, help="Comma-separated holding cost percentages")
+    parser.add_argument('--lead-time-factors', type=_float_list, default=LEAD_TIME_FACTORS, help="Comma-separated lead time multipliers")
+    parser.add_argument('--service-levels', type=_float_list, default=SERVICE_LEVELS, help="Comma-separated cycle service levels")
+    parser.add_argument('--summary-only', action='store_true', help="Do not write the per-SKU scenario_results dataset")
+    args = parser.parse_args()
+
+    try:
+        sales_cube = SalesCube.load('D', columns=['SalesQuantity'])
+        df_purchases_cleaned = read_frame("df_purchases_cleaned", columns=['ProductKey', 'PurchasePrice', 'LeadTime_Days'])
+    except FileNotFoundError:
+        print("Error: One or more cleaned data files not found. Please ensure data preparation is complete.")
+        exit()
+
+    df_scenarios = scenario_grid(args.ordering_costs, args.holding, args.lead_time_factors, args.service_levels)
+    save_scenario_summary(run_scenario_analysis(sales_cube, df_purchases_cleaned, df_scenarios, not args.summary_only))
+    print("\n--- Scenario Analysis Complete. Results saved to scenario_summary.csv ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import pandas as pd
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+
+from data_store import STORE_DIR, _part_files, dataset_path
+
+# Content-addressed cache of pipeline stage outputs.
+# A stage's cache key hashes everything its outputs are derived from:
+#   - the stage name and parameters,
+#   - the source files of the code it runs,
+#   - for each input frame, the cache key of the upstream stage producing it (Merkle-style, so a change
+#     anywhere upstream changes every downstream key), or the content of the stored dataset it is read from,
+#   - the raw files it reads (prepare: the uploaded CSVs).
+# Editing a cost parameter therefore only changes the keys of the stages using it; every other stage
+# is served from the cache. File contents are hashed once per (path, size, mtime).
+# Entries are evicted least-recently-used first once the cache exceeds CACHE_MAX_BYTES.
+
+CACHE_DIR = os.path.join(STORE_DIR, "stage_cache")
+
+# Upper bound on the total size of the cached artifacts
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Bump to invalidate every existing entry (e.g. after changing the artifact format)
+CACHE_VERSION = 1
+
+_HASH_BLOCK_BYTES = 1024 ** 2
+
+
+def _digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _stat_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class StageCache:
+    """Stage output cache in cache_dir (one sub-directory per key)."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._file_hashes = self._load_json("file_hashes.json")
+        self._store_state = self._load_json("store_state.json")
+
+    def _load_json(self, name):
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_json(self, name, data):
+        path = os.path.join(self.cache_dir, name)
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    # --- Fingerprints ---
+    def file_hash(self, path):
+        """sha256 of the file content, recomputed only when its size or mtime changed."""
+        path = os.path.abspath(path)
+        signature = _stat_signature(path)
+        with self.lock:
+            known = self._file_hashes.get(path)
+            if known is not None and known['signature'] == signature:
+                return known['sha256']
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_BYTES), b""):
+                sha.update(block)
+
+        with self.lock:
+            self._file_hashes[path] = {'signature': signature, 'sha256': sha.hexdigest()}
+            self._save_json("file_hashes.json", self._file_hashes)
+        return sha.hexdigest()
+
+    def dataset_hash(self, name, store_dir=STORE_DIR):
+        parts = _part_files(dataset_path(name, store_dir))
+        if not parts:
+            raise FileNotFoundError(f"Dataset '{name}' not found in {store_dir}")
+        return _digest([self.file_hash(path) for path in parts])
+
+    def stage_key(self, stage, params, code_files, inputs, files):
+        """
+        Cache key of one stage run. `inputs` maps each input frame to the key of the upstream stage
+        producing it or to its dataset hash; `files` are the raw files the stage reads.
+        """
+        return _digest({
+            'version': CACHE_VERSION,
+            'stage': stage,
+            'params': params,
+            'code': {os.path.basename(path): self.file_hash(path) for path in code_files},
+            'inputs': inputs,
+            'files': {path: self.file_hash(path) for path in files},
+        })
+
+    # --- Entries ---
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key):
+        """(outputs, printed text) of a cached stage run, or None."""
+        entry = self._entry_dir(key)
+        manifest_path = os.path.join(entry, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        with open(os.path.join(entry, "outputs.pkl"), "rb") as f:
+            outputs = pickle.load(f)
+        # The manifest mtime is the last use for the LRU eviction
+        os.utime(manifest_path)
+        return outputs, manifest['text']
+
+    def put(self, key, stage, outputs, text):
+        entry = self._entry_dir(key)
+        tmp_dir = f"{entry}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        # Pickled so the frames come back with their exact dtypes and index
+        with open(os.path.join(tmp_dir, "outputs.pkl"), "wb") as f:
+            pickle.dump(outputs, f, protocol=pickle.HIGHEST_PROTOCOL)
+        size = os.path.getsize(os.path.join(tmp_dir, "outputs.pkl"))
+        with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+            json.dump({'stage': stage, 'outputs': list(outputs), 'bytes': size,
+                       'created': time.time(), 'text': text}, f)
+
+        with self.lock:
+            if os.path.isdir(entry):
+                shutil.rmtree(tmp_dir)
+            else:
+                os.replace(tmp_dir, entry)
+            self._evict()
+
+    def entries(self):
+        rows = []
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                manifest_path = os.path.join(prefix_dir, key, "manifest.json")
+                if not os.path.exists(manifest_path):
+                    continue
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                rows.append({'Key': key, 'Stage': manifest['stage'], 'Bytes': manifest['bytes'],
+                             'Created': pd.Timestamp(manifest['created'], unit='s'),
+                             'Last_Used': pd.Timestamp(os.path.getmtime(manifest_path), unit='s')})
+        return pd.DataFrame(rows, columns=['Key', 'Stage', 'Bytes', 'Created', 'Last_Used'])
+
+    def _evict(self):
+        df_entries = self.entries().sort_values('Last_Used')
+        excess = df_entries['Bytes'].sum() - self.max_bytes
+        for row in df_entries.itertuples():
+            if excess <= 0:
+                break
+            shutil.rmtree(self._entry_dir(row.Key), ignore_errors=True)
+            excess -= row.Bytes
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir)
+        self._file_hashes, self._store_state = {}, {}
+
+    # --- Store datasets written by cached stages ---
+    def _dataset_signature(self, name):
+        return [_stat_signature(path) for path in _part_files(dataset_path(name))]
+
+    def store_is_current(self, key, datasets):
+        """True if every dataset in the store was last written by the stage run `key` and not touched since."""
+        with self.lock:
+            return all(
+                self._store_state.get(name, {}).get('key') == key
+                and self._store_state[name]['signature'] == self._dataset_signature(name)
+                for name in datasets
+            )
+
+    def record_store(self, key, datasets):
+        with self.lock:
+            for name in datasets:
+                if _part_files(dataset_path(name)):
+                    self._store_state[name] = {'key': key, 'signature': self._dataset_signature(name)}
+            self._save_json("store_state.json", self._store_state)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or clear the pipeline stage cache.")
+    parser.add_argument('--clear', action='store_true', help="Remove every cached stage output")
+    args = parser.parse_args()
+
+    cache = StageCache()
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {cache.cache_dir}")
+        return
+
+    df_entries = cache.entries().sort_values('Last_Used', ascending=False)
+    print(df_entries.assign(Key=df_entries['Key'].str[:12]).to_markdown(index=False))
+    print(f"\nTotal: {df_entries['Bytes'].sum() / 1024 ** 2:.1f} MB of {cache.max_bytes / 1024 ** 2:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import pandas as pd
+import argparse
+import os
+import time
+
+import data_preparation
+from data_preparation import (
+    build_inventory, clean_purchases, combine_price_aggregates, enrich_sales, purchase_price_aggregates, save_watermark
+)
+from data_store import append_frame, delete_frame, write_frame
+from dimensions import assign_keys, build_dimensions, save_dimensions
+from execution_backend import group_aggregate
+from sales_cube import CUBE_GRAINS, KEY_COLS, MEASURES, build_cubes, cube_partials, save_sales_cubes
+
+# Chunked (streaming) data preparation with bounded memory.
+# SalesFINAL and PurchasesFINAL are never loaded whole: each chunk is read with compact dtypes,
+# joined against the small lookup tables (inventory Avg_Price, Brand/Size Avg_PurchasePrice)
+# and appended to the store before the next chunk is read.
+# The cube partial of each sales chunk is appended to a scratch dataset as well; the partials are
+# combined once at the end by DuckDB reading the Parquet parts (within its own memory limit,
+# execution_backend.DUCKDB_MEMORY_LIMIT), never held in pandas together.
+
+# Default memory ceiling for one chunk and its merged copies
+MEMORY_LIMIT_MB = 1024
+
+# Merged copies, parsing buffers and the write-out all live at the same time as the chunk;
+# the chunk size is chosen so that chunk_bytes * CHUNK_OVERHEAD_FACTOR fits in the ceiling.
+CHUNK_OVERHEAD_FACTOR = 4
+
+SALES_DTYPES = {
+    'InventoryId': 'category', 'Store': 'int32', 'Brand': 'int32', 'Description': 'category',
+    'Size': 'category', 'SalesQuantity': 'int32', 'SalesDollars': 'float32', 'SalesPrice': 'float32',
+    'Volume': 'float32', 'Classification': 'int8', 'ExciseTax': 'float32', 'VendorNo': 'int32',
+    'VendorName': 'category',
+}
+
+# Scratch datasets of the per-chunk cube partials, by grain
+PARTIAL_DATASETS = {grain: f"{name}_partials" for grain, (name, _) in CUBE_GRAINS.items()}
+
+# Backend combining the cube partials (reads the scratch datasets out of core)
+CUBE_COMBINE_BACKEND = 'duckdb'
+
+# Purchases 'Size' stays a plain string column here because missing Sizes are filled in (it is
+# dictionary-encoded again when the chunk is written to the store).
+PURCHASES_DTYPES = {
+    'InventoryId': 'category', 'Store': 'int32', 'Brand': 'int32', 'Description': 'category',
+    'VendorNumber': 'int32', 'VendorName': 'category', 'PONumber': 'int32',
+    'PurchasePrice': 'float32', 'Quantity': 'int32', 'Dollars': 'float32', 'Classification': 'int8',
+}
+
+
+def estimate_chunk_rows(path, dtypes, memory_limit_mb, sample_rows=10_000):
+    """Number of CSV rows per chunk so one chunk and its working copies stay under memory_limit_mb."""
+    df_sample = pd.read_csv(path, nrows=sample_rows, dtype=dtypes)
+    bytes_per_row = df_sample.memory_usage(deep=True).sum() / max(len(df_sample), 1)
+    return max(1_000, int(memory_limit_mb * 1024 ** 2 / (bytes_per_row * CHUNK_OVERHEAD_FACTOR)))
+
+
+def prepare_streaming(upload_dir=data_preparation.upload_dir, memory_limit_mb=MEMORY_LIMIT_MB):
+    print("--- Starting Streaming Data Preparation ---")
+    sales_file = os.path.join(upload_dir, "SalesFINAL12312016.csv")
+    purchases_file = os.path.join(upload_dir, "PurchasesFINAL12312016.csv")
+
+    # --- 1. Inventory (small, loaded whole) ---
+    df_inventory = build_inventory(
+        pd.read_csv(os.path.join(upload_dir, "BegInvFINAL12312016.csv")),
+        pd.read_csv(os.path.join(upload_dir, "EndInvFINAL12312016.csv"))
+    )
+    # Dimensions start from the inventory (the only source of City); the chunks below add the
+    # members it lacks with the next free keys
+    dims = build_dimensions([df_inventory])
+    write_frame(assign_keys(df_inventory, dims), "df_inventory_master")
+    df_inventory_lookup = df_inventory[['InventoryId', 'Beg_onHand', 'End_onHand', 'Avg_Price']]
+
+    sales_chunk_rows = estimate_chunk_rows(sales_file, SALES_DTYPES, memory_limit_mb)
+    purchase_chunk_rows = estimate_chunk_rows(purchases_file, PURCHASES_DTYPES, memory_limit_mb)
+    print(f"Memory ceiling: {memory_limit_mb} MB -> {sales_chunk_rows} sales rows / {purchase_chunk_rows} purchase rows per chunk")
+
+    # --- 2. Brand -> Size lookup from the sales file (two columns only) ---
+    brand_size_chunks = [
+        df_chunk.drop_duplicates()
+        for df_chunk in pd.read_csv(sales_file, usecols=['Brand', 'Size'], dtype=SALES_DTYPES, chunksize=sales_chunk_rows)
+    ]
+    df_brand_sizes = pd.concat(brand_size_chunks, ignore_index=True).astype({'Size': 'object'}).drop_duplicates()
+    size_map = df_brand_sizes.set_index('Brand')['Size'].to_dict()
+
+    # --- 3. Purchases: clean each chunk, append it and accumulate the Brand/Size price sums ---
+    purchase_rows = 0
+    receiving_date_max = []
+    for i, df_chunk in enumerate(pd.read_csv(purchases_file, dtype=PURCHASES_DTYPES, chunksize=purchase_chunk_rows)):
+        df_chunk = clean_purchases(df_chunk, size_map)
+        if i == 0:
+            df_price_aggregates = purchase_price_aggregates(df_chunk)
+        else:
+            df_price_aggregates = combine_price_aggregates(df_price_aggregates, df_chunk)
+        dims = build_dimensions([df_chunk], dims)
+        df_chunk = assign_keys(df_chunk.drop(columns='InventoryId'), dims)
+        (write_frame if i == 0 else append_frame)(df_chunk, "df_purchases_cleaned")
+        purchase_rows += len(df_chunk)
+        receiving_date_max.append(df_chunk['ReceivingDate'].max())
+
+    # --- 4. Sales: join each chunk against the lookups, append it and its cube partial ---
+    sales_rows = 0
+    sales_date_max = []
+    for i, df_chunk in enumerate(pd.read_csv(sales_file, dtype=SALES_DTYPES, chunksize=sales_chunk_rows)):
+        df_chunk['SalesDate'] = pd.to_datetime(df_chunk['SalesDate'])
+        df_chunk = enrich_sales(df_chunk, df_inventory_lookup, df_price_aggregates)
+        dims = build_dimensions([df_chunk], dims)
+        df_chunk = assign_keys(df_chunk.drop(columns='InventoryId'), dims)
+        (write_frame if i == 0 else append_frame)(df_chunk, "df_sales_master")
+        sales_rows += len(df_chunk)
+        sales_date_max.append(df_chunk['SalesDate'].max())
+        for grain, df_partial in cube_partials(df_chunk).items():
+            (write_frame if i == 0 else append_frame)(df_partial, PARTIAL_DATASETS[grain])
+
+    # --- 5. Cubes: combine the partials of all chunks in one pass ---
+    if sales_rows:
+        sums = {measure: (measure, 'sum') for measure in MEASURES + ['Lines']}
+        save_sales_cubes(build_cubes([{
+            grain: group_aggregate(name, KEY_COLS, sums, CUBE_COMBINE_BACKEND) for grain, name in PARTIAL_DATASETS.items()
+        }]))
+    for name in PARTIAL_DATASETS.values():
+        delete_frame(name)
+
+    # Running state for incremental_preparation.py
+    write_frame(df_price_aggregates, "purchase_price_aggregates")
+    write_frame(df_brand_sizes, "brand_size_lookup")
+    save_dimensions(dims)
+    save_watermark(pd.Series(sales_date_max).max(), pd.Series(receiving_date_max).max())
+
+    print(f"Cleaned Sales Master Rows: {sales_rows}")
+    print(f"Cleaned Purchases Rows: {purchase_rows}")
+    print(f"Cleaned Inventory Master Data Shape: {df_inventory.shape}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare the data in chunks with a bounded memory footprint.")
+    parser.add_argument('--upload-dir', default=data_preparation.upload_dir, help="Directory with the raw CSV files")
+    parser.add_argument('--memory-limit-mb', type=int, default=MEMORY_LIMIT_MB,
+                        help=f"Memory ceiling per chunk in MB (default: {MEMORY_LIMIT_MB})")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        prepare_streaming(args.upload_dir, args.memory_limit_mb)
+    except FileNotFoundError as e:
+        print(f"Error loading files: {e}")
+        exit()
+
+    print(f"--- Streaming Data Preparation Complete in {time.perf_counter() - start:.2f}s ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+
+from data_preparation import RAW_FILES
+
+# Synthetic raw data with the schema of the six uploaded CSV files, at any number of stores, SKUs,
+# vendors and years, for benchmarks and load tests.
+# The data is shaped like retail sales rather than uniform noise:
+#   - SKU popularity follows a Zipf law (a few brands make most of the sales, a long tail sells
+#     a handful of units a year), vendors are Zipf-sized too and stores have lognormal sizes,
+#   - stores carry only part of the tail of the catalog,
+#   - sales dates follow a weekly cycle, a December peak and year-over-year growth, so tail SKUs
+#     get intermittent (mostly zero) daily and weekly series,
+#   - basket sizes differ per SKU, with occasional case-size bulk sales (lumpy demand),
+#   - lead times and payment lags depend on the vendor, and the ending on-hand is the beginning
+#     on-hand plus purchases minus sales,
+#   - as in the real files, some EndInvFINAL cities and PurchasesFINAL sizes are missing.
+# The analysis scripts assume one year of data (annual demand = total / 365); use years > 1 for
+# throughput tests only.
+
+START_DATE = pd.Timestamp('2016-01-01')
+
+# Size at scale 1x (the size of the 1x data of benchmark_preparation.py)
+BASE_STORES = 10
+BASE_SKUS = 500
+BASE_VENDORS = 50
+SALES_LINES_PER_STORE_YEAR = 2_000
+PURCHASE_LINES_PER_STORE_YEAR = 500
+
+MAX_CITIES = 60
+
+# Zipf exponents of the SKU and vendor popularity
+SKU_SKEW = 1.0
+VENDOR_SKEW = 1.0
+
+SIZES = {'750mL': 750, '1.75L': 1750, '1L': 1000, '375mL': 375, '50mL': 50}
+SIZE_SHARES = [0.55, 0.15, 0.12, 0.12, 0.06]
+
+
+def scale_config(scale=1, years=1):
+    """Generator arguments for `scale` x the 1x data: stores and lines grow, the catalog stays."""
+    n_stores = max(1, int(round(BASE_STORES * scale)))
+    return {
+        'n_stores': n_stores, 'n_skus': BASE_SKUS, 'n_vendors': BASE_VENDORS, 'years': years,
+        'n_sales': int(SALES_LINES_PER_STORE_YEAR * n_stores * years),
+        'n_purchases': int(PURCHASE_LINES_PER_STORE_YEAR * n_stores * years),
+    }
+
+
+def _zipf_weights(n, skew):
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def _day_weights(dates, rng):
+    # Weekly cycle (Friday/Saturday peak), December peak and ~5% yearly growth
+    weekday = np.array([0.8, 0.8, 0.9, 1.0, 1.3, 1.5, 0.7])[dates.dayofweek]
+    season = 1 + 0.25 * np.cos(2 * np.pi * (dates.dayofyear.to_numpy() - 350) / 365.25)
+    growth = 1.05 ** ((dates - dates[0]).days.to_numpy() / 365.25)
+    weights = weekday * season * growth * rng.lognormal(0, 0.1, len(dates))
+    return weights / weights.sum()
+
+
+def make_synthetic_raw(n_stores=BASE_STORES, n_skus=BASE_SKUS, n_vendors=BASE_VENDORS, years=1,
+                       n_sales=None, n_purchases=None, seed=0):
+    """In-memory frames with the schema of the six raw CSV files (keys of data_preparation.RAW_FILES)."""
+    rng = np.random.default_rng(seed)
+    n_vendors = min(n_vendors, n_skus)
+    n_sales = SALES_LINES_PER_STORE_YEAR * n_stores * years if n_sales is None else n_sales
+    n_purchases = PURCHASE_LINES_PER_STORE_YEAR * n_stores * years if n_purchases is None else n_purchases
+
+    # --- 1. Catalog: brands ranked by popularity, each supplied by one vendor ---
+    brands = np.arange(1, n_skus + 1)
+    sku_weight = rng.permutation(_zipf_weights(n_skus, SKU_SKEW))  # brand numbers do not follow rank
+    sizes = rng.choice(list(SIZES), n_skus, p=SIZE_SHARES)
+    volumes = np.array([SIZES[size] for size in sizes])
+    descriptions = np.char.add('Product ', brands.astype(str))
+    classification = rng.choice([1, 2], n_skus, p=[0.6, 0.4])
+    prices = np.clip(np.floor(rng.lognormal(2.6, 0.6, n_skus)) + 0.99, 2.99, 499.99)
+    purchase_prices = (prices * rng.uniform(0.65, 0.8, n_skus)).round(2)
+    basket = rng.lognormal(0, 0.6, n_skus)  # mean units per sales line beyond the first
+
+    vendor_numbers = 1000 + np.arange(n_vendors)
+    vendor_names = np.char.add('VENDOR ', vendor_numbers.astype(str))
+    sku_vendor = rng.choice(n_vendors, n_skus, p=_zipf_weights(n_vendors, VENDOR_SKEW))
+    vendor_lead_mean = rng.uniform(4, 12, n_vendors)
+    vendor_lead_std = rng.uniform(0.5, 4, n_vendors)
+    vendor_pay_lag = rng.uniform(15, 45, n_vendors)
+
+    # --- 2. Stores and the positions they carry ---
+    stores = np.arange(1, n_stores + 1)
+    cities = np.char.add('CITY', (stores % min(n_stores, MAX_CITIES)).astype(str))
+    store_weight = rng.lognormal(0, 0.5, n_stores)
+    store_weight /= store_weight.sum()
+    # Popular SKUs are carried everywhere, the tail by a share of the stores
+    carry_probability = np.clip(0.3 + sku_weight / sku_weight.max() * 5, 0, 1)
+    carried = rng.random((n_stores, n_skus)) < carry_probability
+    pos_store, pos_sku = np.nonzero(carried)
+    inventory_ids = pd.Series(stores[pos_store].astype(str)).str.cat(
+        [pd.Series(cities[pos_store]), pd.Series(brands[pos_sku].astype(str))], sep='_').to_numpy()
+    # Each SKU keeps its Zipf share of the lines, split over the stores carrying it by store size
+    carried_weight = np.bincount(pos_sku, store_weight[pos_store], n_skus)
+    pos_weight = store_weight[pos_store] * sku_weight[pos_sku] / carried_weight[pos_sku]
+    pos_weight /= pos_weight.sum()
+
+    dates = pd.date_range(START_DATE, START_DATE + pd.DateOffset(years=years) - pd.Timedelta(days=1))
+    n_days = len(dates)
+
+    # --- 3. Sales lines ---
+    position = rng.choice(len(pos_store), n_sales, p=pos_weight)
+    sku = pos_sku[position]
+    quantity = 1 + rng.poisson(basket[sku])
+    bulk = rng.random(n_sales) < 0.02
+    quantity[bulk] *= np.where(volumes[sku[bulk]] >= 1000, 6, 12)  # case sales, as purchased below
+    sales_day = rng.choice(n_days, n_sales, p=_day_weights(dates, rng))
+    df_sales = pd.DataFrame({
+        'InventoryId': inventory_ids[position], 'Store': stores[pos_store[position]], 'Brand': brands[sku],
+        'Description': descriptions[sku], 'Size': sizes[sku],
+        'SalesQuantity': quantity, 'SalesDollars': (quantity * prices[sku]).round(2),
+        'SalesPrice': prices[sku], 'SalesDate': dates.strftime('%m/%d/%Y').to_numpy()[sales_day],
+        'Volume': volumes[sku], 'Classification': classification[sku],
+        'ExciseTax': (quantity * volumes[sku] / 1000 * np.where(classification[sku] == 1, 1.09, 0.11)).round(2),
+        'VendorNo': vendor_numbers[sku_vendor[sku]], 'VendorName': vendor_names[sku_vendor[sku]],
+    })
+
+    # --- 4. Purchase lines: replenishment of the selling positions, in case multiples ---
+    position = rng.choice(len(pos_store), n_purchases, p=pos_weight)
+    sku = pos_sku[position]
+    vendor = sku_vendor[sku]
+    # Whole cases, about as many units purchased as sold overall
+    case_size = np.where(volumes[sku] >= 1000, 6, 12)
+    units_per_line = df_sales['SalesQuantity'].sum() / max(n_purchases, 1)
+    purchase_qty = (1 + rng.poisson(np.maximum(units_per_line / case_size - 1, 0))) * case_size
+    po_day = rng.integers(0, max(n_days - 20, 1), n_purchases)
+    lead_days = np.maximum(np.rint(rng.normal(vendor_lead_mean[vendor], vendor_lead_std[vendor])), 1)
+    po_dates = dates[po_day]
+    receiving_dates = po_dates + pd.to_timedelta(lead_days, unit='D')
+    invoice_dates = receiving_dates + pd.to_timedelta(rng.integers(1, 5, n_purchases), unit='D')
+    pay_dates = invoice_dates + pd.to_timedelta(np.rint(rng.normal(vendor_pay_lag[vendor], 5)).clip(1), unit='D')
+    # One purchase order per vendor and PO date
+    po_numbers = 8000 + pd.factorize(vendor.astype('int64') * n_days + po_day)[0]
+    df_purchases = pd.DataFrame({
+        'InventoryId': inventory_ids[position], 'Store': stores[pos_store[position]], 'Brand': brands[sku],
+        'Description': descriptions[sku], 'Size': sizes[sku],
+        'VendorNumber': vendor_numbers[vendor], 'VendorName': vendor_names[vendor], 'PONumber': po_numbers,
+        'PODate': po_dates.strftime('%Y-%m-%d'), 'ReceivingDate': receiving_dates.strftime('%Y-%m-%d'),
+        'InvoiceDate': invoice_dates.strftime('%Y-%m-%d'), 'PayDate': pay_dates.strftime('%Y-%m-%d'),
+        'PurchasePrice': purchase_prices[sku], 'Quantity': purchase_qty,
+        'Dollars': (purchase_qty * purchase_prices[sku]).round(2), 'Classification': classification[sku],
+    })
+
+    # --- 5. Beginning / ending inventory: about a month of demand on hand, rolled forward ---
+    sold = np.bincount(pd.Index(inventory_ids).get_indexer(df_sales['InventoryId']), df_sales['SalesQuantity'], len(pos_store))
+    received = np.bincount(pd.Index(inventory_ids).get_indexer(df_purchases['InventoryId']), purchase_qty, len(pos_store))
+    beg_on_hand = rng.poisson(sold / (years * 12) + 2)
+    df_beg_inv = pd.DataFrame({
+        'InventoryId': inventory_ids, 'Store': stores[pos_store], 'City': cities[pos_store], 'Brand': brands[pos_sku],
+        'Description': descriptions[pos_sku], 'Size': sizes[pos_sku], 'onHand': beg_on_hand,
+        'Price': prices[pos_sku], 'startDate': dates[0].strftime('%Y-%m-%d'),
+    })
+    df_end_inv = df_beg_inv.drop(columns='startDate').assign(
+        onHand=np.maximum(beg_on_hand + received - sold, 0).astype('int64'), endDate=dates[-1].strftime('%Y-%m-%d'))
+    df_end_inv['City'] = df_end_inv['City'].where(rng.random(len(df_end_inv)) >= 0.05)  # Missing City, as in EndInvFINAL
+    df_purchases.loc[rng.random(n_purchases) < 0.01, 'Size'] = np.nan  # Missing Size, as in PurchasesFINAL
+
+    # --- 6. Price list and vendor invoices ---
+    df_prices = pd.DataFrame({
+        'Brand': brands, 'Description': descriptions, 'Price': prices, 'Size': sizes, 'Volume': volumes,
+        'Classification': classification, 'PurchasePrice': purchase_prices,
+        'VendorNumber': vendor_numbers[sku_vendor], 'VendorName': vendor_names[sku_vendor],
+    })
+    df_invoice = df_purchases.groupby(['VendorNumber', 'VendorName', 'PONumber'], as_index=False).agg(
+        InvoiceDate=('InvoiceDate', 'first'), PODate=('PODate', 'first'), PayDate=('PayDate', 'first'),
+        Quantity=('Quantity', 'sum'), Dollars=('Dollars', 'sum')
+    ).assign(Freight=lambda df: (df['Dollars'] * 0.005).round(2), Approval='None')
+
+    return {
+        'beg_inv': df_beg_inv, 'end_inv': df_end_inv, 'purchases': df_purchases,
+        'sales': df_sales, 'prices': df_prices, 'invoice': df_invoice,
+    }
+
+
+def write_synthetic_raw(raw, out_dir):
+    """Write the frames under the uploaded file names, so out_dir can be used as the upload directory."""
+    os.makedirs(out_dir, exist_ok=True)
+    for name, file_name in RAW_FILES.items():
+        raw[name].to_csv(os.path.join(out_dir, file_name), index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic raw CSV files with the schema of the uploaded data.")
+    parser.add_argument('--out-dir', required=True, help="Directory of the CSV files (use it as the upload directory)")
+    parser.add_argument('--scale', type=float, default=1, help="Stores and lines relative to the 1x data (default: 1)")
+    parser.add_argument('--stores', type=int, help="Number of stores (overrides --scale)")
+    parser.add_argument('--skus', type=int, default=BASE_SKUS, help=f"Number of SKUs (default: {BASE_SKUS})")
+    parser.add_argument('--vendors', type=int, default=BASE_VENDORS, help=f"Number of vendors (default: {BASE_VENDORS})")
+    parser.add_argument('--years', type=int, default=1, help="Years of sales and purchases from 2016-01-01 (default: 1)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    config = scale_config(args.scale, args.years)
+    if args.stores:
+        config.update(n_stores=args.stores, n_sales=None, n_purchases=None)
+    config.update(n_skus=args.skus, n_vendors=args.vendors)
+
+    raw = make_synthetic_raw(**config, seed=args.seed)
+    write_synthetic_raw(raw, args.out_dir)
+
+    print("Synthetic Raw Data:")
+    print(pd.DataFrame({
+        'File': list(RAW_FILES.values()),
+        'Rows': [len(raw[name]) for name in RAW_FILES],
+    }).to_markdown(index=False))
+    print(f"\n--- Synthetic data written to {args.out_dir} ---")
+
+
+if __name__ == "__main__":
+    main()
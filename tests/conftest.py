@@ -0,0 +1,15 @@
+import os
+import shutil
+import sys
+import tempfile
+
+# The scripts are flat top-level modules: make them importable from the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Scratch columnar store for the whole session (read by data_store when it is first imported)
+_STORE_DIR = tempfile.mkdtemp(prefix="test_store_")
+os.environ['PIPELINE_STORE_DIR'] = _STORE_DIR
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_STORE_DIR, ignore_errors=True)
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from abc_analysis import ABC_CRITERIA, ABC_THRESHOLDS, XYZ_THRESHOLDS, run_segmented_abc
+from sales_cube import build_sales_cubes
+
+N_PRODUCTS = 8
+STORE_CITY = {101: 'NORTH', 102: 'NORTH', 103: 'SOUTH', 104: 'SOUTH'}
+
+
+def _frames():
+    # Keyed sales lines of 4 stores in 2 cities over 10 weeks; product 7 only sells in store 101
+    rng = np.random.default_rng(0)
+    n = 600
+    df_sales = pd.DataFrame({
+        'ProductKey': rng.integers(0, N_PRODUCTS - 1, n).astype('int32'),
+        'StoreKey': rng.integers(0, 4, n).astype('int32'),
+        'VendorKey': rng.integers(0, 2, n).astype('int32'),
+        'SalesDate': pd.Timestamp('2016-01-04') + pd.to_timedelta(rng.integers(0, 70, n), unit='D'),
+        'SalesQuantity': rng.integers(1, 500, n),
+        'SalesDollars': rng.uniform(5, 5000, n),
+        'COGS': rng.uniform(1, 100, n),
+    })
+    df_sales.loc[:4, ['ProductKey', 'StoreKey']] = [N_PRODUCTS - 1, 0]
+    df_sales['GrossProfit'] = df_sales['SalesDollars'] * rng.uniform(0.1, 0.4, n)
+    df_stores = pd.DataFrame({'StoreKey': np.arange(4, dtype='int32'), 'Store': list(STORE_CITY),
+                              'City': list(STORE_CITY.values())})
+    df_products = pd.DataFrame({'ProductKey': np.arange(N_PRODUCTS, dtype='int32'), 'Brand': np.arange(N_PRODUCTS) + 1,
+                                'Description': [f"Product {i}" for i in range(N_PRODUCTS)], 'Size': '750mL'})
+    return build_sales_cubes(df_sales)['sales_cube_weekly'], df_products, df_stores
+
+
+def _segments(df_weekly):
+    # (Segment_Type, Segment) -> weekly rows of that segment, computed independently per segment
+    df_weekly = df_weekly.assign(City=df_weekly['Store'].map(STORE_CITY))
+    segments = {('Company', 'All'): df_weekly}
+    segments.update({('Store', str(store)): df for store, df in df_weekly.groupby('Store')})
+    segments.update({('City', city): df for city, df in df_weekly.groupby('City')})
+    return segments
+
+
+def _expected_abc(df_rows, column):
+    totals = df_rows.groupby('ProductKey')[column].sum().sort_values(ascending=False, kind='stable')
+    cumulative = totals.cumsum() / totals.sum()
+    return pd.Series(np.array(['A', 'B', 'C'])[np.searchsorted(ABC_THRESHOLDS, cumulative)], index=totals.index)
+
+
+def _expected_xyz(df_rows, weeks):
+    units = df_rows.pivot_table(index='ProductKey', columns='Date', values='SalesQuantity', aggfunc='sum')
+    units = units.reindex(columns=weeks, fill_value=0).fillna(0)
+    cv = units.std(axis=1) / units.mean(axis=1)
+    return pd.Series(np.array(['X', 'Y', 'Z'])[np.searchsorted(XYZ_THRESHOLDS, cv)], index=units.index)
+
+
+def test_segmented_classes_match_a_per_segment_classification():
+    df_cube, df_products, df_stores = _frames()
+    df_segmented = run_segmented_abc(df_cube, df_products, df_stores)
+    df_weekly = df_cube.assign(Store=df_cube['StoreKey'].map(df_stores.set_index('StoreKey')['Store']))
+    weeks = np.sort(df_cube['Date'].unique())
+
+    segments = _segments(df_weekly)
+    assert set(zip(df_segmented['Segment_Type'].astype(str), df_segmented['Segment'])) == set(segments)
+    for (segment_type, segment), df_rows in segments.items():
+        df_segment = df_segmented[(df_segmented['Segment_Type'] == segment_type) & (df_segmented['Segment'] == segment)]
+        classes = df_segment.set_index(['Criterion', 'ProductKey'])['Class'].astype(str)
+        for criterion, column in ABC_CRITERIA.items():
+            expected = _expected_abc(df_rows, column)
+            pd.testing.assert_series_equal(classes[criterion].loc[expected.index], expected,
+                                           check_names=False, check_index_type=False)
+        expected = _expected_xyz(df_rows, weeks)
+        pd.testing.assert_series_equal(classes['Variability'].loc[expected.index], expected,
+                                       check_names=False, check_index_type=False)
+
+
+def test_product_sold_in_one_store_is_ranked_only_where_it_sells():
+    df_cube, df_products, df_stores = _frames()
+    df_segmented = run_segmented_abc(df_cube, df_products, df_stores)
+    df_product = df_segmented[df_segmented['ProductKey'] == N_PRODUCTS - 1]
+    assert set(df_product['Segment']) == {'All', '101', 'NORTH'}
+    assert (df_product['Brand'] == N_PRODUCTS).all()
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from dimensions import assign_keys, build_dimensions, decode
+
+
+def _inventory():
+    return pd.DataFrame({
+        'Store': [1, 1, 2], 'City': ['HARDERSFIELD', 'HARDERSFIELD', 'ASHBORNE'],
+        'Brand': [58, 60, 58], 'Description': ['Gekkeikan Plum Wine', 'Le Cellier Pinot', 'Gekkeikan Plum Wine'],
+        'Size': ['750mL', '750mL', '750mL'], 'onHand': [11, 6, 4],
+    })
+
+
+def _sales():
+    return pd.DataFrame({
+        'Store': [2, 1, 2], 'Brand': [60, 58, 60], 'Description': ['Le Cellier Pinot', 'Gekkeikan Plum Wine', 'Le Cellier Pinot'],
+        'Size': ['750mL'] * 3, 'VendorNo': [105, 4425, 105], 'VendorName': ['ALTAMAR', 'MARTIGNETTI', 'ALTAMAR'],
+        'SalesQuantity': [1, 2, 3],
+    })
+
+
+def test_assign_keys_then_decode_round_trips_the_labels():
+    dims = build_dimensions([_inventory(), _sales()])
+    df_keyed = assign_keys(_sales(), dims)
+    assert list(df_keyed.columns) == ['ProductKey', 'StoreKey', 'VendorKey', 'SalesQuantity']
+    assert df_keyed['ProductKey'].tolist() == [1, 0, 1]
+
+    df_decoded = decode(df_keyed, dims)
+    pd.testing.assert_frame_equal(df_decoded[_sales().columns], _sales(), check_dtype=False)
+
+
+def test_decode_keeps_keys_and_adds_attributes_on_request():
+    dims = build_dimensions([_inventory()])
+    df_decoded = decode(assign_keys(_inventory(), dims), dims, columns=['Store', 'City', 'Brand'], keep_keys=True)
+    assert list(df_decoded.columns) == ['ProductKey', 'Brand', 'StoreKey', 'Store', 'City', 'onHand']
+    assert df_decoded['City'].tolist() == ['HARDERSFIELD', 'HARDERSFIELD', 'ASHBORNE']
+
+
+def test_members_missing_from_the_dimensions_raise():
+    dims = build_dimensions([_inventory(), _sales().iloc[:1]])
+    with pytest.raises(KeyError, match="1 rows have members missing from dim_vendor"):
+        assign_keys(_sales(), dims)
+    with pytest.raises(KeyError, match="2 rows have members missing from dim_product"):
+        assign_keys(_sales().assign(Brand=[99, 58, 99]), dims)
+
+
+def test_new_members_get_the_next_free_keys():
+    dims = build_dimensions([_inventory()])
+    df_sales = pd.concat([_sales(), _sales().iloc[[0]].assign(Store=3, Brand=99, Description='New')], ignore_index=True)
+    extended = build_dimensions([df_sales], dims)
+
+    # Existing keys are unchanged; the new store and product follow the last keys
+    pd.testing.assert_frame_equal(extended['dim_product'].iloc[:len(dims['dim_product'])], dims['dim_product'])
+    assert extended['dim_store']['Store'].tolist() == [1, 2, 3]
+    assert extended['dim_store']['StoreKey'].tolist() == [0, 1, 2]
+    assert extended['dim_product'].set_index('Brand').loc[99, 'ProductKey'] == 2
+    pd.testing.assert_frame_equal(decode(assign_keys(df_sales, extended), extended)[df_sales.columns], df_sales,
+                                  check_dtype=False)
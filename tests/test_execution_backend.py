@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_store import write_frame
+from execution_backend import BACKENDS, group_aggregate, read_source, source_rows
+
+AGGS = {
+    'Quantity_Sum': ('Quantity', 'sum'),
+    'Price_Mean': ('Price', 'mean'),
+    'Price_Std': ('Price', 'std'),
+    'Price_Count': ('Price', 'count'),
+    'Orders': ('OrderNumber', 'nunique'),
+    'First_Date': ('OrderDate', 'min'),
+    'Price_Max': ('Price', 'max'),
+}
+
+
+@pytest.fixture(scope='module')
+def lines():
+    rng = np.random.default_rng(0)
+    n = 400
+    df = pd.DataFrame({
+        'VendorKey': rng.integers(0, 7, n).astype('int32'),
+        'Size': pd.Categorical(rng.choice(['375mL', '750mL', '1.75L'], n)),
+        'OrderNumber': rng.integers(0, 60, n),
+        'Quantity': rng.integers(1, 50, n),
+        'Price': rng.gamma(2.0, 10.0, n),
+        'Cost': rng.gamma(2.0, 5.0, n),
+        'OrderDate': pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 300, n), unit='D'),
+    })
+    df['ReceiveDate'] = df['OrderDate'] + pd.to_timedelta(rng.integers(0, 20, n), unit='D')
+    # Missing values are skipped by every aggregation
+    df.loc[rng.choice(n, 30, replace=False), 'Price'] = np.nan
+    df.loc[rng.choice(n, 10, replace=False), 'ReceiveDate'] = pd.NaT
+    df.loc[rng.choice(n, 5, replace=False), 'Price'] = 0.0
+    return df
+
+
+@pytest.fixture(scope='module')
+def store_dir(lines, tmp_path_factory):
+    store_dir = str(tmp_path_factory.mktemp('store'))
+    # Several row groups, so the chunked backend combines partials from worker processes
+    write_frame(lines, 'lines', store_dir=store_dir, export_csv=False, row_group_size=100)
+    return store_dir
+
+
+def _sorted(df, keys):
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+QUERIES = [
+    (['VendorKey'], AGGS, None, None),
+    (['VendorKey', 'Size'], {'Quantity_Sum': ('Quantity', 'sum'), 'Orders': ('OrderNumber', 'nunique')}, None, None),
+    (['VendorKey'], {'Lag_Mean': ('Lag', 'mean'), 'Lag_Sum': ('Lag', 'sum'), 'Margin': ('Margin', 'mean')},
+     {'Lag': ('days_between', 'OrderDate', 'ReceiveDate'), 'Margin': ('percent_of', 'Cost', 'Price')}, None),
+    (['Size'], {'Quantity_Sum': ('Quantity', 'sum'), 'Price_Mean': ('Price', 'mean')}, None,
+     [('OrderDate', '>=', pd.Timestamp('2016-05-01')), ('VendorKey', 'in', [1, 2, 3]), ('Price', '!=', 0.0)]),
+]
+
+
+@pytest.mark.parametrize('keys, aggs, derive, filters', QUERIES)
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backends_match_pandas_on_frames_and_datasets(lines, store_dir, backend, keys, aggs, derive, filters):
+    reference = _sorted(group_aggregate(lines, keys, aggs, 'pandas', derive=derive, filters=filters), keys)
+    for source in (lines, 'lines'):
+        result = group_aggregate(source, keys, aggs, backend, store_dir=store_dir, derive=derive, filters=filters)
+        pd.testing.assert_frame_equal(_sorted(result, keys)[reference.columns], reference,
+                                      check_dtype=False, check_categorical=False, rtol=1e-9)
+
+
+def test_filters_and_derived_columns_match_plain_pandas(lines):
+    result = group_aggregate(lines, ['VendorKey'], {'Lag_Mean': ('Lag', 'mean')}, 'pandas',
+                             derive={'Lag': ('days_between', 'OrderDate', 'ReceiveDate')},
+                             filters=[('Quantity', '>', 10)])
+    df = lines[lines['Quantity'] > 10]
+    expected = (df['ReceiveDate'] - df['OrderDate']).dt.days.groupby(df['VendorKey']).mean()
+    np.testing.assert_allclose(result['Lag_Mean'].to_numpy(), expected.to_numpy())
+
+
+def test_dataset_helpers(lines, store_dir):
+    assert source_rows('lines', store_dir) == source_rows(lines) == len(lines)
+    pd.testing.assert_frame_equal(read_source('lines', ['Quantity'], store_dir=store_dir), lines[['Quantity']])
+
+
+def test_unknown_backend_and_aggregation(lines):
+    with pytest.raises(ValueError):
+        group_aggregate(lines, ['VendorKey'], AGGS, 'spark')
+    with pytest.raises(ValueError):
+        group_aggregate(lines, ['VendorKey'], {'Quantity_Median': ('Quantity', 'median')}, 'pandas')
@@ -0,0 +1,34 @@
+import numpy as np
+
+from forecast_models import MODELS, SEASON_LENGTH, backtest_mae, select_models
+
+
+def _short_series():
+    # 53 weeks (shorter than SEASON_LENGTH + h): the backtest trains on 49 weeks, the forecast uses all 53
+    Y = np.zeros((1, 53))
+    Y[0, :4] = [1, 2, 3, 4]
+    Y[0, 45:] = 48
+    return Y
+
+
+def test_seasonal_naive_not_scored_without_a_full_season_of_training():
+    errors = backtest_mae(_short_series(), 4)
+    assert np.isinf(errors[0, list(MODELS).index('SeasonalNaive')])
+    assert np.isfinite(np.delete(errors[0], list(MODELS).index('SeasonalNaive'))).all()
+
+
+def test_selected_model_is_the_one_that_forecasts():
+    Y = _short_series()
+    forecasts, names, best_mae, _ = select_models(Y, 4)
+    assert names[0] != 'SeasonalNaive'
+    np.testing.assert_array_equal(forecasts[0], MODELS[names[0]](Y, 4)[0])
+    assert best_mae[0] == backtest_mae(Y, 4)[0].min()
+
+
+def test_seasonal_naive_scored_with_enough_history():
+    rng = np.random.default_rng(0)
+    season = np.tile(rng.integers(0, 20, SEASON_LENGTH), 2)[None, :].astype('float64')
+    forecasts, names, best_mae, _ = select_models(season, 4)
+    assert names[0] == 'SeasonalNaive'
+    assert best_mae[0] == 0
+    np.testing.assert_array_equal(forecasts[0], season[0, SEASON_LENGTH:SEASON_LENGTH + 4])
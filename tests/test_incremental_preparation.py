@@ -0,0 +1,90 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import data_store
+from data_preparation import RAW_FILES, clean_purchases, load_raw_data, prepare_data, save_prepared_data
+from data_store import read_frame
+from dimensions import decode, load_dimensions
+from incremental_preparation import prepare_incremental, select_new_purchases
+from synthetic_data import make_synthetic_raw, scale_config, write_synthetic_raw
+
+
+def _purchases():
+    # One drop of raw purchase lines as prepare_incremental reads it, three of them never received
+    df_purchases = pd.DataFrame({
+        'PONumber': [1, 2, 3, 4, 5, 6],
+        'PODate': ['2016-11-01', '2016-11-20', '2016-11-25', '2016-11-28', '2016-12-02', '2016-12-05'],
+        'ReceivingDate': ['2016-11-08', np.nan, '2016-12-03', np.nan, '2016-12-09', np.nan],
+        'InvoiceDate': ['2016-11-10'] * 6,
+        'PayDate': ['2016-12-10'] * 6,
+        'Brand': [1, 1, 2, 2, 3, 3],
+        'Size': ['750mL'] * 6,
+        'PurchasePrice': [10.0, 10.0, 12.5, 12.5, 8.0, 8.0],
+        'Quantity': [5, 6, 7, 8, 9, 10],
+        'Dollars': [50.0, 60.0, 87.5, 100.0, 72.0, 80.0],
+    })
+    df_purchases['ReceivingDate'] = pd.to_datetime(df_purchases['ReceivingDate'])
+    return df_purchases
+
+
+def test_incremental_build_matches_full_build_with_unreceived_lines():
+    df_drop = _purchases()
+    watermark = pd.Timestamp('2016-11-30')
+    # Full build of the first period: received up to the watermark, plus the unreceived line of PO 2
+    df_stored = clean_purchases(df_drop.iloc[[0, 1]].copy(), {})
+
+    df_new = select_new_purchases(df_drop.copy(), watermark, df_stored[df_stored['ReceivingDate'].isna()])
+    df_incremental = pd.concat([df_stored, clean_purchases(df_new, {})], ignore_index=True)
+    df_full = clean_purchases(df_drop.copy(), {})
+
+    assert sorted(df_new['PONumber']) == [3, 4, 5, 6]
+    pd.testing.assert_frame_equal(df_incremental.sort_values('PONumber').reset_index(drop=True), df_full)
+
+
+def test_unreceived_lines_are_new_without_stored_ones():
+    df_new = select_new_purchases(_purchases(), pd.Timestamp('2016-12-31'), pd.DataFrame())
+    assert sorted(df_new['PONumber']) == [2, 4, 6]
+
+
+def _decoded(name):
+    df = decode(read_frame(name), load_dimensions()) if name != 'purchase_price_aggregates' else read_frame(name)
+    df = df.astype({col: str for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def _full_build(upload_dir):
+    shutil.rmtree(data_store.STORE_DIR, ignore_errors=True)
+    save_prepared_data(prepare_data(load_raw_data(upload_dir)))
+
+
+def test_lines_received_after_an_incremental_build_replace_their_unreceived_rows(tmp_path):
+    raw = make_synthetic_raw(**scale_config(0.2), seed=3)
+    df_purchases, df_sales = raw['purchases'], raw['sales']
+    cutoff = '2016-10-31'
+    received = pd.to_datetime(df_purchases['ReceivingDate'])
+    rng = np.random.default_rng(0)
+    never_received = rng.choice(np.flatnonzero(received <= cutoff), 10, replace=False)
+    received_late = rng.choice(np.flatnonzero(received > cutoff), 15, replace=False)
+
+    # The final drop: everything received except the never-received lines
+    df_purchases.loc[never_received, 'ReceivingDate'] = np.nan
+    write_synthetic_raw(raw, str(tmp_path / "final"))
+
+    # The first drop: up to the cutoff, with the late lines still unreceived
+    df_first = df_purchases[(received <= cutoff) | df_purchases.index.isin(received_late)].copy()
+    df_first.loc[received_late, 'ReceivingDate'] = np.nan
+    write_synthetic_raw({**raw, 'purchases': df_first, 'sales': df_sales[pd.to_datetime(df_sales['SalesDate']) <= cutoff]},
+                        str(tmp_path / "first"))
+
+    _full_build(str(tmp_path / "final"))
+    full = {name: _decoded(name) for name in ['df_purchases_cleaned', 'purchase_price_aggregates']}
+
+    _full_build(str(tmp_path / "first"))
+    prepare_incremental(str(tmp_path / "final" / RAW_FILES['sales']), str(tmp_path / "final" / RAW_FILES['purchases']))
+    incremental = {name: _decoded(name) for name in full}
+
+    assert incremental['df_purchases_cleaned']['ReceivingDate'].isna().sum() == 10
+    for name in full:
+        pd.testing.assert_frame_equal(incremental[name][full[name].columns], full[name], check_dtype=False, rtol=1e-9)
@@ -0,0 +1,24 @@
+import pytest
+
+from inventory_policy import SERVICE_LEVELS, validate_service_levels
+from run_pipeline import stage_params
+
+
+def test_default_service_levels_are_valid():
+    validate_service_levels(SERVICE_LEVELS)
+
+
+@pytest.mark.parametrize('level', [0, 1, 1.0, -0.5, 1.5, '0.95', None])
+def test_service_level_outside_open_unit_interval_is_rejected(level):
+    with pytest.raises(ValueError, match="between 0 and 1"):
+        validate_service_levels({**SERVICE_LEVELS, 'A': level})
+
+
+def test_invalid_default_service_level_is_rejected():
+    with pytest.raises(ValueError, match="default=1.0"):
+        validate_service_levels(SERVICE_LEVELS, default_service_level=1.0)
+
+
+def test_pipeline_rejects_invalid_service_levels_before_running():
+    with pytest.raises(ValueError, match="A=1.0"):
+        stage_params({'policy': {'service_levels': {'A': 1.0, 'B': 0.95}}})
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from inventory_simulation import build_positions, run_inventory_simulation, split_sku_policy
+
+
+def _frames():
+    df_sales_master = pd.DataFrame({
+        'StoreKey': [1, 1, 2, 2, 1, 2],
+        'ProductKey': [10, 10, 10, 10, 20, 20],
+        'SalesDate': pd.to_datetime(['2016-01-01', '2016-01-05', '2016-01-02', '2016-01-09', '2016-01-03', '2016-01-10']),
+        'SalesQuantity': [30, 30, 10, 10, 5, 0],
+    })
+    df_inventory_master = pd.DataFrame({
+        'StoreKey': [1, 2, 3], 'ProductKey': [10, 10, 10],
+        'Beg_onHand': [20, 5, 7], 'End_onHand': [0, 0, 7], 'Avg_Price': [1.0, 1.0, 1.0],
+    })
+    df_eoq_rop = pd.DataFrame({'ProductKey': [10, 20], 'Reorder_Point_ROP': [10, 3], 'EOQ': [40, 0], 'Avg_LeadTime_Days': [4.0, 6.0]})
+    return df_sales_master, df_inventory_master, df_eoq_rop
+
+
+def test_sku_policy_split_by_store_demand_share():
+    df_sales_master, df_inventory_master, df_eoq_rop = _frames()
+    df_positions = build_positions(df_inventory_master, df_sales_master)
+    rop, eoq = split_sku_policy(df_positions, df_sales_master, df_eoq_rop)
+    by_position = dict(zip(zip(df_positions['StoreKey'], df_positions['ProductKey']), zip(rop, eoq)))
+    # SKU 10: store 1 sells 75%, store 2 25%, store 3 nothing
+    assert by_position[(1, 10)] == (8, 30)
+    assert by_position[(2, 10)] == (3, 10)
+    assert by_position[(3, 10)] == (0, 0)
+    # SKU 20 has no EOQ: never reorders
+    assert by_position[(1, 20)][1] == 0 and by_position[(2, 20)][1] == 0
+
+
+def test_simulation_without_recorded_lead_times():
+    df_sales_master, df_inventory_master, df_eoq_rop = _frames()
+    df_purchases_cleaned = pd.DataFrame({
+        'StoreKey': [1], 'ProductKey': [10], 'ReceivingDate': pd.to_datetime(['2016-01-04']),
+        'Quantity': [10], 'LeadTime_Days': [np.nan],
+    })
+    df_results, df_summary = run_inventory_simulation(df_sales_master, df_inventory_master, df_purchases_cleaned, df_eoq_rop)
+    assert list(df_summary['Policy']) == ['historical', 'optimization']
+    assert df_summary.loc[df_summary['Policy'] == 'optimization', 'Orders'].iloc[0] > 0
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from sales_cube import SalesCube, build_sales_cubes, combine_partials, cube_partials
+
+
+def _lines():
+    # Keyed sales lines of 5 products in 3 stores over 8 weeks; product 4 has a gap of several weeks
+    rng = np.random.default_rng(0)
+    n = 400
+    df_sales = pd.DataFrame({
+        'ProductKey': rng.integers(0, 4, n).astype('int32'),
+        'StoreKey': rng.integers(0, 3, n).astype('int32'),
+        'VendorKey': rng.integers(0, 2, n).astype('int32'),
+        'SalesDate': pd.Timestamp('2016-01-04') + pd.to_timedelta(rng.integers(0, 56, n), unit='D'),
+        'SalesQuantity': rng.integers(1, 20, n),
+        'SalesDollars': rng.uniform(5, 500, n),
+        'COGS': rng.uniform(1, 100, n),
+        'GrossProfit': rng.uniform(1, 100, n),
+    })
+    df_sales.loc[:1, 'ProductKey'] = 4
+    df_sales.loc[:1, 'SalesDate'] = pd.to_datetime(['2016-01-12', '2016-02-16'])
+    df_products = pd.DataFrame({'ProductKey': np.arange(5, dtype='int32'), 'Brand': np.arange(5) + 1,
+                                'Description': [f"Product {i}" for i in range(5)], 'Size': '750mL'})
+    return df_sales, df_products
+
+
+def _cube(grain='W'):
+    df_sales, df_products = _lines()
+    name = {'D': 'sales_cube_daily', 'W': 'sales_cube_weekly'}[grain]
+    return SalesCube(build_sales_cubes(df_sales)[name], df_products, grain), df_sales
+
+
+def _weekly(df_lines, measure='SalesQuantity'):
+    return df_lines.set_index('SalesDate')[measure].resample('W').sum()
+
+
+def test_series_matches_resampled_lines_with_zero_weeks():
+    cube, df_sales = _cube()
+    for product_key in range(5):
+        expected = _weekly(df_sales[df_sales['ProductKey'] == product_key])
+        pd.testing.assert_series_equal(cube.series(product_key), expected, check_names=False, check_freq=False,
+                                       check_index_type=False, check_dtype=False)
+    # Product 4: the weeks between its two sales are present with 0
+    assert (cube.series(4).iloc[1:-1] == 0).all() and len(cube.series(4)) == 6
+
+
+def test_series_of_a_store_subset_and_of_all_products():
+    cube, df_sales = _cube()
+    df_stores = df_sales[(df_sales['ProductKey'] == 2) & df_sales['StoreKey'].isin([0, 2])]
+    pd.testing.assert_series_equal(cube.series(2, 'SalesDollars', store_keys=[0, 2]), _weekly(df_stores, 'SalesDollars'),
+                                   check_names=False, check_freq=False, check_index_type=False)
+    pd.testing.assert_series_equal(cube.series(), _weekly(df_sales), check_names=False, check_freq=False,
+                                   check_index_type=False, check_dtype=False)
+    assert cube.series(99).empty
+
+
+def test_daily_series_matches_the_lines():
+    cube, df_sales = _cube('D')
+    expected = df_sales[df_sales['ProductKey'] == 1].set_index('SalesDate')['SalesQuantity'].resample('D').sum()
+    pd.testing.assert_series_equal(cube.series(1), expected, check_names=False, check_freq=False,
+                                   check_index_type=False, check_dtype=False)
+
+
+def test_matrix_rows_are_the_products_on_one_shared_grid():
+    cube, df_sales = _cube()
+    matrix = cube.matrix([1, 4])
+    weeks = _weekly(df_sales).index
+    assert list(matrix.columns) == list(weeks)
+    assert list(matrix.index) == [(2, 'Product 1', '750mL'), (5, 'Product 4', '750mL')]
+    for row, product_key in zip(matrix.to_numpy(), [1, 4]):
+        expected = _weekly(df_sales[df_sales['ProductKey'] == product_key]).reindex(weeks, fill_value=0)
+        np.testing.assert_allclose(row, expected.to_numpy())
+    assert cube.matrix().shape == (5, len(weeks))
+
+
+def test_product_rows_and_key_lookup():
+    cube, df_sales = _cube()
+    assert (cube.product_rows(3)['ProductKey'] == 3).all()
+    assert len(cube.product_rows(3)) == (cube.frame['ProductKey'] == 3).sum()
+    assert cube.product_key(4, 'Product 3', '750mL') == 3
+    assert cube.product_key(4, 'Product 3', '1.75L') is None
+
+
+def test_cube_from_chunk_partials_equals_cube_from_all_lines():
+    df_sales, _ = _lines()
+    whole = build_sales_cubes(df_sales)
+    partial = combine_partials([cube_partials(df_sales.iloc[start:start + 150]) for start in range(0, len(df_sales), 150)])
+    for grain, name in [('D', 'sales_cube_daily'), ('W', 'sales_cube_weekly')]:
+        df_combined = partial[grain].sort_values(['ProductKey', 'StoreKey', 'VendorKey', 'Date']).reset_index(drop=True)
+        pd.testing.assert_frame_equal(df_combined, whole[name], check_dtype=False)
@@ -0,0 +1,79 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from data_store import read_frame
+from sales_cube import SalesCube, build_sales_cubes
+from scenario_analysis import query_scenario, run_scenario_analysis, scenario_grid, sku_inputs
+
+N_SKUS = 7
+
+
+def _inputs():
+    rng = np.random.default_rng(0)
+    n = 500
+    df_sales = pd.DataFrame({
+        'ProductKey': rng.integers(0, N_SKUS, n).astype('int32'),
+        'StoreKey': rng.integers(0, 3, n).astype('int32'),
+        'VendorKey': np.zeros(n, dtype='int32'),
+        'SalesDate': pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 366, n), unit='D'),
+        'SalesQuantity': rng.integers(1, 30, n),
+        'SalesDollars': 0.0, 'COGS': 0.0, 'GrossProfit': 0.0,
+    })
+    df_products = pd.DataFrame({'ProductKey': np.arange(N_SKUS, dtype='int32'), 'Brand': np.arange(N_SKUS) + 1,
+                                'Description': [f"Product {i}" for i in range(N_SKUS)], 'Size': '750mL'})
+    # SKU 6 is never purchased (overall lead time, zero unit cost)
+    m = 60
+    df_purchases = pd.DataFrame({
+        'ProductKey': rng.integers(0, N_SKUS - 1, m).astype('int32'),
+        'PurchasePrice': rng.uniform(2, 40, m),
+        'LeadTime_Days': rng.integers(2, 15, m).astype('float64'),
+    })
+    return SalesCube(build_sales_cubes(df_sales)['sales_cube_daily'], df_products, 'D'), df_purchases
+
+
+def _grid():
+    return scenario_grid([25.0, 100.0], [0.2, 0.3], [1.0, 1.5], [0.9, 0.99])
+
+
+def test_blocked_sweep_matches_a_single_block():
+    sales_cube, df_purchases = _inputs()
+    df_scenarios = _grid()
+
+    df_single = run_scenario_analysis(sales_cube, df_purchases, df_scenarios, block_cells=10 ** 6)
+    df_single_details = read_frame("scenario_results")
+    # 3 scenarios per block: the last block is partial
+    df_blocked = run_scenario_analysis(sales_cube, df_purchases, df_scenarios, block_cells=3 * N_SKUS)
+    df_blocked_details = read_frame("scenario_results")
+
+    assert len(df_blocked) == len(df_scenarios) == 16
+    pd.testing.assert_frame_equal(df_blocked, df_single)
+    assert len(df_blocked_details) == 16 * N_SKUS
+    pd.testing.assert_frame_equal(df_blocked_details.sort_values(['Scenario_Id', 'ProductKey']).reset_index(drop=True),
+                                  df_single_details.sort_values(['Scenario_Id', 'ProductKey']).reset_index(drop=True))
+
+
+def test_details_match_the_formulas_and_the_summary():
+    sales_cube, df_purchases = _inputs()
+    df_scenarios = _grid()
+    df_summary = run_scenario_analysis(sales_cube, df_purchases, df_scenarios, block_cells=5 * N_SKUS)
+    df_sku = sku_inputs(sales_cube, df_purchases).set_index('ProductKey')
+
+    scenario = df_scenarios.iloc[11]
+    df_result = query_scenario(int(scenario['Scenario_Id'])).set_index('ProductKey')
+    assert len(df_result) == N_SKUS
+    z = NormalDist().inv_cdf(scenario['Service_Level'])
+    for product_key, sku in df_sku.iterrows():
+        H = sku['Avg_Unit_Cost'] * scenario['Holding_Cost_Percentage']
+        L = sku['Avg_LeadTime_Days'] * scenario['LeadTime_Factor']
+        sigma_L = sku['LeadTime_StdDev'] * scenario['LeadTime_Factor']
+        eoq = round(math.sqrt(2 * sku['Annual_Demand'] * scenario['Ordering_Cost'] / (H + 1e-6)))
+        safety_stock = math.ceil(z * math.sqrt(L * sku['Daily_Demand_StdDev'] ** 2 + sku['Avg_Daily_Demand'] ** 2 * sigma_L ** 2))
+        assert df_result.loc[product_key, 'EOQ'] == eoq
+        assert df_result.loc[product_key, 'Safety_Stock'] == safety_stock
+        assert df_result.loc[product_key, 'Reorder_Point_ROP'] == round(sku['Avg_Daily_Demand'] * L) + safety_stock
+
+    totals = read_frame("scenario_results").groupby('Scenario_Id')['Total_Cost_Annual'].sum()
+    np.testing.assert_allclose(df_summary.set_index('Scenario_Id')['Total_Cost'], totals.reindex(df_summary['Scenario_Id']))
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_store import write_frame
+from stage_cache import StageCache
+
+
+def _outputs(seed):
+    rng = np.random.default_rng(seed)
+    return {'frame': pd.DataFrame({'ProductKey': np.arange(100, dtype='int32'), 'Value': rng.uniform(size=100)})}
+
+
+def _set_last_used(cache, key, seconds):
+    os.utime(os.path.join(cache._entry_dir(key), "manifest.json"), (seconds, seconds))
+
+
+def test_put_then_get_returns_the_outputs_and_text(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    assert cache.get("a" * 64) is None
+
+    cache.put("a" * 64, 'abc', _outputs(0), "printed\n")
+    outputs, text = cache.get("a" * 64)
+    pd.testing.assert_frame_equal(outputs['frame'], _outputs(0)['frame'])
+    assert text == "printed\n"
+    assert cache.entries()['Stage'].tolist() == ['abc']
+
+
+def test_key_changes_only_with_what_the_stage_depends_on(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    code = tmp_path / "stage_code.py"
+    raw = tmp_path / "raw.csv"
+    code.write_text("x = 1\n")
+    raw.write_text("a,b\n1,2\n")
+
+    def key(params={'cost': 1}, inputs={'df': 'upstream'}):
+        return cache.stage_key('optimize', params, [str(code)], inputs, [str(raw)])
+
+    base = key()
+    assert key() == base
+    assert key(params={'cost': 2}) != base
+    assert key(inputs={'df': 'other upstream'}) != base
+
+    code.write_text("x = 22\n")
+    assert key() != base
+    code.write_text("x = 1\n")
+    assert key() == base
+
+    raw.write_text("a,b\n1,30\n")
+    assert key() != base
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    cache.put("a" * 64, 'abc', _outputs(0), "")
+    entry_bytes = cache.entries()['Bytes'].iloc[0]
+    cache.max_bytes = int(entry_bytes * 2.5)
+
+    cache.put("b" * 64, 'abc', _outputs(1), "")
+    _set_last_used(cache, "a" * 64, 1_000)
+    _set_last_used(cache, "b" * 64, 2_000)
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get("a" * 64) is not None
+
+    cache.put("c" * 64, 'abc', _outputs(2), "")
+    assert sorted(cache.entries()['Key'].str[0]) == ['a', 'c']
+    assert cache.get("b" * 64) is None
+
+
+def test_store_is_current_until_the_dataset_is_rewritten(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    write_frame(_outputs(0)['frame'], "cache_test_frame")
+    cache.record_store("k1", ["cache_test_frame"])
+    assert cache.store_is_current("k1", ["cache_test_frame"])
+    assert not cache.store_is_current("k2", ["cache_test_frame"])
+
+    write_frame(_outputs(1)['frame'].iloc[:50], "cache_test_frame")
+    assert not cache.store_is_current("k1", ["cache_test_frame"])
+
+    # The state survives a new cache instance
+    cache.record_store("k1", ["cache_test_frame"])
+    assert StageCache(str(tmp_path / "cache")).store_is_current("k1", ["cache_test_frame"])
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from vendor_scorecard import MEASURES, PERCENTILES, VendorScorecard
+
+
+def _purchases(n, seed, lead_time_max=20):
+    rng = np.random.default_rng(seed)
+    po_dates = pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 366, n), unit='D')
+    invoice_dates = po_dates + pd.to_timedelta(rng.integers(5, 30, n), unit='D')
+    lead_times = rng.integers(1, lead_time_max, n).astype('float64')
+    lead_times[rng.random(n) < 0.05] = np.nan  # never received
+    return pd.DataFrame({
+        'VendorKey': rng.integers(0, 4, n).astype('int32'),
+        'ProductKey': rng.integers(0, 6, n).astype('int32'),
+        'PODate': po_dates,
+        'InvoiceDate': invoice_dates,
+        'PayDate': invoice_dates + pd.to_timedelta(rng.integers(10, 60, n), unit='D'),
+        'LeadTime_Days': lead_times,
+    })
+
+
+def _dimensions():
+    # Vendor keys 2 and 3 are the same vendor number (renamed vendor)
+    df_vendors = pd.DataFrame({'VendorKey': np.arange(4, dtype='int32'), 'VendorNo': [105, 480, 4425, 4425],
+                               'VendorName': ['ALTAMAR', 'BACARDI', 'MARTIGNETTI', 'MARTIGNETTI COMPANIES']})
+    df_products = pd.DataFrame({'ProductKey': np.arange(6, dtype='int32'), 'Brand': [58, 60, 61, 62, 63, 64]})
+    return df_vendors, df_products
+
+
+def _expected(df_purchases, vendor, brand, start, end, measure):
+    df_vendors, df_products = _dimensions()
+    df = df_purchases.merge(df_vendors, on='VendorKey').merge(df_products, on='ProductKey')
+    mask = df['VendorNo'] == vendor
+    if brand is not None:
+        mask &= df['Brand'] == brand
+    if start is not None:
+        mask &= df['PODate'] >= start
+    if end is not None:
+        mask &= df['PODate'] <= end
+    values = (df['PayDate'] - df['InvoiceDate']).dt.days if measure == 'Payment_Lag_Days' else df['LeadTime_Days']
+    values = values[mask].dropna().astype('float64')
+    return {'Count': len(values), 'Mean': values.mean(), 'Std': values.std(),
+            **{f"P{q * 100:g}": values.quantile(q) for q in PERCENTILES}}
+
+
+WINDOWS = [(None, None), ('2016-03-01', '2016-06-30'), ('2016-05-10', '2016-05-20'), ('2016-12-01', None),
+           (None, '2016-01-31'), ('2016-07-04', '2016-07-04'), ('2017-02-01', '2017-03-01')]
+
+
+def _check(scorecard, df_purchases):
+    for vendor, brand in [(105, None), (4425, None), (480, 60), (4425, 64), (999, None)]:
+        for start, end in WINDOWS:
+            for measure in MEASURES:
+                result = scorecard.query(vendor, brand, start, end, measure)
+                expected = _expected(df_purchases, vendor, brand, start, end, measure)
+                assert result['Count'] == expected['Count']
+                for name, value in expected.items():
+                    assert result[name] == pytest.approx(value, nan_ok=True), (vendor, brand, start, end, measure, name)
+
+
+def test_window_statistics_match_pandas():
+    df_purchases = _purchases(3_000, seed=0)
+    _check(VendorScorecard(df_purchases, *_dimensions()), df_purchases)
+
+
+def test_appended_lines_are_counted_before_and_after_the_merge():
+    df_first, df_delta = _purchases(2_000, seed=1), _purchases(300, seed=2)
+    scorecard = VendorScorecard(df_first, *_dimensions())
+    scorecard.append(df_delta)
+    assert scorecard.vendor_index.delta is not None
+    _check(scorecard, pd.concat([df_first, df_delta], ignore_index=True))
+
+    # Lead times beyond the histogram range force a merge into the sorted arrays
+    df_long = _purchases(200, seed=3, lead_time_max=90)
+    scorecard.append(df_long)
+    assert scorecard.vendor_index.delta is None
+    _check(scorecard, pd.concat([df_first, df_delta, df_long], ignore_index=True))
@@ -0,0 +1,271 @@
+import pandas as pd
+import numpy as np
+import argparse
+import time
+
+from data_store import read_frame
+
+# Vendor scorecards on demand: lead time and payment lag statistics of one vendor, or one
+# vendor x brand pair, over any PODate window.
+# The purchases are indexed once per vendor and once per vendor x brand pair. The rows of each
+# index are kept in flat arrays sorted by (entity, PODate), so a window is one contiguous slice
+# found by two binary searches. Per measure the index also keeps
+#   - prefix sums of the count, value and squared value (mean and std of any slice in O(1)),
+#   - cumulative histograms of the whole-day values every HISTOGRAM_BLOCK rows (the histogram of
+#     any slice is a difference of two of them plus at most two partial blocks, which gives the
+#     median and percentiles without touching the slice),
+# so a query costs the same whatever the window size (well under a millisecond).
+# New purchase lines go to an unsorted delta that queries scan directly; the delta is merged into
+# the sorted arrays once it exceeds DELTA_MAX_ROWS (or brings a value outside the histogram range).
+
+MEASURES = ['LeadTime_Days', 'Payment_Lag_Days']
+
+PERCENTILES = [0.5, 0.9, 0.95]
+
+# Rows between two stored cumulative histograms
+HISTOGRAM_BLOCK = 64
+
+# Appended rows kept outside the sorted arrays before they are merged in
+DELTA_MAX_ROWS = 50_000
+
+PURCHASE_COLUMNS = ['VendorKey', 'ProductKey', 'PODate', 'InvoiceDate', 'PayDate', 'LeadTime_Days']
+
+
+class _MeasureIndex:
+    """Prefix sums and block histograms of one measure, in the row order of its _WindowIndex."""
+
+    def __init__(self, values):
+        valid = ~np.isnan(values)
+        self.values = values
+        # Centered on the (whole-day) mean: the sums of whole-day values stay exact integers
+        self.shift = float(np.rint(values[valid].mean())) if valid.any() else 0.0
+        centered = np.where(valid, values - self.shift, 0.0)
+        self.count = np.concatenate([[0], np.cumsum(valid)])
+        self.sum = np.concatenate([[0.0], np.cumsum(centered)])
+        self.sum_sq = np.concatenate([[0.0], np.cumsum(centered ** 2)])
+
+        # Whole days as bins low, low + 1, ...; missing values go to a last bin that is never read
+        self.low = int(np.floor(values[valid].min())) if valid.any() else 0
+        self.n_bins = (int(np.ceil(values[valid].max())) - self.low + 1) if valid.any() else 1
+        self.codes = self.bin_codes(values)
+        n_blocks = len(values) // HISTOGRAM_BLOCK
+        block_counts = np.bincount(
+            np.arange(n_blocks * HISTOGRAM_BLOCK) // HISTOGRAM_BLOCK * (self.n_bins + 1) + self.codes[:n_blocks * HISTOGRAM_BLOCK],
+            minlength=n_blocks * (self.n_bins + 1)
+        ).reshape(n_blocks, self.n_bins + 1)
+        self.block_histograms = np.vstack([np.zeros((1, self.n_bins + 1), dtype='int32'),
+                                           np.cumsum(block_counts, axis=0, dtype='int32')])
+
+    def bin_codes(self, values):
+        valid = ~np.isnan(values)
+        return np.where(valid, np.rint(np.where(valid, values, self.low)) - self.low, self.n_bins).astype('int64')
+
+    def in_range(self, values):
+        values = values[~np.isnan(values)]
+        return bool(((np.rint(values) >= self.low) & (np.rint(values) < self.low + self.n_bins)).all())
+
+    def _prefix_histogram(self, i):
+        block = i // HISTOGRAM_BLOCK
+        return self.block_histograms[block] + np.bincount(self.codes[block * HISTOGRAM_BLOCK:i], minlength=self.n_bins + 1)
+
+    def window(self, lo, hi):
+        """(count, centered sum, centered sum of squares, histogram) of rows lo:hi."""
+        if hi - lo < 2 * HISTOGRAM_BLOCK:
+            histogram = np.bincount(self.codes[lo:hi], minlength=self.n_bins + 1)
+        else:
+            histogram = self._prefix_histogram(hi) - self._prefix_histogram(lo)
+        return (int(self.count[hi] - self.count[lo]), self.sum[hi] - self.sum[lo],
+                self.sum_sq[hi] - self.sum_sq[lo], histogram)
+
+
+class _WindowIndex:
+    """Rows of one grouping (entity codes, PODate days, measures), sorted by entity then date, plus a delta."""
+
+    def __init__(self, entities, days, values):
+        order = np.lexsort((days, entities))
+        self.entities, self.days = entities[order], days[order]
+        self.keys, starts = np.unique(self.entities, return_index=True)
+        self.starts = np.append(starts, len(order))
+        self.measures = {name: _MeasureIndex(values[name][order]) for name in values}
+        self.delta = None
+
+    def rows(self):
+        """Every row, sorted ones first then the delta."""
+        entities, days = self.entities, self.days
+        values = {name: index.values for name, index in self.measures.items()}
+        if self.delta is not None:
+            entities = np.concatenate([entities, self.delta[0]])
+            days = np.concatenate([days, self.delta[1]])
+            values = {name: np.concatenate([values[name], self.delta[2][name]]) for name in values}
+        return entities, days, values
+
+    def append(self, entities, days, values):
+        """Add rows; returns the re-sorted index if the delta is due for a merge, else self."""
+        if self.delta is None:
+            self.delta = (entities, days, values)
+        else:
+            self.delta = (np.concatenate([self.delta[0], entities]), np.concatenate([self.delta[1], days]),
+                          {name: np.concatenate([self.delta[2][name], values[name]]) for name in values})
+        if len(self.delta[0]) > DELTA_MAX_ROWS or not all(
+                index.in_range(values[name]) for name, index in self.measures.items()):
+            return _WindowIndex(*self.rows())
+        return self
+
+    def window(self, entity, start_day, end_day, measure):
+        """Per-measure (count, sum, sum_sq, histogram) of the entity's rows with start_day <= PODate <= end_day."""
+        index = self.measures[measure]
+        position = np.searchsorted(self.keys, entity)
+        if position < len(self.keys) and self.keys[position] == entity:
+            first, last = self.starts[position], self.starts[position + 1]
+            segment = self.days[first:last]
+            lo = first if start_day is None else first + np.searchsorted(segment, start_day, 'left')
+            hi = last if end_day is None else first + np.searchsorted(segment, end_day, 'right')
+            count, total, total_sq, histogram = index.window(lo, hi)
+        else:
+            count, total, total_sq, histogram = 0, 0.0, 0.0, np.zeros(index.n_bins + 1, dtype='int64')
+
+        if self.delta is not None:
+            # The delta is small and unsorted: scan it
+            mask = self.delta[0] == entity
+            if start_day is not None:
+                mask &= self.delta[1] >= start_day
+            if end_day is not None:
+                mask &= self.delta[1] <= end_day
+            values = self.delta[2][measure][mask]
+            values = values[~np.isnan(values)]
+            centered = values - index.shift
+            count += len(values)
+            total += centered.sum()
+            total_sq += (centered ** 2).sum()
+            histogram = histogram + np.bincount(index.bin_codes(values), minlength=index.n_bins + 1)
+        return count, total, total_sq, histogram, index
+
+
+def _window_stats(count, total, total_sq, histogram, index, percentiles):
+    stats = {'Count': count, 'Mean': np.nan, 'Std': np.nan}
+    stats.update({f"P{q * 100:g}": np.nan for q in percentiles})
+    if count == 0:
+        return stats
+    stats['Mean'] = index.shift + total / count
+    if count > 1:
+        stats['Std'] = np.sqrt(max((total_sq - total ** 2 / count) / (count - 1), 0.0))
+    # Linear interpolation between the ranks, as pandas / NumPy percentiles
+    cumulative = np.cumsum(histogram[:index.n_bins])
+    for q in percentiles:
+        rank = q * (count - 1)
+        below, above = np.searchsorted(cumulative, [np.floor(rank), np.ceil(rank)], 'right')
+        stats[f"P{q * 100:g}"] = index.low + below + (rank - np.floor(rank)) * (above - below)
+    return stats
+
+
+def _day(date):
+    return None if date is None else pd.Timestamp(date).to_datetime64().astype('datetime64[D]').astype('int64')
+
+
+class VendorScorecard:
+    """Lead time and payment lag statistics per vendor / vendor x brand over any PODate window."""
+
+    def __init__(self, df_purchases, df_vendors, df_products):
+        self.df_vendors, self.df_products = df_vendors, df_products
+        self._set_dimensions()
+        entities, pairs, days, values = self._rows(df_purchases)
+        self.vendor_index = _WindowIndex(entities, days, values)
+        self.pair_index = _WindowIndex(pairs, days, values)
+
+    @classmethod
+    def from_store(cls):
+        return cls(read_frame("df_purchases_cleaned", columns=PURCHASE_COLUMNS),
+                   read_frame("dim_vendor"), read_frame("dim_product", columns=['ProductKey', 'Brand']))
+
+    def _set_dimensions(self):
+        # Key -> VendorNumber / Brand lookups (keys are dense); a vendor number may have several keys
+        df_vendors, df_products = self.df_vendors, self.df_products
+        self.vendor_numbers = np.zeros(int(df_vendors['VendorKey'].max()) + 1, dtype='int64')
+        self.vendor_numbers[df_vendors['VendorKey'].to_numpy()] = df_vendors['VendorNo'].to_numpy()
+        self.brands = np.zeros(int(df_products['ProductKey'].max()) + 1, dtype='int64')
+        self.brands[df_products['ProductKey'].to_numpy()] = df_products['Brand'].to_numpy()
+        self.vendors = df_vendors.drop_duplicates('VendorNo')[['VendorNo', 'VendorName']].rename(columns={'VendorNo': 'VendorNumber'})
+
+    def _rows(self, df_purchases):
+        vendors = self.vendor_numbers[df_purchases['VendorKey'].to_numpy()]
+        pairs = (vendors << 32) | self.brands[df_purchases['ProductKey'].to_numpy()]
+        days = df_purchases['PODate'].to_numpy().astype('datetime64[D]').astype('int64')  # NaT sorts first
+        values = {
+            'LeadTime_Days': df_purchases['LeadTime_Days'].to_numpy(dtype='float64'),
+            'Payment_Lag_Days': (df_purchases['PayDate'] - df_purchases['InvoiceDate']).dt.days.to_numpy(dtype='float64'),
+        }
+        return vendors, pairs, days, values
+
+    def append(self, df_purchases, df_vendors=None, df_products=None):
+        """Add newly cleaned purchase lines (pass the updated dimensions if they have new members)."""
+        if df_vendors is not None or df_products is not None:
+            self.df_vendors = self.df_vendors if df_vendors is None else df_vendors
+            self.df_products = self.df_products if df_products is None else df_products
+            self._set_dimensions()
+        entities, pairs, days, values = self._rows(df_purchases)
+        self.vendor_index = self.vendor_index.append(entities, days, values)
+        self.pair_index = self.pair_index.append(pairs, days, values)
+
+    def query(self, vendor, brand=None, start=None, end=None, measure='LeadTime_Days', percentiles=PERCENTILES):
+        """Count, mean, std and percentiles of one measure for a vendor number (and brand), PODate in [start, end]."""
+        if brand is None:
+            window = self.vendor_index.window(int(vendor), _day(start), _day(end), measure)
+        else:
+            window = self.pair_index.window((int(vendor) << 32) | int(brand), _day(start), _day(end), measure)
+        return _window_stats(*window, percentiles)
+
+    def scorecard(self, vendor, brand=None, start=None, end=None, percentiles=PERCENTILES):
+        """Both measures for one vendor (and brand), one row per measure."""
+        return pd.DataFrame(
+            [{'Measure': measure, **self.query(vendor, brand, start, end, measure, percentiles)} for measure in MEASURES]
+        )
+
+    def vendor_scorecards(self, start=None, end=None, percentiles=(0.5,)):
+        """One row per vendor with the lead time and payment lag statistics of the window."""
+        rows = []
+        for vendor in self.vendors['VendorNumber']:
+            row = {'VendorNumber': vendor}
+            for measure in MEASURES:
+                prefix = measure.replace('_Days', '')
+                row.update({f"{prefix}_{name}": value
+                            for name, value in self.query(vendor, None, start, end, measure, percentiles).items()})
+            rows.append(row)
+        return pd.merge(self.vendors, pd.DataFrame(rows), on='VendorNumber')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lead time and payment lag scorecards per vendor over a PODate window.")
+    parser.add_argument('--vendor', type=int, help="Vendor number (default: every vendor)")
+    parser.add_argument('--brand', type=int, help="Brand, for a vendor x brand scorecard (needs --vendor)")
+    parser.add_argument('--start', help="First PODate of the window, e.g. 2016-03-01")
+    parser.add_argument('--end', help="Last PODate of the window, e.g. 2016-06-30")
+    args = parser.parse_args()
+
+    if args.brand is not None and args.vendor is None:
+        print("Error: --brand needs --vendor.")
+        exit()
+    try:
+        start = time.perf_counter()
+        scorecard = VendorScorecard.from_store()
+        build_seconds = time.perf_counter() - start
+    except FileNotFoundError:
+        print("Error: df_purchases_cleaned not found. Please ensure data preparation is complete.")
+        exit()
+
+    window = f"PODate {args.start or 'start'} to {args.end or 'end'}"
+    start = time.perf_counter()
+    if args.vendor is None:
+        df_result = scorecard.vendor_scorecards(args.start, args.end).sort_values('LeadTime_Count', ascending=False)
+        title = f"Vendor Scorecards ({window}):"
+    else:
+        df_result = scorecard.scorecard(args.vendor, args.brand, args.start, args.end)
+        title = f"Scorecard for Vendor {args.vendor}{'' if args.brand is None else f', Brand {args.brand}'} ({window}):"
+    query_ms = (time.perf_counter() - start) * 1000
+
+    print(title)
+    print(df_result.to_markdown(index=False, floatfmt=".2f"))
+    print(f"\nIndex built in {build_seconds:.2f} s, answered in {query_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()